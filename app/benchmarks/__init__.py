@@ -0,0 +1 @@
+"""Benchmarks which are run manually or in CI, not part of the application package."""
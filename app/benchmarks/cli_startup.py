@@ -0,0 +1,101 @@
+"""Startup time budget of the `porter` CLI.
+
+Runs each command in a fresh interpreter a few times and fails (exit code 1) when the median wall time is over
+its budget, or when a heavy dependency gets imported by a command which doesn't need it.
+
+    python -m benchmarks.cli_startup            # from the app directory
+    python -m benchmarks.cli_startup --runs 20
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# command line -> budget in milliseconds (median over the runs, including the interpreter startup)
+BUDGETS_MS: Dict[Tuple[str, ...], int] = {
+    ("--help",): 500,
+    ("transform", "--help"): 500,
+    ("govern", "--help"): 500,
+}
+
+# should never be imported just to start the CLI, commands import them when they need them
+HEAVY_MODULES = [
+    "duckdb",
+    "pyarrow",
+    "pandas",
+    "boto3",
+    "kubernetes",
+    "sqllineage",
+    "sqlalchemy",
+    "art",
+]
+
+_RUNNER = "import sys; from src.cli.cli import app; sys.argv[0] = 'porter'; app()"
+_IMPORTED = (
+    "import sys; sys.argv = ['porter', *sys.argv[1:]]\n"
+    "try:\n"
+    "    from src.cli.cli import app; app()\n"
+    "except SystemExit:\n"
+    "    pass\n"
+    "print('\\n'.join(m for m in {heavy} if m in sys.modules), file=sys.stderr)\n"
+)
+
+
+def time_command(args: Tuple[str, ...], runs: int) -> List[float]:
+    """Wall time in milliseconds of each run of the command."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", _RUNNER, *args],
+            cwd=APP_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def heavy_imports(args: Tuple[str, ...]) -> List[str]:
+    """Heavy modules imported by the command."""
+    process = subprocess.run(
+        [sys.executable, "-c", _IMPORTED.format(heavy=HEAVY_MODULES), *args],
+        cwd=APP_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    return [line for line in process.stderr.splitlines() if line in HEAVY_MODULES]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Runs of each command")
+    options = parser.parse_args()
+
+    failures = []
+    for args, budget in BUDGETS_MS.items():
+        timings = time_command(args, options.runs)
+        median = statistics.median(timings)
+        imported = heavy_imports(args)
+        status = "ok" if median <= budget and not imported else "FAIL"
+        print(
+            f"{status:4} porter {' '.join(args):24} median {median:7.1f}ms "
+            f"(min {min(timings):.1f}ms, budget {budget}ms)"
+            + (f", imports {imported}" if imported else "")
+        )
+        if status != "ok":
+            failures.append(args)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
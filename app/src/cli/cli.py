@@ -1,15 +1,31 @@
-"""This is the Entry point for the application CLI, this CLI exposes all the submodules CLIs."""
+"""This is the Entry point for the application CLI, this CLI exposes all the submodules CLIs.
+
+The sub-CLIs are registered lazily, so `porter --help` and every command only import what they use.
+Keep heavy dependencies (duckdb, pyarrow, boto3, kubernetes, sqllineage, ...) out of the module level of the
+sub-CLIs, import them inside the commands. `benchmarks/cli_startup.py` checks the startup time stays in budget.
+"""
 
 __all__ = ["app"]
 
 import typer
 
-from src.transformations.cli import app as transformations_app
-from src.governance.cli import app as governance_app
+from src.cli.utilities import LazySubcommand, LazyTyperGroup
+
+
+class PorterGroup(LazyTyperGroup):
+    """Top level `porter` command, sub-commands are imported when they're run."""
+
+    lazy_subcommands = {
+        "transform": LazySubcommand(
+            "src.transformations.cli:app", "Transformation related commands."
+        ),
+        "govern": LazySubcommand(
+            "src.governance.cli:app", "Governance related commands."
+        ),
+    }
+
 
-app = typer.Typer()
-app.add_typer(transformations_app, name="transform")
-app.add_typer(governance_app, name="govern")
+app = typer.Typer(cls=PorterGroup)
 
 
 @app.callback()
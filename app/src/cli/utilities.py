@@ -1 +1,63 @@
 """All Common utilities/validations used in CLI."""
+
+__all__ = ["LazySubcommand", "LazyTyperGroup"]
+
+
+import importlib
+from typing import Dict, List, NamedTuple
+
+import typer
+from typer.core import TyperCommand, TyperGroup
+
+
+class LazySubcommand(NamedTuple):
+    """A sub-command whose Typer app is imported only when the sub-command is run."""
+
+    # "module:attribute" of the Typer app
+    import_path: str
+    # shown in `porter --help` without importing the sub-command
+    help: str
+
+
+class LazyTyperGroup(TyperGroup):
+    """Typer group which imports its sub-commands on demand.
+
+    `porter --help` lists the sub-commands from `lazy_subcommands` without importing them, a sub-command
+    (and all the dependencies of its module, Example: duckdb, boto3) is imported only when it's resolved to run.
+    Subclass it and set `lazy_subcommands`, then pass the subclass as `cls` to `typer.Typer`.
+    """
+
+    lazy_subcommands: Dict[str, LazySubcommand] = {}
+
+    def list_commands(self, ctx) -> List[str]:
+        """Eager commands first, then the lazy ones in the order they're defined."""
+        eager = super().list_commands(ctx)
+        return eager + [name for name in self.lazy_subcommands if name not in eager]
+
+    def get_command(self, ctx, cmd_name: str):
+        """The command if it's already loaded, otherwise a placeholder carrying only the help text.
+        The placeholder is what the help pages use, `resolve_command` swaps it for the real command.
+        """
+        command = super().get_command(ctx, cmd_name)
+        if command is not None or cmd_name not in self.lazy_subcommands:
+            return command
+        lazy = self.lazy_subcommands[cmd_name]
+        return TyperCommand(name=cmd_name, help=lazy.help, short_help=lazy.help)
+
+    def resolve_command(self, ctx, args):
+        """Resolve the sub-command to run, importing it if it's lazy."""
+        cmd_name, command, args = super().resolve_command(ctx, args)
+        if cmd_name in self.lazy_subcommands and cmd_name not in self.commands:
+            command = self._load(cmd_name)
+        return cmd_name, command, args
+
+    def _load(self, cmd_name: str):
+        """Import the Typer app of the sub-command and register it as a regular command."""
+        module_name, _, attribute = self.lazy_subcommands[
+            cmd_name
+        ].import_path.partition(":")
+        sub_app = getattr(importlib.import_module(module_name), attribute)
+        command = typer.main.get_group(sub_app)
+        command.name = cmd_name
+        self.add_command(command, cmd_name)
+        return command
@@ -1,41 +1,216 @@
-"""Config related functions"""
+"""Config related functions
 
+Validated configs are cached on disk, so that short lived jobs don't pay for parsing the YAML and validating
+the models on every run. A cached config is keyed by the hash of the config file (along with the model and the
+version of Porter), and is only used when all the files referenced by the config (secrets backend config,
+SQL files) still have the same content as when the config was validated.
+The cache is stored under `PORTER_CONFIG_CACHE_DIR` (by default `~/.cache/porter/configs`),
+set `PORTER_CONFIG_CACHE=0` to disable it.
+"""
+
+__all__ = ["read_config_file", "referenced_files", "clear_config_cache"]
+
+import hashlib
+import os
+import pickle
 import yaml
 import json
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel
 from src.common.base_logger import log
 
+# Bump when the layout of the cache entries changes
+CACHE_FORMAT_VERSION = 1
+
+# Fields of the config models which hold the path of another file used by the config
+REFERENCED_FILE_FIELDS = (
+    "secrets_backend_config",
+    "sql_path",
+)
+
+# Packages whose classes end up in the validated (pickled) configs
+_MODEL_DIRS = tuple(
+    Path(__file__).resolve().parent.parent / package for package in ("models", "enums")
+)
+
+
+def _cache_dir() -> Optional[Path]:
+    """Directory of the config cache, None when the cache is disabled."""
+    if os.environ.get("PORTER_CONFIG_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    if os.environ.get("PORTER_CONFIG_CACHE_DIR"):
+        return Path(os.environ["PORTER_CONFIG_CACHE_DIR"])
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home, "porter", "configs")
+
+
+def _file_hash(path: Path) -> Optional[str]:
+    """sha256 of the content of a file, None if the file doesn't exist."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def _code_fingerprint() -> str:
+    """Changes whenever the models or the enums they use change, so that configs are re-validated after an upgrade."""
+    import pydantic
+
+    files = sorted(
+        path for directory in _MODEL_DIRS for path in directory.rglob("*.py")
+    )
+    state = [pydantic.VERSION] + [
+        f"{path}:{path.stat().st_mtime_ns}:{path.stat().st_size}" for path in files
+    ]
+    return hashlib.sha256("\n".join(state).encode()).hexdigest()
+
+
+def _walk(value: Any) -> Iterator[Tuple[str, Any]]:
+    """Yield (field name, value) of all the fields of the model and all its nested models."""
+    if isinstance(value, BaseModel):
+        for name in type(value).model_fields:
+            field_value = getattr(value, name, None)
+            yield name, field_value
+            yield from _walk(field_value)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _walk(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _walk(item)
+
+
+def referenced_files(config: Any) -> List[Path]:
+    """Absolute paths of all the files referenced by the config (Example: `sql_path` of the transforms)."""
+    paths = set()
+    for name, value in _walk(config):
+        if name not in REFERENCED_FILE_FIELDS or value is None:
+            continue
+        for path in value if isinstance(value, (list, tuple)) else [value]:
+            paths.add(Path(path).resolve())
+    return sorted(paths)
+
+
+def _cache_key(content: bytes, file_path: str, model: Any) -> str:
+    """Key of a cached config, relative paths in the config are resolved from the working directory."""
+    digest = hashlib.sha256()
+    for part in (
+        str(CACHE_FORMAT_VERSION),
+        f"{model.__module__}.{model.__qualname__}",
+        _code_fingerprint(),
+        os.getcwd(),
+        Path(file_path).suffix,
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def _load_cached(cache_file: Path) -> Optional[Any]:
+    """The cached config if the entry exists and none of the referenced files changed."""
+    try:
+        if hasattr(os, "getuid") and cache_file.stat().st_uid != os.getuid():
+            # only unpickle entries written by the same user
+            log.warning(
+                f"Ignoring the config cache {cache_file}, it's owned by another user"
+            )
+            return None
+        with open(cache_file, "rb") as r_fp:
+            entry: Dict = pickle.load(r_fp)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.debug(f"Ignoring the unreadable config cache {cache_file}: {e!r}")
+        return None
+    for path, content_hash in entry["referenced_files"].items():
+        if _file_hash(Path(path)) != content_hash:
+            log.debug(f"Config cache {cache_file} is stale, {path} changed")
+            return None
+    return entry["config"]
+
+
+def _store_cached(cache_file: Path, config: Any):
+    """Write the config along with the hashes of the files it references, atomically."""
+    entry = {
+        "config": config,
+        "referenced_files": {
+            str(path): _file_hash(path) for path in referenced_files(config)
+        },
+    }
+    try:
+        cache_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as w_fp:
+            pickle.dump(entry, w_fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        # the cache is only an optimization, a read-only home directory should not fail the job
+        log.debug(f"Could not write the config cache {cache_file}: {e!r}")
+
+
+def _parse_config_file(file_path: str, content: bytes, model: Any) -> Any:
+    """Parse the YAML/JSON content and validate it against the model."""
+    try:
+        if Path(file_path).suffix == ".yaml":
+            yaml_config = yaml.safe_load(content)
+            config = model.model_validate(yaml_config)
+        elif Path(file_path).suffix == ".json":
+            json_config = json.loads(content)
+            config = model.model_validate(json_config)
+        else:
+            raise Exception(f"File type: {Path(file_path).suffix} is not supported")
+    except yaml.YAMLError as ye:
+        log.error(ye)
+        raise RuntimeError(
+            f"Could not parse the YAML file: {file_path} into {model.__class__.__name__}"
+        )
+    except json.JSONDecodeError as je:
+        log.error(je)
+        raise RuntimeError(
+            f"Could not parse the JSON file: {file_path} into {model.__class__.__name__}"
+        )
+    except Exception as e:
+        log.error(
+            f"UNKNOWN Exception while parsing the file: {file_path} into {model.__class__.__name__} "
+        )
+        raise e
+    return config
+
 
 def read_config_file(
     file_path: str,
     model: Any,
+    use_cache: bool = True,
 ) -> Any:
-    """Parse the YAML/JSON and validate against the Pydantic Base model that is passed and return the parsed obj"""
-    with open(file_path) as r_fp:
-        try:
-            if Path(file_path).suffix == ".yaml":
-                yaml_config = yaml.safe_load(r_fp.read())
-                config = model.parse_obj(yaml_config)
-            elif Path(file_path).suffix == ".json":
-                json_config = json.load(r_fp)
-                config = model.parse_obj(json_config)
-            else:
-                raise Exception(f"File type: {Path(file_path).suffix} is not supported")
-        except yaml.YAMLError as ye:
-            log.error(ye)
-            raise RuntimeError(
-                f"Could not parse the YAML file: {file_path} into {model.__class__.__name__}"
-            )
-        except json.JSONDecodeError as je:
-            log.error(je)
-            raise RuntimeError(
-                f"Could not parse the JSON file: {file_path} into {model.__class__.__name__}"
-            )
-        except Exception as e:
-            log.error(
-                f"UNKNOWN Exception while parsing the file: {file_path} into {model.__class__.__name__} "
-            )
-            raise e
+    """Parse the YAML/JSON and validate against the Pydantic Base model that is passed and return the parsed obj.
+    The validated config is cached on disk and reused as long as the file and the files it references don't change.
+    """
+    with open(file_path, "rb") as r_fp:
+        content = r_fp.read()
 
+    cache_dir = _cache_dir() if use_cache else None
+    if cache_dir is None:
+        return _parse_config_file(file_path, content, model)
+
+    cache_file = cache_dir / f"{_cache_key(content, file_path, model)}.pickle"
+    config = _load_cached(cache_file)
+    if config is not None:
+        log.debug(f"Loaded {file_path} from the config cache")
+        return config
+
+    config = _parse_config_file(file_path, content, model)
+    _store_cached(cache_file, config)
     return config
+
+
+def clear_config_cache() -> int:
+    """Delete all the cached configs, returns the number of entries deleted."""
+    cache_dir = _cache_dir()
+    if cache_dir is None or not cache_dir.exists():
+        return 0
+    entries = list(cache_dir.glob("*.pickle"))
+    for entry in entries:
+        entry.unlink(missing_ok=True)
+    return len(entries)
@@ -1,6 +1,6 @@
 """Common enumerations used across the application."""
 
-__all__ = ["Engine", "Mode", "ExceptionType", "Status"]
+__all__ = ["Engine", "Mode", "ExceptionType", "Status", "DatasetStorage"]
 
 from enum import Enum
 
@@ -37,3 +37,10 @@ class Status(str, Enum):
     in_progress = "in_progress"
     retry = "retry"
     skipped = "skipped"
+
+
+class DatasetStorage(str, Enum):
+    """How an extracted dataset is stored in the `duck_internal` engine."""
+
+    materialized = "materialized"
+    view = "view"
@@ -1,6 +1,11 @@
 """Enumerations related to Datasets."""
 
-__all__ = ["FileTypes", "OnDatasetMissingActions"]
+__all__ = [
+    "FileTypes",
+    "OnDatasetMissingActions",
+    "PartitionStrategy",
+    "PaginationType",
+]
 
 from enum import Enum
 
@@ -25,3 +30,21 @@ class OnDatasetMissingActions(str, Enum):
     error = "error"
     warning = "warning"
     poll = "poll"
+
+
+class PartitionStrategy(str, Enum):
+    """Supported strategies to split a dataset into partitions for parallel extraction."""
+
+    range = "range"
+    quantile = "quantile"
+
+
+class PaginationType(str, Enum):
+    """Supported ways of fetching the next page of an API response."""
+
+    # the response has the cursor of the next page (Example: {"next_cursor": "abc"})
+    cursor = "cursor"
+    # pages are requested by offset and limit
+    offset = "offset"
+    # the response has a `Link: <url>; rel="next"` header
+    link_header = "link_header"
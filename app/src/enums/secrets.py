@@ -14,3 +14,5 @@ class SecretSource(str, Enum):
     gcp_sm = "gcp_sm"
     azure_kv = "azure_kv"
     hashicorp_vault = "hashicorp_vault"
+    # secrets read from a local JSON/YAML file, for local runs and tests
+    local = "local"
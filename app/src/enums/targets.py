@@ -1,6 +1,6 @@
 """Enums related to Targets."""
 
-__all__ = ["TargetType", "LoadMode"]
+__all__ = ["TargetType", "LoadMode", "MergeStrategy"]
 
 
 from enum import Enum
@@ -19,3 +19,11 @@ class LoadMode(str, Enum):
     append = "append"
     overwrite = "overwrite"
     upsert = "upsert"
+
+
+class MergeStrategy(str, Enum):
+    """Set based statements used to apply an upsert from the staging table into the target table."""
+
+    merge = "merge"
+    insert_on_conflict = "insert_on_conflict"
+    delete_insert = "delete_insert"
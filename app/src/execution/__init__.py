@@ -0,0 +1 @@
+"""Execution of the steps of a Porter pipeline (extraction, loading etc.)."""
@@ -0,0 +1,50 @@
+"""Resolution of the dynamic input queries of Table-based datasets.
+Each query runs on a connection borrowed from the ConnectionPool of the job, so looking up the inputs of
+many datasets on the same source reuses the same few connections instead of opening one per query.
+"""
+
+__all__ = ["ENV_SOURCE", "resolve_dynamic_inputs"]
+
+
+import os
+
+from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.models.dataset.table import TableDataset
+from src.sources.connection_pool import ConnectionPool
+
+# Dynamic inputs with this source are read from the environment variable of the same name
+ENV_SOURCE = "ENV"
+
+
+def resolve_dynamic_inputs(dataset: TableDataset, pool: ConnectionPool) -> TableDataset:
+    """Returns a copy of the dataset with the value of each dynamic input added to `values_to_bind`.
+    Values of `values_to_bind` set in the config take precedence over the dynamic inputs of the same name.
+    """
+    if not dataset.dynamic_input_queries:
+        return dataset
+
+    values = {}
+    for dynamic_input in dataset.dynamic_input_queries:
+        if dynamic_input.source == ENV_SOURCE:
+            if dynamic_input.name not in os.environ:
+                raise exc.PorterException(
+                    f"Dataset {dataset.name}: environment variable {dynamic_input.name} is not set"
+                )
+            values[dynamic_input.name] = os.environ[dynamic_input.name]
+            continue
+
+        with pool.acquire(dynamic_input.source) as source:
+            row = source.fetch_one(dynamic_input.query)
+        if row is None:
+            raise exc.PorterException(
+                f"Dataset {dataset.name}: dynamic input query {dynamic_input.name} returned no rows"
+            )
+        values[dynamic_input.name] = row[0]
+        log.info(
+            f"Dataset {dataset.name}: dynamic input {dynamic_input.name} = {row[0]}"
+        )
+
+    return dataset.model_copy(
+        update={"values_to_bind": {**values, **(dataset.values_to_bind or {})}}
+    )
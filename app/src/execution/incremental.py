@@ -0,0 +1,115 @@
+"""Incremental extraction of Table-based and File-based datasets using a watermark kept in the metadata store.
+
+1. `apply_watermark` rewrites the query of the dataset to extract only the rows above the last watermark
+   (for file datasets it adds a filter, so whole partitions below the watermark are pruned).
+2. `capture_watermark` reads the new high-water mark from the extracted data in the engine.
+3. `commit_watermark` saves it, this should only be called once the dataset is loaded into all the targets,
+   so that a failed run extracts the same rows again.
+"""
+
+__all__ = [
+    "WATERMARK_PARAM",
+    "apply_watermark",
+    "capture_watermark",
+    "commit_watermark",
+]
+
+
+from typing import Any, Optional, Union
+
+from src.common.base_logger import log
+from src.metadata.store import MetadataStore
+from src.models.dataset.file import FileDataset
+from src.models.dataset.table import TableDataset
+from src.sources.database.base import DatabaseSource
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, quote_identifier
+
+WATERMARK_PARAM = "porter_watermark"
+
+
+def apply_watermark(
+    dataset: Union[TableDataset, FileDataset], store: MetadataStore, pipeline_name: str
+) -> Union[TableDataset, FileDataset]:
+    """Returns a copy of the dataset which only extracts the rows above the last watermark.
+    Datasets that are not incremental, or that were never loaded (and have no initial value), are returned as is.
+    The rewritten table dataset is a query-based dataset, so it can still be range partitioned.
+    A file dataset gets the watermark as one more of its `filters`, when the watermark column is a partition key
+    the partitions below it are never listed.
+    """
+    incremental = dataset.incremental
+    if incremental is None:
+        return dataset
+
+    watermark = store.get_watermark(
+        pipeline_name, dataset.name, incremental.watermark_column
+    )
+    if watermark is None:
+        watermark = incremental.initial_value
+    if watermark is None:
+        log.info(
+            f"Dataset {dataset.name}: no watermark captured yet, extracting all the rows"
+        )
+        return dataset
+
+    operator = ">=" if incremental.inclusive else ">"
+    log.info(
+        f"Dataset {dataset.name}: extracting rows with {incremental.watermark_column} {operator} {watermark}"
+    )
+    if isinstance(dataset, FileDataset):
+        return dataset.model_copy(
+            update={
+                "filters": [
+                    *(dataset.filters or []),
+                    (incremental.watermark_column, operator, watermark),
+                ]
+            }
+        )
+    query = (
+        f"SELECT * FROM ({DatabaseSource.dataset_query(dataset)}) porter_incremental "
+        f"WHERE ({incremental.watermark_column}) {operator} :{WATERMARK_PARAM}"
+    )
+    return dataset.model_copy(
+        update={
+            "query": query,
+            "table": None,
+            "values_to_bind": {
+                **(dataset.values_to_bind or {}),
+                WATERMARK_PARAM: watermark,
+            },
+        }
+    )
+
+
+def capture_watermark(
+    engine: DuckDBSource, dataset: Union[TableDataset, FileDataset]
+) -> Optional[Any]:
+    """Returns the high-water mark of the rows extracted into the engine, None if no rows were extracted.
+    The watermark column has to be part of the extracted columns, under its `target_name` when it's renamed.
+    """
+    if dataset.incremental is None:
+        return None
+    column = dataset.incremental.watermark_column
+    for declared in dataset.columns or []:
+        if declared.name == column and declared.target_name:
+            column = declared.target_name
+    row = engine.fetch_one(
+        f"SELECT MAX({quote_identifier(column)}) FROM {quote_identifier(dataset.name)}"
+    )
+    return row[0] if row else None
+
+
+def commit_watermark(
+    store: MetadataStore,
+    pipeline_name: str,
+    dataset: Union[TableDataset, FileDataset],
+    watermark: Optional[Any],
+):
+    """Save the high-water mark of a successfully loaded dataset.
+    When no new rows were extracted the previous watermark is kept.
+    """
+    if dataset.incremental is None or watermark is None:
+        return
+    store.set_watermark(
+        pipeline_name, dataset.name, dataset.incremental.watermark_column, watermark
+    )
+    log.info(f"Dataset {dataset.name}: saved watermark {watermark}")
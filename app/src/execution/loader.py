@@ -0,0 +1,270 @@
+"""Loads the datasets held in the `duck_internal` engine into the targets.
+All the targets are loaded at the same time from the same copy of each dataset in the engine,
+so the load takes as long as the slowest target instead of the sum of all of them.
+The connections to the targets come from the ConnectionPool of the job, so they're reused across datasets.
+"""
+
+__all__ = [
+    "WriteOptions",
+    "TargetLoadResult",
+    "resolve_write_options",
+    "datasets_for_target",
+    "load_dataset_into_target",
+    "load_into_targets",
+]
+
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.enums.common import Status
+from src.enums.targets import LoadMode, MergeStrategy
+from src.models.target import TargetConfig
+from src.sources.base import Source
+from src.sources.connection_pool import ConnectionPool
+from src.sources.batches import as_record_batch_reader, prefetch, rebatch
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, quote_identifier
+
+
+class WriteOptions(BaseModel):
+    """Resolved options to write one dataset into one target."""
+
+    dataset_name: str
+    target_name: str
+    mode: LoadMode
+    truncate: bool
+    key_columns: Optional[List[str]] = None
+    merge_strategy: Optional[MergeStrategy] = None
+
+
+class TargetLoadResult(BaseModel):
+    """Outcome of loading one dataset into one target."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    target: str
+    dataset_name: str
+    target_name: str
+    status: Status
+    num_rows: int = 0
+    elapsed_seconds: float = 0.0
+    exception: Optional[BaseException] = None
+
+
+def datasets_for_target(
+    target_config: TargetConfig, dataset_names: List[str]
+) -> List[str]:
+    """Datasets that should be loaded into the target, `load_only` takes precedence over `load_all`."""
+    if target_config.load_only:
+        missing = set(target_config.load_only) - set(dataset_names)
+        if missing:
+            raise exc.PorterException(
+                f"Target {target_config.name} has datasets in load_only which are not extracted: {sorted(missing)}"
+            )
+        return [name for name in dataset_names if name in target_config.load_only]
+    if target_config.load_all:
+        return list(dataset_names)
+    return []
+
+
+def resolve_write_options(
+    target_config: TargetConfig,
+    dataset_name: str,
+    key_columns: Optional[List[str]] = None,
+) -> WriteOptions:
+    """Resolve the target name and load mode of a dataset for a target.
+    `custom_write_options` of the dataset take precedence over `rename_targets` and the target level settings,
+    and over the `key_columns` of the dataset.
+    """
+    target_name = (target_config.rename_targets or {}).get(dataset_name, dataset_name)
+    mode = target_config.mode
+    truncate = target_config.truncate_before_load
+    merge_strategy = None
+
+    custom_options = next(
+        (
+            option
+            for option in target_config.custom_write_options or []
+            if option.dataset_name == dataset_name
+        ),
+        None,
+    )
+    if custom_options is not None:
+        target_name = custom_options.target_name or target_name
+        if "mode" in custom_options.model_fields_set:
+            mode = custom_options.mode
+        truncate = truncate or custom_options.truncate_target
+        key_columns = custom_options.key_columns or key_columns
+        merge_strategy = custom_options.merge_strategy
+
+    if mode == LoadMode.upsert and not key_columns:
+        raise exc.PorterException(
+            f"Dataset {dataset_name} is upserted into {target_config.name}, "
+            f"set key_columns on the dataset or in custom_write_options"
+        )
+
+    return WriteOptions(
+        dataset_name=dataset_name,
+        target_name=target_name,
+        mode=mode,
+        truncate=truncate,
+        key_columns=key_columns,
+        merge_strategy=merge_strategy,
+    )
+
+
+def load_dataset_into_target(
+    engine: DuckDBSource,
+    target: Source,
+    target_config: TargetConfig,
+    dataset_name: str,
+    write_options: Optional[WriteOptions] = None,
+) -> int:
+    """Stream one dataset from the engine into the target in batches of `target_config.batch_size` rows.
+    Reading from the engine runs ahead of the target by at most `target_config.max_buffered_batches` batches.
+    Returns the number of rows written.
+    """
+    write_options = write_options or resolve_write_options(target_config, dataset_name)
+    reader = engine.read_query(
+        f"SELECT * FROM {quote_identifier(dataset_name)}",
+        rows_per_batch=target_config.batch_size,
+    )
+    batches = prefetch(
+        rebatch(reader, target_config.batch_size), target_config.max_buffered_batches
+    )
+    num_rows = target.write(
+        target_name=write_options.target_name,
+        batches=as_record_batch_reader(batches, schema=reader.schema),
+        mode=write_options.mode,
+        truncate=write_options.truncate,
+        key_columns=write_options.key_columns,
+        merge_strategy=write_options.merge_strategy,
+    )
+    log.info(
+        f"Loaded {num_rows} rows of {dataset_name} into {target_config.name}.{write_options.target_name} "
+        f"({write_options.mode.value})"
+    )
+    return num_rows
+
+
+def _load_with_pooled_connection(
+    engine: DuckDBSource,
+    pool: ConnectionPool,
+    target_config: TargetConfig,
+    write_options: WriteOptions,
+) -> TargetLoadResult:
+    """Runs in a loader thread. Concurrent loads into the same target can't share a connection,
+    so each load borrows its own connection of the target from the pool.
+    """
+    dataset_name = write_options.dataset_name
+    started_at = time.time()
+    try:
+        with pool.acquire(target_config.name) as target:
+            num_rows = load_dataset_into_target(
+                engine, target, target_config, dataset_name, write_options
+            )
+        status, error = Status.success, None
+    except Exception as e:
+        log.error(
+            f"Failed to load {dataset_name} into {target_config.name}.{write_options.target_name}: {e!r}"
+        )
+        num_rows, status, error = 0, Status.failure, e
+
+    return TargetLoadResult(
+        target=target_config.name,
+        dataset_name=dataset_name,
+        target_name=write_options.target_name,
+        status=status,
+        num_rows=num_rows,
+        elapsed_seconds=time.time() - started_at,
+        exception=error,
+    )
+
+
+def load_into_targets(
+    engine: DuckDBSource,
+    targets: Dict[str, Source],
+    target_configs: List[TargetConfig],
+    dataset_names: List[str],
+    key_columns: Optional[Dict[str, List[str]]] = None,
+    raise_on_failure: bool = True,
+    connection_pool: Optional[ConnectionPool] = None,
+) -> List[TargetLoadResult]:
+    """Load the datasets into all the targets concurrently.
+    Each target gets its own pool of `max_concurrent_loads` loader threads, and all the pools run at the same time.
+
+    Args:
+        engine: The engine which holds the extracted datasets.
+        targets: Target sources keyed by the name of the target.
+        target_configs: Target configs of the pipeline.
+        dataset_names: Names of the datasets extracted in the job.
+        key_columns: Key columns of the datasets keyed by the name of the dataset, used by upserts.
+        raise_on_failure: Raise PorterException if any of the loads failed.
+        connection_pool: Pool of the job, targets which are not registered in it yet are registered with
+            `max_concurrent_loads` connections. Without a pool, a pool is created for the load and closed at the end.
+
+    Returns:
+        One TargetLoadResult per (target, dataset) that was loaded.
+    """
+    key_columns = key_columns or {}
+    own_pool = connection_pool is None
+    connection_pool = connection_pool or ConnectionPool()
+    pools: List[ThreadPoolExecutor] = []
+    futures: List[Future] = []
+    try:
+        for target_config in target_configs:
+            if target_config.name not in targets:
+                raise exc.PorterException(
+                    f"Target {target_config.name} is not defined in the pipeline"
+                )
+            if target_config.name not in connection_pool:
+                connection_pool.register(
+                    target_config.name,
+                    targets[target_config.name],
+                    max_size=target_config.max_concurrent_loads,
+                )
+            pool = ThreadPoolExecutor(
+                max_workers=target_config.max_concurrent_loads,
+                thread_name_prefix=f"porter-load-{target_config.name}",
+            )
+            pools.append(pool)
+            for dataset_name in datasets_for_target(target_config, dataset_names):
+                write_options = resolve_write_options(
+                    target_config, dataset_name, key_columns.get(dataset_name)
+                )
+                futures.append(
+                    pool.submit(
+                        _load_with_pooled_connection,
+                        engine,
+                        connection_pool,
+                        target_config,
+                        write_options,
+                    )
+                )
+        wait(futures)
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+        if own_pool:
+            connection_pool.close()
+
+    results = [future.result() for future in futures]
+    for target_config in target_configs:
+        target_results = [r for r in results if r.target == target_config.name]
+        log.info(
+            f"Target {target_config.name}: loaded {sum(r.num_rows for r in target_results)} rows "
+            f"of {len(target_results)} datasets in {max((r.elapsed_seconds for r in target_results), default=0):.2f}s"
+        )
+
+    failed = [r for r in results if r.status != Status.success]
+    if failed and raise_on_failure:
+        raise exc.PorterException(
+            f"{len(failed)} out of {len(results)} loads failed: "
+            f"{[f'{r.target}.{r.target_name}' for r in failed]}"
+        ) from failed[0].exception
+    return results
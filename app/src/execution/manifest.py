@@ -0,0 +1,146 @@
+"""Change detection of the files of File-based datasets using a manifest kept in the metadata store.
+
+1. `apply_manifest` lists the files of the dataset, diffs them against the manifest and makes the source read only
+   the files which are new or changed since they were last ingested.
+2. `commit_manifest` records them as ingested, this should only be called once the dataset is loaded into all
+   the targets, so that a failed run ingests the same files again.
+
+The manifest of a dataset is read in a single query and diffed in memory by path, the files are compared on size and
+modification time (both from the listing, no file is opened) and checksums are only computed for the files which
+are new or whose modification time changed.
+"""
+
+__all__ = ["FileChanges", "diff_files", "apply_manifest", "commit_manifest"]
+
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from src.common.base_logger import log
+from src.metadata.store import ManifestEntry, MetadataStore
+from src.models.dataset.file import FileDataset
+from src.sources.file.local.local_source import FileSource
+
+_CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+
+class FileChanges(NamedTuple):
+    """Files of a dataset compared to its manifest."""
+
+    new: List[ManifestEntry]
+    changed: List[ManifestEntry]
+    # modification time changed but not the content, recorded again without being ingested
+    touched: List[ManifestEntry]
+    unchanged: int
+
+    @property
+    def to_ingest(self) -> List[ManifestEntry]:
+        return self.new + self.changed
+
+
+def _checksum(path: str) -> str:
+    """sha256 of the content of the file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as r_fp:
+        while chunk := r_fp.read(_CHECKSUM_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat(paths: List[str]) -> List[ManifestEntry]:
+    """Size and modification time of the files, files deleted since they were listed are left out."""
+    entries = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append(ManifestEntry(path, stat.st_size, stat.st_mtime_ns))
+    return entries
+
+
+def diff_files(
+    entries: List[ManifestEntry],
+    manifest: Dict[str, ManifestEntry],
+    checksum: bool = False,
+    max_workers: int = 8,
+) -> FileChanges:
+    """Compare the current state of the files to the manifest.
+    With `checksum`, the checksums of new files and files whose modification time changed are computed
+    (up to `max_workers` files at the same time), a file with the same size and content is only touched.
+    """
+    new, modified, unchanged = [], [], 0
+    for entry in entries:
+        previous = manifest.get(entry.path)
+        if previous is None:
+            new.append(entry)
+        elif previous.size != entry.size or previous.mtime_ns != entry.mtime_ns:
+            modified.append(entry)
+        else:
+            unchanged += 1
+    if not checksum:
+        return FileChanges(new, modified, [], unchanged)
+
+    to_hash = new + modified
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="porter-checksums"
+    ) as executor:
+        checksums = list(executor.map(_checksum, [entry.path for entry in to_hash]))
+    new = [entry._replace(checksum=value) for entry, value in zip(new, checksums)]
+    changed, touched = [], []
+    for entry, value in zip(modified, checksums[len(new) :]):
+        entry = entry._replace(checksum=value)
+        previous = manifest[entry.path]
+        if previous.size == entry.size and previous.checksum == value:
+            touched.append(entry)
+        else:
+            changed.append(entry)
+    return FileChanges(new, changed, touched, unchanged)
+
+
+def apply_manifest(
+    source: FileSource, dataset: FileDataset, store: MetadataStore, pipeline_name: str
+) -> Optional[FileChanges]:
+    """Make the source read only the files of the dataset which are new or changed since they were last ingested.
+    Returns the changes to commit once the dataset is loaded, None if the dataset has no manifest.
+    When no file needs to be ingested `to_ingest` is empty, and the dataset should be skipped.
+    """
+    if dataset.manifest is None:
+        return None
+
+    started_at = time.monotonic()
+    entries = _stat(source.list_files(dataset))
+    changes = diff_files(
+        entries,
+        store.get_file_manifest(pipeline_name, dataset.name),
+        checksum=dataset.manifest.checksum,
+        max_workers=dataset.max_parallel_files,
+    )
+    source.select_files(dataset, [entry.path for entry in changes.to_ingest])
+    log.info(
+        f"Dataset {dataset.name}: {len(changes.new)} new and {len(changes.changed)} changed files to ingest, "
+        f"{changes.unchanged + len(changes.touched)} files already ingested "
+        f"(compared in {time.monotonic() - started_at:.2f}s)"
+    )
+    return changes
+
+
+def commit_manifest(
+    store: MetadataStore,
+    pipeline_name: str,
+    dataset: FileDataset,
+    changes: Optional[FileChanges],
+):
+    """Record the files of a successfully loaded dataset as ingested."""
+    if changes is None:
+        return
+    updated = changes.changed + changes.touched
+    if not changes.new and not updated:
+        return
+    store.save_file_manifest(pipeline_name, dataset.name, changes.new, updated)
+    log.info(
+        f"Dataset {dataset.name}: recorded {len(changes.new) + len(updated)} ingested files"
+    )
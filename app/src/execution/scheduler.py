@@ -0,0 +1,268 @@
+"""Concurrent extraction of the datasets of a pipeline into the `duck_internal` engine.
+
+Datasets are independent of each other, so they're extracted at the same time instead of one after the other,
+and the extraction takes about as long as the slowest dataset instead of the sum of all of them.
+- At most `max_concurrent_datasets` datasets are extracted at the same time.
+- Each source has a cap on the number of connections used at the same time (the `pool_size` of the source),
+  a dataset extracted with `num_executors` executors uses that many connections.
+- The largest datasets are started first, so that a large dataset doesn't start last and hold up the job.
+- Datasets missing from a source are waited on together before the extraction is planned (`src.sources.watchers`).
+"""
+
+__all__ = [
+    "ExtractionTask",
+    "ExtractionResult",
+    "DatasetScheduler",
+    "plan_extraction",
+    "extract_dataset",
+]
+
+
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from pydantic import BaseModel, ConfigDict
+
+from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.enums.common import Status
+from src.models.dataset.base import Dataset
+from src.models.dataset.table import TableDataset
+from src.sources.base import Source
+from src.sources.connection_pool import ConnectionPool
+from src.sources.database.base import DatabaseSource
+from src.sources.database.duckdb.duckdb_source import DuckDBSource
+from src.sources.database.partitioning import extract_table_in_parallel
+from src.sources.watchers import wait_for_datasets
+
+
+class ExtractionTask(BaseModel):
+    """One dataset to be extracted from a source."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    dataset: Dataset
+    source_name: str
+    # number of connections to the source used by the extraction
+    connections: int = 1
+    # relative size of the dataset, comparable between datasets of the same source, None if unknown
+    estimated_size: Optional[int] = None
+
+
+class ExtractionResult(BaseModel):
+    """Outcome of the extraction of one dataset."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    dataset_name: str
+    source_name: str
+    status: Status
+    result: Any = None
+    exception: Optional[BaseException] = None
+    queued_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        """Time taken by the extraction."""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+def plan_extraction(
+    source_name: str, source: Source, datasets: List[Dataset]
+) -> List[ExtractionTask]:
+    """One ExtractionTask per dataset of the source, with the size estimated by the source.
+    Datasets missing from the source are handled first as per their `on_dataset_missing`,
+    the ones to wait for are all waited on at the same time.
+    """
+    tasks = []
+    for dataset in wait_for_datasets(source, datasets):
+        try:
+            estimated_size = source.estimate_size(dataset)
+        except Exception as e:
+            log.debug(f"Could not estimate the size of {dataset.name}: {e!r}")
+            estimated_size = None
+        tasks.append(
+            ExtractionTask(
+                dataset=dataset,
+                source_name=source_name,
+                connections=getattr(dataset.args, "num_executors", 1),
+                estimated_size=estimated_size,
+            )
+        )
+    return tasks
+
+
+def extract_dataset(
+    task: ExtractionTask,
+    pool: ConnectionPool,
+    engine: DuckDBSource,
+    staging_dir: Path,
+    materialize: bool = True,
+) -> Any:
+    """Extract the dataset of the task into the engine.
+    Table datasets with more than one executor are range partitioned and extracted by worker processes,
+    which open their own connections, all the other datasets are read on a connection borrowed from the pool.
+    """
+    dataset = task.dataset
+    if isinstance(dataset, TableDataset) and task.connections > 1:
+        source = pool.template(task.source_name)
+        if isinstance(source, DatabaseSource):
+            return extract_table_in_parallel(
+                source, dataset, staging_dir, engine=engine, materialize=materialize
+            )
+    with pool.acquire(task.source_name) as source:
+        return engine.load_dataset(source, dataset, materialize=materialize)
+
+
+class DatasetScheduler:
+    """Runs the extraction of datasets on a pool of threads, largest first,
+    within a global cap and a cap on the connections used on each source.
+
+    Example:
+        ```python
+        scheduler = DatasetScheduler.from_pool(max_concurrent=8, pool=pool)
+        results = scheduler.run(tasks, lambda task: extract_dataset(task, pool, engine, staging_dir))
+        ```
+    """
+
+    def __init__(
+        self, max_concurrent: int, source_limits: Optional[Dict[str, int]] = None
+    ):
+        """Initializes the scheduler.
+
+        Args:
+            max_concurrent: Max number of datasets extracted at the same time.
+            source_limits: Max number of connections used at the same time on each source,
+                sources which are not listed are only limited by `max_concurrent`.
+        """
+        if max_concurrent < 1:
+            raise exc.PorterException(
+                f"max_concurrent should be >= 1, got {max_concurrent}"
+            )
+        self.max_concurrent = max_concurrent
+        self.source_limits = source_limits or {}
+
+    @classmethod
+    def from_pool(cls, max_concurrent: int, pool: ConnectionPool) -> "DatasetScheduler":
+        """Scheduler which uses at most as many connections on each source as its pool has,
+        the `pool_size` of the source config unless it was registered with another max size.
+        """
+        return cls(max_concurrent, source_limits=pool.max_sizes())
+
+    def source_limit(self, source_name: str) -> int:
+        """Max number of connections used at the same time on the source."""
+        return self.source_limits.get(source_name, self.max_concurrent)
+
+    @staticmethod
+    def order(tasks: List[ExtractionTask]) -> List[int]:
+        """Indexes of the tasks in the order they are started, the largest first.
+        Datasets of unknown size are started before all the others, as they could be the largest.
+        """
+        return sorted(
+            range(len(tasks)),
+            key=lambda idx: (
+                tasks[idx].estimated_size is not None,
+                -(tasks[idx].estimated_size or 0),
+            ),
+        )
+
+    def run(
+        self,
+        tasks: List[ExtractionTask],
+        extract: Callable[[ExtractionTask], Any],
+        raise_on_failure: bool = True,
+    ) -> List[ExtractionResult]:
+        """Extract all the datasets and return one ExtractionResult per task, in the same order as `tasks`.
+
+        Args:
+            tasks: Datasets to be extracted.
+            extract: Called with the task in a worker thread, returns the result of the extraction.
+            raise_on_failure: Raise PorterException if any of the extractions failed,
+                the other extractions are still run to the end.
+        """
+        results = [
+            ExtractionResult(
+                dataset_name=task.dataset.name,
+                source_name=task.source_name,
+                status=Status.in_progress,
+            )
+            for task in tasks
+        ]
+        pending = self.order(tasks)
+        connections_in_use: Dict[str, int] = defaultdict(int)
+        running: Dict[Future, int] = {}
+        created_at = time.time()
+
+        def run_task(idx: int):
+            results[idx].started_at = time.time()
+            try:
+                return extract(tasks[idx])
+            finally:
+                results[idx].finished_at = time.time()
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_concurrent, thread_name_prefix="porter-extract"
+        ) as pool:
+            while pending or running:
+                # tasks of a source are started in order, once one of them doesn't fit the later ones wait as well,
+                # otherwise small datasets would keep taking the connections a large dataset is waiting for
+                blocked: Set[str] = set()
+                for idx in list(pending):
+                    if len(running) >= self.max_concurrent:
+                        break
+                    task = tasks[idx]
+                    if task.source_name in blocked:
+                        continue
+                    limit = self.source_limit(task.source_name)
+                    connections = min(task.connections, limit)
+                    if connections_in_use[task.source_name] + connections > limit:
+                        blocked.add(task.source_name)
+                        continue
+                    connections_in_use[task.source_name] += connections
+                    pending.remove(idx)
+                    results[idx].queued_seconds = time.time() - created_at
+                    running[pool.submit(run_task, idx)] = idx
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx = running.pop(future)
+                    task = tasks[idx]
+                    connections_in_use[task.source_name] -= min(
+                        task.connections, self.source_limit(task.source_name)
+                    )
+                    result = results[idx]
+                    try:
+                        result.result = future.result()
+                        result.status = Status.success
+                        log.info(
+                            f"Extracted dataset {task.dataset.name} from {task.source_name} "
+                            f"in {result.elapsed_seconds:.2f}s (queued: {result.queued_seconds:.2f}s)"
+                        )
+                    except Exception as e:
+                        result.status = Status.failure
+                        result.exception = e
+                        log.error(
+                            f"Failed to extract dataset {task.dataset.name} from {task.source_name}: {e!r}"
+                        )
+
+        total = time.time() - created_at
+        slowest = max((r.elapsed_seconds for r in results), default=0.0)
+        log.info(
+            f"Extracted {len(results)} datasets in {total:.2f}s "
+            f"(slowest dataset: {slowest:.2f}s, sum of all: {sum(r.elapsed_seconds for r in results):.2f}s)"
+        )
+
+        failed = [r for r in results if r.status != Status.success]
+        if failed and raise_on_failure:
+            raise exc.PorterException(
+                f"{len(failed)} out of {len(results)} datasets failed to extract: "
+                f"{[r.dataset_name for r in failed]}"
+            ) from failed[0].exception
+        return results
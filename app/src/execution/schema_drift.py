@@ -0,0 +1,119 @@
+"""Schema drift detection of datasets using a fingerprint of their schema kept in the metadata store.
+
+The schema of the dataset is read from the source without reading any data (Example: footers of parquet files,
+an empty query on a database) and hashed from the names, types and nullability of its columns.
+The fingerprint is compared to the one of the last run, the schemas are only compared column by column when it
+changed, so a dataset whose schema didn't change costs a single lookup in the metadata store.
+On drift the dataset fails or warns according to its `on_schema_drift`.
+"""
+
+__all__ = ["schema_fields", "fingerprint", "diff_schemas", "check_schema_drift"]
+
+
+import hashlib
+import json
+from typing import List, Optional, Tuple
+
+import pyarrow as pa
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.enums.common import ExceptionType
+from src.metadata.store import MetadataStore, SchemaFingerprint
+from src.models.dataset.base import Dataset
+from src.sources.base import Source
+
+
+def schema_fields(schema: pa.Schema) -> List[Tuple[str, str, bool]]:
+    """(name, type, nullable) of each column of the schema, in order."""
+    return [(field.name, str(field.type), field.nullable) for field in schema]
+
+
+def fingerprint(fields: List[Tuple[str, str, bool]]) -> str:
+    """sha256 of the fields, columns in another order give another fingerprint."""
+    return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+
+def diff_schemas(
+    previous: List[Tuple[str, str, bool]], current: List[Tuple[str, str, bool]]
+) -> List[str]:
+    """Changes between two schemas, as messages (Example: `column amount: type changed from int64 to string`)."""
+    before = {name: (datatype, nullable) for name, datatype, nullable in previous}
+    after = {name: (datatype, nullable) for name, datatype, nullable in current}
+    changes = []
+    for name, (datatype, _) in before.items():
+        if name not in after:
+            changes.append(f"column {name}: removed (was {datatype})")
+    for name, (datatype, nullable) in after.items():
+        if name not in before:
+            changes.append(f"column {name}: added ({datatype})")
+            continue
+        previous_type, previous_nullable = before[name]
+        if previous_type != datatype:
+            changes.append(
+                f"column {name}: type changed from {previous_type} to {datatype}"
+            )
+        if previous_nullable != nullable:
+            changes.append(
+                f"column {name}: {'now' if nullable else 'no longer'} nullable"
+            )
+    if not changes and [field[0] for field in previous] != [
+        field[0] for field in current
+    ]:
+        changes.append("columns reordered")
+    return changes
+
+
+def _missing_columns(dataset: Dataset, schema: pa.Schema) -> List[str]:
+    """Columns of the dataset which the source doesn't have, names are compared case-insensitively."""
+    names = {name.lower() for name in schema.names}
+    return [
+        f"column {column.name}: declared in the dataset but missing at the source"
+        for column in dataset.columns or []
+        if column.name.lower() not in names
+    ]
+
+
+def check_schema_drift(
+    source: Source, dataset: Dataset, store: MetadataStore, pipeline_name: str
+) -> Optional[List[str]]:
+    """Compare the schema of the dataset at the source to the one of the last check.
+    Returns the changes found (empty when the schema didn't change), None if the source can't read the schema
+    without reading the data.
+    Raises PorterException on drift when `on_schema_drift` is error, the last schema is then kept so that the next
+    runs fail as well until the drift is resolved. Otherwise the new schema is saved for the next check.
+    """
+    try:
+        schema = source.read_schema(dataset)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # the files of the dataset don't agree on the types of their columns
+        schema, changes = None, [f"files have conflicting schemas, {e}"]
+    else:
+        if schema is None:
+            log.debug(f"Dataset {dataset.name}: schema drift not checked")
+            return None
+        changes = _missing_columns(dataset, schema)
+
+    current = None
+    if schema is not None:
+        fields = schema_fields(schema)
+        current = SchemaFingerprint(fingerprint(fields), fields)
+        previous = store.get_schema_fingerprint(pipeline_name, dataset.name)
+        if previous is not None and previous.fingerprint != current.fingerprint:
+            changes += diff_schemas(previous.fields, current.fields)
+        elif previous is not None and not changes:
+            return changes
+
+    if changes:
+        message = (
+            f"Dataset {dataset.name}: schema drift at the source, {'; '.join(changes)}"
+        )
+        if dataset.on_schema_drift == ExceptionType.error:
+            raise exc.PorterException(message)
+        if dataset.on_schema_drift == ExceptionType.warning:
+            log.warning(message)
+        else:
+            log.debug(message)
+    if current is not None:
+        store.set_schema_fingerprint(pipeline_name, dataset.name, current)
+    return changes
@@ -0,0 +1,300 @@
+"""Metadata store backed by any database supported by SQLAlchemy (`metadata` dependency group)."""
+
+__all__ = [
+    "MetadataStore",
+    "ManifestEntry",
+    "SchemaFingerprint",
+    "encode_value",
+    "decode_value",
+]
+
+
+import datetime
+import json
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.common import exceptions as exc
+from src.models.metadata import MetadataStoreConfig
+
+
+def encode_value(value: Any) -> Optional[str]:
+    """Encode a python value as JSON with its type, so that it is decoded back to the same type."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        kind = "bool"
+    elif isinstance(value, int):
+        kind = "int"
+    elif isinstance(value, float):
+        kind = "float"
+    elif isinstance(value, Decimal):
+        kind, value = "decimal", str(value)
+    elif isinstance(value, datetime.datetime):
+        kind, value = "datetime", value.isoformat()
+    elif isinstance(value, datetime.date):
+        kind, value = "date", value.isoformat()
+    elif isinstance(value, str):
+        kind = "str"
+    else:
+        raise exc.PorterException(
+            f"Values of type {type(value).__name__} can't be stored in the metadata store"
+        )
+    return json.dumps({"type": kind, "value": value})
+
+
+def decode_value(encoded: Optional[str]) -> Any:
+    """Decode a value encoded with `encode_value`."""
+    if encoded is None:
+        return None
+    payload = json.loads(encoded)
+    kind, value = payload["type"], payload["value"]
+    if kind == "decimal":
+        return Decimal(value)
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(value)
+    if kind == "date":
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+class ManifestEntry(NamedTuple):
+    """State of an ingested file, a file whose size or modification time changes is ingested again."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    # sha256 of the content, only when the dataset asks for checksums
+    checksum: Optional[str] = None
+
+
+class SchemaFingerprint(NamedTuple):
+    """Last schema seen for a dataset, as (name, type, nullable) fields, and the hash of the fields."""
+
+    fingerprint: str
+    fields: List[Tuple[str, str, bool]]
+
+
+# rows written per statement when saving the file manifest
+_MANIFEST_CHUNK_SIZE = 500
+
+
+class MetadataStore:
+    """Keeps the state of the jobs (Example: watermarks of incremental datasets) in the metadata database.
+    Tables are created on first use, existing rows are never deleted by Porter.
+    """
+
+    def __init__(self, config: MetadataStoreConfig):
+        """Connects lazily to the metadata database of the config."""
+        self.config = config
+        self._engine = None
+        self._tables = None
+
+    @property
+    def engine(self):
+        """SQLAlchemy engine of the metadata database, the tables are created when it's first used."""
+        if self._engine is None:
+            try:
+                import sqlalchemy as sa
+            except ImportError as e:
+                raise exc.PorterException(
+                    "Metadata store needs the `metadata` dependency group, install sqlalchemy"
+                ) from e
+
+            self._engine = sa.create_engine(self.config.url, future=True)
+            self._tables = self._define_tables(sa)
+            self._tables["_metadata"].create_all(self._engine)
+        return self._engine
+
+    def table(self, name: str):
+        """Returns the SQLAlchemy table with the given (un-prefixed) name."""
+        _ = self.engine
+        return self._tables[name]
+
+    def _define_tables(self, sa) -> dict:
+        """SQLAlchemy definitions of all the tables in the metadata database."""
+        prefix = self.config.table_prefix
+        metadata = sa.MetaData()
+        watermarks = sa.Table(
+            f"{prefix}watermarks",
+            metadata,
+            sa.Column("pipeline_name", sa.String(255), primary_key=True),
+            sa.Column("dataset_name", sa.String(255), primary_key=True),
+            sa.Column("watermark_column", sa.String(1024), nullable=False),
+            sa.Column("watermark_value", sa.Text, nullable=True),
+            sa.Column("updated_at", sa.DateTime, nullable=False),
+        )
+        file_manifest = sa.Table(
+            f"{prefix}file_manifest",
+            metadata,
+            sa.Column("pipeline_name", sa.String(255), primary_key=True),
+            sa.Column("dataset_name", sa.String(255), primary_key=True),
+            sa.Column("path", sa.String(1024), primary_key=True),
+            sa.Column("size", sa.BigInteger, nullable=False),
+            sa.Column("mtime_ns", sa.BigInteger, nullable=False),
+            sa.Column("checksum", sa.String(64), nullable=True),
+            sa.Column("ingested_at", sa.DateTime, nullable=False),
+        )
+        schema_fingerprints = sa.Table(
+            f"{prefix}schema_fingerprints",
+            metadata,
+            sa.Column("pipeline_name", sa.String(255), primary_key=True),
+            sa.Column("dataset_name", sa.String(255), primary_key=True),
+            sa.Column("fingerprint", sa.String(64), nullable=False),
+            sa.Column("schema_fields", sa.Text, nullable=False),
+            sa.Column("updated_at", sa.DateTime, nullable=False),
+        )
+        return {
+            "_metadata": metadata,
+            "watermarks": watermarks,
+            "file_manifest": file_manifest,
+            "schema_fingerprints": schema_fingerprints,
+        }
+
+    def get_watermark(
+        self, pipeline_name: str, dataset_name: str, watermark_column: str
+    ) -> Any:
+        """Returns the last high-water mark of the dataset, None if it was never loaded.
+        A watermark captured for a different column is ignored, as it can't be compared.
+        """
+        watermarks = self.table("watermarks")
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                watermarks.select().where(
+                    watermarks.c.pipeline_name == pipeline_name,
+                    watermarks.c.dataset_name == dataset_name,
+                )
+            ).first()
+        if row is None or row.watermark_column != watermark_column:
+            return None
+        return decode_value(row.watermark_value)
+
+    def set_watermark(
+        self,
+        pipeline_name: str,
+        dataset_name: str,
+        watermark_column: str,
+        value: Any,
+    ):
+        """Save the high-water mark of the dataset, replacing the previous one."""
+        watermarks = self.table("watermarks")
+        row = {
+            "watermark_column": watermark_column,
+            "watermark_value": encode_value(value),
+            "updated_at": datetime.datetime.now(datetime.timezone.utc).replace(
+                tzinfo=None
+            ),
+        }
+        key = (
+            watermarks.c.pipeline_name == pipeline_name,
+            watermarks.c.dataset_name == dataset_name,
+        )
+        with self.engine.begin() as connection:
+            updated = connection.execute(watermarks.update().where(*key).values(**row))
+            if updated.rowcount == 0:
+                connection.execute(
+                    watermarks.insert().values(
+                        pipeline_name=pipeline_name, dataset_name=dataset_name, **row
+                    )
+                )
+
+    def get_file_manifest(
+        self, pipeline_name: str, dataset_name: str
+    ) -> Dict[str, ManifestEntry]:
+        """Returns the files ingested for the dataset by path, read in a single query."""
+        import sqlalchemy as sa
+
+        manifest = self.table("file_manifest")
+        query = sa.select(
+            manifest.c.path, manifest.c.size, manifest.c.mtime_ns, manifest.c.checksum
+        ).where(
+            manifest.c.pipeline_name == pipeline_name,
+            manifest.c.dataset_name == dataset_name,
+        )
+        with self.engine.connect() as connection:
+            return {
+                row[0]: ManifestEntry._make(row) for row in connection.execute(query)
+            }
+
+    def save_file_manifest(
+        self,
+        pipeline_name: str,
+        dataset_name: str,
+        new: Iterable[ManifestEntry],
+        updated: Iterable[ManifestEntry] = (),
+    ):
+        """Record the files as ingested, `updated` files replace their previous state.
+        Rows are written in chunks within a single transaction, so a failed save leaves the manifest as it was.
+        """
+        manifest = self.table("file_manifest")
+        ingested_at = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        updated = list(updated)
+        entries = list(new) + updated
+        with self.engine.begin() as connection:
+            for start in range(0, len(updated), _MANIFEST_CHUNK_SIZE):
+                chunk = updated[start : start + _MANIFEST_CHUNK_SIZE]
+                connection.execute(
+                    manifest.delete().where(
+                        manifest.c.pipeline_name == pipeline_name,
+                        manifest.c.dataset_name == dataset_name,
+                        manifest.c.path.in_([entry.path for entry in chunk]),
+                    )
+                )
+            for start in range(0, len(entries), _MANIFEST_CHUNK_SIZE):
+                connection.execute(
+                    manifest.insert(),
+                    [
+                        {
+                            "pipeline_name": pipeline_name,
+                            "dataset_name": dataset_name,
+                            "ingested_at": ingested_at,
+                            **entry._asdict(),
+                        }
+                        for entry in entries[start : start + _MANIFEST_CHUNK_SIZE]
+                    ],
+                )
+
+    def get_schema_fingerprint(
+        self, pipeline_name: str, dataset_name: str
+    ) -> Optional[SchemaFingerprint]:
+        """Returns the last schema seen for the dataset, None if it was never checked."""
+        fingerprints = self.table("schema_fingerprints")
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                fingerprints.select().where(
+                    fingerprints.c.pipeline_name == pipeline_name,
+                    fingerprints.c.dataset_name == dataset_name,
+                )
+            ).first()
+        if row is None:
+            return None
+        return SchemaFingerprint(
+            row.fingerprint, [tuple(field) for field in json.loads(row.schema_fields)]
+        )
+
+    def set_schema_fingerprint(
+        self, pipeline_name: str, dataset_name: str, schema: SchemaFingerprint
+    ):
+        """Save the schema seen for the dataset, replacing the previous one."""
+        fingerprints = self.table("schema_fingerprints")
+        row = {
+            "fingerprint": schema.fingerprint,
+            "schema_fields": json.dumps(schema.fields),
+            "updated_at": datetime.datetime.now(datetime.timezone.utc).replace(
+                tzinfo=None
+            ),
+        }
+        key = (
+            fingerprints.c.pipeline_name == pipeline_name,
+            fingerprints.c.dataset_name == dataset_name,
+        )
+        with self.engine.begin() as connection:
+            updated = connection.execute(
+                fingerprints.update().where(*key).values(**row)
+            )
+            if updated.rowcount == 0:
+                connection.execute(
+                    fingerprints.insert().values(
+                        pipeline_name=pipeline_name, dataset_name=dataset_name, **row
+                    )
+                )
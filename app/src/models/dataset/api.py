@@ -1,10 +1,67 @@
 """Dataset model for api-based datasets."""
 
-__all__ = ["ApiDataset"]
+__all__ = ["ApiDataset", "PaginationConfig"]
 
-from typing import Optional
-from pydantic import Field
+from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field, model_validator
 from src.models.dataset.base import Dataset
+from src.enums.datasets import PaginationType
+from src.common import exceptions as exc
+
+
+class PaginationConfig(BaseModel):
+    """Model representing how the pages of an API response are fetched."""
+
+    type: PaginationType = Field(
+        ...,
+        description="How the next page is requested: `cursor` sends the cursor found in the response, `offset` "
+        'sends the offset of the page, `link_header` follows the `rel="next"` URL of the Link header.',
+        examples=[p.value for p in PaginationType],
+    )
+    page_size: int = Field(
+        default=100,
+        gt=0,
+        description="Number of records requested per page, sent as the `limit_param` query parameter.",
+    )
+    limit_param: Optional[str] = Field(
+        default="limit",
+        description="Query parameter of the page size, None to not send it (the API decides the page size). "
+        "Required for `offset` pagination, as the offsets of the pages are computed from the page size.",
+        examples=["limit", "per_page", "page_size"],
+    )
+    offset_param: str = Field(
+        default="offset",
+        description="Query parameter of the offset of the page, for `offset` pagination.",
+    )
+    cursor_param: str = Field(
+        default="cursor",
+        description="Query parameter of the cursor of the page, for `cursor` pagination.",
+    )
+    cursor_path: Optional[str] = Field(
+        default=None,
+        description="Dotted path of the cursor of the next page in the response, for `cursor` pagination. "
+        "The last page is the one without a cursor.",
+        examples=["next_cursor", "meta.next"],
+    )
+    max_pages: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description="Stop after this many pages, all the pages are fetched by default.",
+    )
+
+    @model_validator(mode="after")
+    def validate_cursor(self):
+        """Cursor pagination needs to know where the cursor is in the response."""
+        if self.type == PaginationType.cursor and not self.cursor_path:
+            raise exc.PorterException("cursor_path is required for cursor pagination")
+        return self
+
+    @model_validator(mode="after")
+    def validate_offset(self):
+        """Offsets are multiples of the page size, so the API has to be told the page size."""
+        if self.type == PaginationType.offset and not self.limit_param:
+            raise exc.PorterException("limit_param is required for offset pagination")
+        return self
 
 
 class ApiDataset(Dataset):
@@ -17,3 +74,33 @@ class ApiDataset(Dataset):
     auth_url: Optional[str] = Field(
         None, description="Authentication URL to get access token if required"
     )
+    params: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Query parameters sent with every request.",
+        examples=[{"status": "active"}],
+    )
+    headers: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Headers sent with every request, on top of the headers of the source.",
+        examples=[{"Accept": "application/json"}],
+    )
+    records_path: Optional[str] = Field(
+        None,
+        description="Dotted path of the list of records in the response, None when the response is the list.",
+        examples=["data", "result.items"],
+    )
+    pagination: Optional[PaginationConfig] = Field(
+        None,
+        description="How to fetch the pages of the response, None for a single request.",
+    )
+    max_concurrent_requests: int = Field(
+        default=4,
+        ge=1,
+        description="Max number of pages requested at the same time. Only offset pagination can fetch pages "
+        "ahead, cursor and link header pagination need each page to request the next one.",
+    )
+    batch_size: int = Field(
+        default=100_000,
+        gt=0,
+        description="Number of records of each Arrow batch the pages are combined into.",
+    )
@@ -5,6 +5,7 @@ __all__ = ["Dataset", "Column", "OnDatasetMissing"]
 from typing import Optional, List, Dict, Literal, ClassVar, Type
 
 from pydantic import BaseModel, Field, model_validator
+from src.enums.common import ExceptionType
 from src.enums.datasets import OnDatasetMissingActions
 from src.common import exceptions as exc
 from src.models.common import DummyModel
@@ -19,8 +20,16 @@ class Column(BaseModel):
         description="The target name of the column, if not passed will default to the name of the column",
     )
     datatype: Optional[str] = Field(None, description="The datatype of the column")
-    precision: Optional[int] = Field(None, description="The precision of the column")
-    scale: Optional[int] = Field(None, description="The scale of the column")
+    precision: Optional[int] = Field(
+        None,
+        description="The precision of the column. For fixed width files this is the width of the column "
+        "in characters, the columns are laid out in the order they're listed",
+    )
+    scale: Optional[int] = Field(
+        None,
+        description="The scale of the column. For fixed width files, decimal values without a decimal point "
+        "have an implied one before the last `scale` digits (Example: 0001234 with a scale of 2 is 12.34)",
+    )
 
 
 class OnDatasetMissing(BaseModel):
@@ -33,14 +42,24 @@ class OnDatasetMissing(BaseModel):
     )
     poll_interval: int = Field(
         default=60,
-        description="Interval in seconds to poll for the dataset if action is to wait.",
+        description="Max interval in seconds between two checks for the dataset if action is to wait. "
+        "Checks start every `initial_poll_interval` seconds and back off (with jitter) up to this interval, "
+        "local files are watched and picked up as soon as they land.",
         examples=[60, 120],
     )
     poll_count: int = Field(
-        deafult=10,
-        description="Number of times to poll for the dataset if action is to wait.",
+        default=10,
+        description="Number of poll intervals to wait for the dataset if action is to wait, "
+        "the dataset is waited on for up to `poll_interval` * `poll_count` seconds.",
         examples=[5, 10],
     )
+    initial_poll_interval: float = Field(
+        default=1,
+        gt=0,
+        description="Interval in seconds of the first check for the dataset if action is to wait, "
+        "it doubles after each check up to `poll_interval`.",
+        examples=[1, 5],
+    )
     post_poll_dataset_missing_action: Literal[
         OnDatasetMissingActions.error, OnDatasetMissingActions.warning
     ] = Field(
@@ -75,11 +94,25 @@ class Dataset(BaseModel):
         ],
     )
 
+    key_columns: Optional[List[str]] = Field(
+        None,
+        description="Columns which uniquely identify a row of the dataset, used to upsert the dataset into the targets.",
+        examples=[["id"], ["order_id", "line_number"]],
+    )
+
     on_dataset_missing: OnDatasetMissing = Field(
         default_factory=OnDatasetMissing,
         description="Action to take when the dataset is missing.",
     )
 
+    on_schema_drift: ExceptionType = Field(
+        default=ExceptionType.warning,
+        description="Action to take when the schema of the dataset at the source changed since it was last checked "
+        "(columns added, removed or retyped) or misses some of its `columns`. "
+        "The schema is read from the source without reading any data (Example: footers of parquet files).",
+        examples=[exe.value for exe in ExceptionType],
+    )
+
     metadata: Dict[str, str] = Field(
         default_factory=lambda data: {"name": data.get("name")},
         description="Metadata for the dataset. By default includes the name of the dataset you dont have to pass it",
@@ -1,12 +1,58 @@
 """Dataset model for file-based datasets."""
 
-__all__ = ["FileDataset"]
+__all__ = ["FileDataset", "FileArgs", "FileManifestConfig"]
 
-from typing import Optional
-from pydantic import Field
+from typing import Any, ClassVar, List, Optional, Tuple, Type
+from pydantic import BaseModel, Field, field_validator
 from src.models.dataset.base import Dataset
+from src.models.dataset.table import IncrementalConfig
 from src.enums import datasets, common
 
+# Operators which can be used in the `filters` of a file dataset
+FILTER_OPERATORS = ("=", "==", "!=", "<", "<=", ">", ">=", "in", "not in")
+
+
+class FileArgs(BaseModel):
+    """Model representing the args accepted by File-based datasets."""
+
+    header: bool = Field(
+        default=True,
+        description="CSV files start with a header with the names of the columns.",
+    )
+    delimiter: str = Field(
+        default=",", description="Delimiter of the values of CSV files."
+    )
+    skip_rows: int = Field(
+        default=0,
+        ge=0,
+        description="Number of records to skip at the start of each file, before the header of CSV files "
+        "(Example: the header record of a mainframe extract).",
+    )
+    encoding: str = Field(
+        default="utf-8",
+        description="Encoding of CSV and fixed width files, it should encode the newline as ASCII does "
+        "(Example: latin-1, cp1252). EBCDIC extracts should be converted to ASCII first.",
+    )
+    chunk_size: int = Field(
+        default=64 * 1024 * 1024,
+        gt=0,
+        # the records of a chunk are addressed with 32-bit offsets, a chunk ends at the record after this size
+        le=1024 * 1024 * 1024,
+        description="Size in bytes of the chunks CSV and fixed width files are split into when read with the "
+        "pyarrow engine, the chunks of a file are decoded in parallel. At most 1GB.",
+    )
+
+
+class FileManifestConfig(BaseModel):
+    """Model representing the settings of the manifest of the files ingested for a File-based dataset."""
+
+    checksum: bool = Field(
+        default=False,
+        description="Also compare the content (sha256) of the files whose modification time changed, so that files "
+        "copied again with the same content are not ingested again. Checksums are computed only for new files "
+        "and files whose modification time changed.",
+    )
+
 
 class FileDataset(Dataset):
     """Dataset model for file-based datasets.
@@ -22,7 +68,9 @@ class FileDataset(Dataset):
     )
     engine: common.Engine = Field(
         common.Engine.pandas,
-        description="Which Engine to use to read the file, By default PANDAS is used",
+        description="Which Engine to use to read the file, By default PANDAS is used. "
+        "DuckDB (parquet/csv/json) and pyarrow (parquet/csv/json/orc/fixed width) read the files faster, "
+        "with less memory",
         examples=[e.name for e in common.Engine],
     )
     file_pattern: Optional[str] = Field(
@@ -46,5 +94,52 @@ class FileDataset(Dataset):
     )
     is_partitioned: Optional[bool] = Field(
         False,
-        description="Indicates if the dataset is partitioned with subdirectories.",
+        description="Indicates if the dataset is partitioned with subdirectories. The keys of `key=value` "
+        "directories (Example: dt=2024-01-31/region=EMEA) are read as typed columns, and partition directories "
+        "which can't match the `filters` are skipped without being listed.",
+    )
+    filters: Optional[List[Tuple[str, str, Any]]] = Field(
+        None,
+        description="Rows to read, as a list of (column, operator, value) which should all be true. "
+        f"Operators: {', '.join(FILTER_OPERATORS)}. The filters (and the `columns` of the dataset) are pushed "
+        "down to the file reader, so row groups and columns which are not needed are never read.",
+        examples=[
+            [["region", "=", "EMEA"], ["amount", ">", 0]],
+            [["status", "in", ["open", "closed"]]],
+        ],
     )
+    incremental: Optional[IncrementalConfig] = Field(
+        None,
+        description="Extract only the rows above the last captured watermark, the watermark is added to the "
+        "`filters` so partitions below it are skipped when `watermark_column` is a partition key.",
+        examples=[{"watermark_column": "dt"}],
+    )
+    manifest: Optional[FileManifestConfig] = Field(
+        None,
+        description="Ingest only the files which are new or changed since they were last ingested, the path, size, "
+        "modification time (and optionally the checksum) of each ingested file is kept in the metadata DB.",
+        examples=[{}, {"checksum": True}],
+    )
+    max_parallel_files: int = Field(
+        8,
+        ge=1,
+        description="Max number of files read at the same time.",
+    )
+    coalesce_files: bool = Field(
+        True,
+        description="Combine the rows of small files into full size batches, "
+        "so that thousands of small files don't turn into thousands of tiny batches downstream.",
+    )
+
+    args_model: ClassVar[Type[BaseModel]] = FileArgs
+
+    @field_validator("filters")
+    @classmethod
+    def validate_filters(cls, value):
+        """Validate the operator of each filter."""
+        for column, operator, _ in value or []:
+            if operator.lower() not in FILTER_OPERATORS:
+                raise ValueError(
+                    f"Operator {operator!r} of the filter on {column} is not supported, use one of {FILTER_OPERATORS}"
+                )
+        return value
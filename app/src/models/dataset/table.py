@@ -1,10 +1,15 @@
 """Dataset model for Table-based datasets."""
 
-__all__ = ["TableDataset"]
+__all__ = ["TableDataset", "TableArgs", "DynamicInputQuery", "IncrementalConfig"]
 
-from typing import Optional, Dict, List
-from pydantic import Field, BaseModel
+import re
+from typing import Any, Optional, Dict, List, ClassVar, Type
+from pydantic import Field, BaseModel, ConfigDict, field_validator, model_validator
 from src.models.dataset.base import Dataset
+from src.common import exceptions as exc
+from src.enums.datasets import PartitionStrategy
+
+_COLUMN_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_$]*$")
 
 
 class DynamicInputQuery(BaseModel):
@@ -30,9 +35,89 @@ class DynamicInputQuery(BaseModel):
     )
 
 
+class IncrementalConfig(BaseModel):
+    """Model representing the incremental extraction settings of a Table-based dataset."""
+
+    watermark_column: str = Field(
+        ...,
+        description="Column whose values only increase, like an id or an updated timestamp. Only rows above the "
+        "last captured value are extracted. It should be a column of the extracted rows (the watermark is read from "
+        "them), to use an expression (Example: GREATEST(created_at, updated_at)) define it as a column of a "
+        "query-based dataset.",
+        examples=["updated_at", "order_id"],
+    )
+    initial_value: Optional[Any] = Field(
+        default=None,
+        description="Value used when no watermark was captured yet, if not set the first run extracts all the rows.",
+        examples=["2024-01-01", 0],
+    )
+    inclusive: bool = Field(
+        default=False,
+        description="Also extract rows equal to the last captured value. Use it when more rows can arrive with "
+        "the same value (Example: timestamps with low precision), together with an upsert to avoid duplicates.",
+    )
+
+    @field_validator("watermark_column")
+    @classmethod
+    def validate_watermark_column(cls, value: str) -> str:
+        """The watermark is read back from the extracted rows, so it has to be a plain column name."""
+        if not _COLUMN_NAME.match(value):
+            raise exc.PorterException(
+                f"watermark_column should be the name of a column of the dataset, got {value!r}"
+            )
+        return value
+
+
+class TableArgs(BaseModel):
+    """Model representing the args accepted by Table-based datasets."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    num_executors: int = Field(
+        default=1,
+        ge=1,
+        description="Number of parallel executors used to extract the dataset, "
+        "requires `split-by` to be set when more than 1.",
+        examples=[4, 8],
+    )
+    split_by: Optional[str] = Field(
+        default=None,
+        alias="split-by",
+        description="Numeric or date/time column (or an expression that runs on the source) "
+        "used to split the dataset into ranges that are extracted in parallel.",
+        examples=["employee_id", "MOD(employee_id, 4)", "created_at"],
+    )
+    partition_strategy: PartitionStrategy = Field(
+        default=PartitionStrategy.range,
+        description="How the split-by range is cut into partitions. "
+        "`range` cuts the min/max range into equal width partitions, "
+        "`quantile` uses the distribution of the split-by values so that each partition has a similar number of rows, "
+        "use it when the split-by values are skewed.",
+        examples=[ps.value for ps in PartitionStrategy],
+    )
+    partitions_per_executor: int = Field(
+        default=1,
+        ge=1,
+        description="Number of partitions planned for each executor. Planning more partitions than executors lets "
+        "idle executors pick up the remaining partitions, so one oversized partition doesn't hold up the others.",
+        examples=[1, 4],
+    )
+
+    @model_validator(mode="after")
+    def validate_split_by(self):
+        """Parallel extraction is only possible when there is a column to split the dataset by."""
+        if self.num_executors > 1 and not self.split_by:
+            raise exc.PorterException(
+                "`split-by` is required when `num_executors` is more than 1"
+            )
+        return self
+
+
 class TableDataset(Dataset):
     """Dataset model for Table-based datasets."""
 
+    args_model: ClassVar[Type[BaseModel]] = TableArgs
+
     query: str = Field(
         None,
         description="Source query to fetch data from source, which becomes a dataset",
@@ -51,6 +136,12 @@ class TableDataset(Dataset):
         description="If the query has placeholders, this dictionary contains the values to bind to the placeholders",
         examples=[{"department": "Engineering"}, {"region": "North America"}],
     )
+    incremental: Optional[IncrementalConfig] = Field(
+        None,
+        description="Extract only the rows added since the last successful load, the high-water mark of "
+        "`watermark_column` is stored in the metadata DB after each successful load.",
+        examples=[{"watermark_column": "updated_at"}],
+    )
 
     dynamic_input_queries: Optional[List[DynamicInputQuery]] = Field(
         None,
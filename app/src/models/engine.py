@@ -0,0 +1,74 @@
+"""Model definitions for the `duck_internal` engine, which holds all the datasets extracted in a job."""
+
+__all__ = ["EngineConfig"]
+
+
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
+
+from src.enums.common import DatasetStorage
+
+
+class EngineConfig(BaseModel):
+    """Model representing the settings of the `duck_internal` engine.
+    By default the engine is an in-memory DuckDB database, set `database_path` to back it with a file on disk
+    and `memory_limit`/`temp_directory` to let it spill to disk, for datasets that are larger than the memory.
+    """
+
+    database_path: Optional[str] = Field(
+        default=None,
+        description="Path of the DuckDB database file backing the engine. "
+        "If not set the engine is an in-memory database.",
+        examples=["/tmp/porter/duck_internal.duckdb"],
+    )
+    memory_limit: Optional[str] = Field(
+        default=None,
+        description="Max memory the engine can use before spilling to disk, by default 80% of the RAM. "
+        "On Kubernetes set this below the memory limit of the pod.",
+        examples=["4GB", "512MB"],
+    )
+    temp_directory: Optional[str] = Field(
+        default=None,
+        description="Directory where the engine spills data which doesn't fit in `memory_limit`. "
+        "By default `<database_path>.tmp` is used for on-disk databases.",
+        examples=["/tmp/porter/spill"],
+    )
+    threads: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Number of threads used by the engine, by default the number of CPUs.",
+    )
+    preserve_insertion_order: bool = Field(
+        default=True,
+        description="Set to False to let the engine reorder rows, which reduces the memory needed by large loads.",
+    )
+    max_concurrent_datasets: int = Field(
+        default=4,
+        ge=1,
+        description="Max number of datasets extracted into the engine at the same time. "
+        "The number of connections used on each source is also limited by the `pool_size` of the source.",
+        examples=[4, 16],
+    )
+    max_concurrent_transformations: int = Field(
+        default=4,
+        ge=1,
+        description="Max number of transformations run at the same time, only transforms which don't depend "
+        "on each other run concurrently.",
+        examples=[4, 8],
+    )
+    dataset_storage: DatasetStorage = Field(
+        default=DatasetStorage.materialized,
+        description="How the datasets are stored in the engine. `materialized` copies each dataset into the engine, "
+        "`view` keeps file datasets as lazy views which read the source files on every query. "
+        "Datasets which are not files are always materialized.",
+        examples=[ds.value for ds in DatasetStorage],
+    )
+    dataset_storage_overrides: Dict[str, DatasetStorage] = Field(
+        default_factory=dict,
+        description="Override `dataset_storage` for specific datasets, keys are the names of the datasets.",
+        examples=[{"sales_data": "view", "customers": "materialized"}],
+    )
+
+    def storage_for(self, dataset_name: str) -> DatasetStorage:
+        """Returns how the given dataset should be stored in the engine."""
+        return self.dataset_storage_overrides.get(dataset_name, self.dataset_storage)
@@ -18,6 +18,8 @@ from src.models.transform import TransformConfig
 from src.models.target import TargetConfig
 from src.models.source import SourceConfig
 from src.models.secrets import SecretsBackend
+from src.models.engine import EngineConfig
+from src.models.metadata import MetadataStoreConfig
 
 
 class PorterPipeline(BaseModel):
@@ -51,31 +53,44 @@ class PorterPipeline(BaseModel):
         ..., description="List of datasets to be extracted from source"
     )
 
+    engine: EngineConfig = Field(
+        default_factory=EngineConfig,
+        description="Settings of the `duck_internal` engine which holds all the datasets extracted in the job",
+    )
+
     on_dataset_missing: Optional[OnDatasetMissing] = Field(
         None,
         description="Action to take when the dataset is missing, this applies to all the datasets. "
         "If the same is defined at dataset level, that will take precedence over this setting.",
     )
 
-    pre_validations: Optional[ValidationConfig] = Field(
+    pre_validations: Optional[List[ValidationConfig]] = Field(
         None, description="List of validations to be run before the transforms"
     )
-    pre_transformations: Optional[TransformConfig] = Field(
-        None, description="List of transformations to be run before the main transforms"
+    pre_transformations: Optional[List[TransformConfig]] = Field(
+        None,
+        description="List of transformations to be run on the extracted datasets before they are loaded, "
+        "transforms which don't depend on each other run concurrently",
     )
     targets: Union[List[Dict], List[TargetConfig]] = Field(
         ..., description="List of targets where the data should be loaded"
     )
 
-    post_validations: Optional[ValidationConfig] = Field(
+    post_validations: Optional[List[ValidationConfig]] = Field(
         None,
         description="List of validations to be run after the data is loaded into the targets",
     )
-    post_transformations: Optional[TransformConfig] = Field(
+    post_transformations: Optional[List[TransformConfig]] = Field(
         None,
-        description="List of transformations to be run after the data is loaded into the targets",
+        description="List of transformations to be run after the data is loaded into the targets, "
+        "transforms which don't depend on each other run concurrently",
     )
     metadata: Optional[Dict] = Field(..., description="Metadata for the Porter job")
+    metadata_store: Optional[MetadataStoreConfig] = Field(
+        None,
+        description="Metadata database where the state of the job is kept between runs (Example: watermarks), "
+        "required by incremental datasets, file manifests and schema drift checks",
+    )
 
     @field_validator("source", mode="before")
     @classmethod
@@ -101,6 +116,19 @@ class PorterPipeline(BaseModel):
             return SecretsBackend.model_validate(value)
         return value
 
+    @model_validator(mode="after")
+    def validate_metadata_store(self):
+        """Incremental datasets and file manifests keep their state in the metadata store, so it has to be set."""
+        if self.metadata_store is not None:
+            return self
+        for dataset in self.datasets:
+            for setting in ("incremental", "manifest"):
+                if getattr(dataset, setting, None) is not None:
+                    raise ValueError(
+                        f"Dataset {dataset.name}: `{setting}` needs the `metadata_store` of the pipeline"
+                    )
+        return self
+
     @model_validator(mode="after")
     def read_secrets_backend_config(self):
         """Read the secrets backend config file if provided and set it to the secrets_backend field"""
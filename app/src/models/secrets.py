@@ -1,15 +1,49 @@
 """Model definitions for SecretsBackend."""
 
-__all__ = ["SecretsBackend"]
+__all__ = [
+    "AwsSecretsArgs",
+    "LocalSecretsArgs",
+    "SecretsBackend",
+    "SecretArgs",
+    "SECRET_REFERENCE",
+]
 
 
 from abc import ABC
-from typing import Optional, Dict, Type, ClassVar, List, Any
-from pydantic import BaseModel, Field, model_validator
+from typing import Any, ClassVar, Dict, Iterator, List, Optional, Type
+
+from pydantic import BaseModel, Field, FilePath, model_validator
+
+from src.common import exceptions as exc
 from src.enums.secrets import SecretSource
 from src.models.common import DummyModel
 
 
+class AwsSecretsArgs(BaseModel):
+    """Args of the AWS Secrets Manager and SSM Parameter Store backends."""
+
+    region_name: Optional[str] = Field(
+        default=None,
+        description="AWS region, defaults to the region of the environment",
+    )
+    profile_name: Optional[str] = Field(
+        default=None,
+        description="AWS profile to use, defaults to the credentials of the environment",
+    )
+    endpoint_url: Optional[str] = Field(
+        default=None, description="Custom endpoint (Example: localstack)"
+    )
+
+
+class LocalSecretsArgs(BaseModel):
+    """Args of the local backend, which reads the secrets from a file instead of a secrets manager."""
+
+    path: FilePath = Field(
+        ...,
+        description="JSON/YAML file which maps each secret name to its value, meant for local runs and tests",
+    )
+
+
 class SecretsBackend(BaseModel, ABC):
     """Model representing SecretsBackend config file which allows us to define the secrets backend source."""
 
@@ -39,13 +73,101 @@ class SecretsBackend(BaseModel, ABC):
     metadata: Dict[str, str] = Field(
         default_factory=dict, description="Optional metadata for the Secrets Backend"
     )
+    max_concurrent_fetches: int = Field(
+        default=8,
+        ge=1,
+        description="Max number of (batched) calls made to the secrets source at the same time",
+    )
+    cache_ttl: int = Field(
+        default=0,
+        ge=0,
+        description="Seconds for which fetched secrets are kept in an encrypted cache on local disk, "
+        "so that the following jobs don't fetch them again. 0 disables the local cache. "
+        "The cache is encrypted with the key in the PORTER_SECRETS_CACHE_KEY environment variable",
+    )
 
     # Secrets Backend can set this args_model so that each Secrets Backend can validate the list of args users can set
     # By default no args are expected for all the Secrets Backend
     args_model: ClassVar[Type[BaseModel]] = DummyModel
+    # args expected by each secrets source, sources not listed here use args_model
+    source_args_models: ClassVar[Dict[SecretSource, Type[BaseModel]]] = {
+        SecretSource.aws_sm: AwsSecretsArgs,
+        SecretSource.aws_ssm: AwsSecretsArgs,
+        SecretSource.local: LocalSecretsArgs,
+    }
 
     @model_validator(mode="after")
     def validate_args(self):
         """Validate that all mandatory args are present in the args dictionary."""
-        self.args = self.args_model.model_validate(self.args)
+        args_model = self.source_args_models.get(self.secrets_source, self.args_model)
+        if not isinstance(self.args, args_model):
+            self.args = args_model.model_validate(self.args)
         return self
+
+
+# Key of an arg value which references a secret (Example: `client_secret: {secret: dev/api/client_secret}`)
+SECRET_REFERENCE = "secret"
+
+
+def _references(value: Any) -> Iterator[Dict]:
+    """Secret references in the value of an arg, including the ones nested in dicts and lists."""
+    if isinstance(value, dict):
+        if SECRET_REFERENCE in value:
+            yield value
+        else:
+            for item in value.values():
+                yield from _references(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _references(item)
+
+
+def _resolve(value: Any, secrets: Dict[str, Any]) -> Any:
+    """The value with its secret references replaced, `key` picks a field of a JSON secret."""
+    if isinstance(value, dict):
+        if SECRET_REFERENCE not in value:
+            return {name: _resolve(item, secrets) for name, item in value.items()}
+        secret = secrets[value[SECRET_REFERENCE]]
+        if "key" not in value:
+            return secret
+        if not isinstance(secret, dict) or value["key"] not in secret:
+            raise exc.PorterException(
+                f"Secret {value[SECRET_REFERENCE]} has no field {value['key']}"
+            )
+        return secret[value["key"]]
+    if isinstance(value, list):
+        return [_resolve(item, secrets) for item in value]
+    return value
+
+
+class SecretArgs(BaseModel):
+    """Args of a source/target which are (partly) read from the secrets backend of the pipeline.
+    The args are validated against the `args_model` once the secrets are resolved (`with_secrets`).
+    """
+
+    secrets: Optional[str] = Field(
+        default=None,
+        description="Secret holding the connection details (a JSON document), its fields are used as args. "
+        "Args set in the config take precedence over the ones of the secret.",
+        examples=["dev/postgres/sales"],
+    )
+
+    def secret_names(self) -> List[str]:
+        """Names of the secrets used by the args, none once they're resolved."""
+        args = self.args if isinstance(self.args, dict) else {}
+        names = [self.secrets] if self.secrets else []
+        names += [reference[SECRET_REFERENCE] for reference in _references(args)]
+        return list(dict.fromkeys(names))
+
+    def with_secrets(self, secrets: Dict[str, Any]):
+        """Copy of the config with the values of the secrets in its args, validated against the `args_model`."""
+        if not self.secret_names():
+            return self
+        base = secrets[self.secrets] if self.secrets else {}
+        if not isinstance(base, dict):
+            raise exc.PorterException(
+                f"Secret {self.secrets} of {self.name} should be a JSON document of args"
+            )
+        config = self.model_dump(exclude={"args", "secrets"})
+        config["args"] = {**base, **_resolve(self.args, secrets)}
+        return type(self).model_validate(config)
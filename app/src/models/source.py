@@ -7,9 +7,10 @@ from typing import ClassVar, Type, Dict, Any
 from pydantic import BaseModel, Field, model_validator
 
 from src.models.common import DummyModel
+from src.models.secrets import SecretArgs
 
 
-class SourceConfig(BaseModel):
+class SourceConfig(SecretArgs):
     """Base model for different types of data sources.
     All sources should accept this config, any additional parameters can be passed via the `args` field.
     """
@@ -28,12 +29,28 @@ class SourceConfig(BaseModel):
         default_factory=dict, description="Optional metadata for the Source"
     )
 
+    pool_size: int = Field(
+        default=4,
+        ge=1,
+        description="Max number of connections open to the source at the same time, "
+        "the connections are reused across datasets, dynamic input queries, transformations and validations",
+    )
+
+    pool_idle_timeout: int = Field(
+        default=300,
+        ge=0,
+        description="Seconds after which an unused connection of the pool is closed, 0 keeps it open until the job ends",
+    )
+
     # Source/ target can set this args_model so that each source/target can validate the list of args users can set
     # By default no args are expected for all the sources/targets
     args_model: ClassVar[Type[BaseModel]] = DummyModel
 
     @model_validator(mode="after")
     def validate_args(self):
-        """Validate that all mandatory args are present in the args dictionary."""
-        self.args = self.args_model.model_validate(self.args)
+        """Validate that all mandatory args are present in the args dictionary.
+        Args using secrets are validated once the secrets are resolved.
+        """
+        if not self.secret_names():
+            self.args = self.args_model.model_validate(self.args)
         return self
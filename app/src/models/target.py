@@ -7,8 +7,9 @@ from abc import ABC
 from typing import List, Optional, Dict, ClassVar, Type, Any
 from pydantic import Field, BaseModel, model_validator
 
-from src.enums.targets import LoadMode
+from src.enums.targets import LoadMode, MergeStrategy
 from src.models.common import DummyModel
+from src.models.secrets import SecretArgs
 
 
 class CustomWriteOptions(BaseModel):
@@ -31,9 +32,22 @@ class CustomWriteOptions(BaseModel):
         description="The load mode for this specific dataset",
         examples=[mode.name for mode in LoadMode],
     )
+    key_columns: Optional[List[str]] = Field(
+        default=None,
+        description="Columns which uniquely identify a row, required for the `upsert` mode. "
+        "Takes precedence over the key_columns of the dataset.",
+        examples=[["id"], ["order_id", "line_number"]],
+    )
+    merge_strategy: Optional[MergeStrategy] = Field(
+        default=None,
+        description="Statement used to apply the upsert, by default the target picks the best strategy it supports. "
+        "`merge` uses MERGE INTO, `insert_on_conflict` uses INSERT ... ON CONFLICT (needs a unique constraint on the keys), "
+        "`delete_insert` deletes the matching rows and inserts the new ones.",
+        examples=[ms.value for ms in MergeStrategy],
+    )
 
 
-class TargetConfig(BaseModel, ABC):
+class TargetConfig(SecretArgs, ABC):
     """Model representing a data target, inheriting from Source."""
 
     name: str = Field(..., description="The name of the target")
@@ -66,6 +80,28 @@ class TargetConfig(BaseModel, ABC):
         description="Flag indicating whether to truncate existing data in the target before loading new data",
     )
 
+    batch_size: int = Field(
+        default=100_000,
+        ge=1,
+        description="Number of rows written to the target in one batch. "
+        "The memory used by a load depends on this and not on the size of the dataset.",
+        examples=[10_000, 100_000],
+    )
+    max_buffered_batches: int = Field(
+        default=2,
+        ge=1,
+        description="Number of batches that are read ahead while the previous batch is being written to the target. "
+        "Reading waits when the target is slower, so at most this many batches are held in memory.",
+    )
+
+    max_concurrent_loads: int = Field(
+        default=1,
+        ge=1,
+        description="Max number of datasets loaded into this target at the same time, each load uses its own connection. "
+        "All the targets are loaded at the same time, this limits the load on each of them.",
+        examples=[1, 4],
+    )
+
     custom_write_options: Optional[List[CustomWriteOptions]] = Field(
         default=None,
         description="List of custom options for the target load operation",
@@ -97,6 +133,9 @@ class TargetConfig(BaseModel, ABC):
 
     @model_validator(mode="after")
     def validate_args(self):
-        """Validate that all mandatory args are present in the args dictionary."""
-        self.args = self.args_model.model_validate(self.args)
+        """Validate that all mandatory args are present in the args dictionary.
+        Args using secrets are validated once the secrets are resolved.
+        """
+        if not self.secret_names():
+            self.args = self.args_model.model_validate(self.args)
         return self
@@ -3,7 +3,7 @@
 __all__ = ["TransformConfig"]
 
 
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from pydantic import BaseModel, Field
 
 
@@ -27,3 +27,10 @@ class TransformConfig(BaseModel):
         None,
         description="If the query has placeholders, this dictionary contains the values to bind to the placeholders",
     )
+    depends_on: Optional[List[str]] = Field(
+        None,
+        description="Names of the transforms that have to run before this one. The dependencies are inferred from "
+        "the tables the SQL reads and writes, use this for dependencies that can't be seen in the SQL "
+        "(Example: a stored procedure call).",
+        examples=[["add_audit_columns"]],
+    )
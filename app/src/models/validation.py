@@ -4,7 +4,7 @@ __all__ = ["ValidationConfig"]
 
 
 from typing import Dict, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from src.enums.common import ExceptionType
 
 
@@ -12,14 +12,28 @@ class ValidationConfig(BaseModel):
     """Model representing a data validation rule."""
 
     name: str = Field(..., description="The name of the validation")
-    sql_query: str = Field(deafult=None, description="The SQL query for the validation")
+    source_name: str = Field(
+        default="duck_internal",
+        description="The name of the source in which the validation has to be ran. "
+        "Defaults to 'duck_internal', which contains all the datasets created during the job execution.",
+    )
+    sql_query: Optional[str] = Field(
+        default=None,
+        description="The SQL query for the validation. Queries of the form `SELECT <aggregate> FROM <table> [WHERE ...]` "
+        "on the same table are combined into one query, so that the table is scanned once for all of them.",
+    )
     values_to_bind: Optional[Dict] = Field(
         None,
         description="If the query has placeholders, this dictionary contains the values to bind to the placeholders",
     )
     expectation: Optional[str] = Field(
         default=None,
-        description="Python expression representing the expectation to be met by the validation result",
+        description="Python expression representing the expectation to be met by the validation result, "
+        "the result of the query is available as `source_result` and its columns by name. Only comparisons, "
+        "and/or/not, arithmetic, literals and len/abs/round/min/max/sum/all/any can be used. When the query "
+        "returns rows, the expectation has to hold for every row. Without an expectation the validation passes "
+        "when the query returns no rows or a value which is 0/NULL.",
+        examples=["source_result == 0", "source_result > 100"],
     )
     exception: str = Field(
         ..., description="The exception message if the validation fails"
@@ -35,3 +49,13 @@ class ValidationConfig(BaseModel):
     metadata: Optional[Dict] = Field(
         default=None, description="Optional metadata for the validation"
     )
+
+    @field_validator("expectation")
+    @classmethod
+    def compile_expectation(cls, value):
+        """Compile the expectation when the config is loaded, so that invalid expectations fail before the job runs."""
+        if value is not None:
+            from src.validation.expectation import compile_expectation
+
+            compile_expectation(value)
+        return value
@@ -0,0 +1 @@
+"""REST API source."""
@@ -0,0 +1,272 @@
+"""Asyncio HTTP client of the REST API source.
+
+Requests are sent with `requests` in the default executor of the event loop (`asyncio.to_thread`), so that pages
+are fetched concurrently without another HTTP dependency. The client takes care of:
+- access tokens from the `auth_url` of the dataset (client credentials), cached until they expire and shared by
+  all the datasets of the job, they're fetched again before they expire or when the API answers 401.
+- throttling: `Retry-After` and rate-limit headers (`RateLimit-Remaining`/`RateLimit-Reset` and their `X-` forms)
+  pause all the requests of the client, not only the one that got them.
+- retries of failed requests (429, 5xx, connection errors) with exponential backoff and jitter.
+"""
+
+__all__ = ["ApiArgs", "ApiClient", "Throttle"]
+
+
+import asyncio
+import datetime
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+_REMAINING_HEADERS = ("RateLimit-Remaining", "X-RateLimit-Remaining")
+_RESET_HEADERS = ("RateLimit-Reset", "X-RateLimit-Reset")
+# reset headers above this are epoch seconds, below they're seconds to wait
+_EPOCH_THRESHOLD = 1_000_000_000
+# tokens are fetched again this many seconds before they expire
+_TOKEN_EXPIRY_MARGIN = 30
+
+# access tokens by (auth_url, client_id), with the monotonic time they expire at
+_tokens: Dict[Tuple[str, Optional[str]], Tuple[str, float]] = {}
+_tokens_lock = threading.Lock()
+
+
+class ApiArgs(BaseModel):
+    """Model representing connection arguments for REST APIs."""
+
+    client_id: Optional[str] = Field(
+        default=None, description="Client id sent to the `auth_url` of the datasets."
+    )
+    client_secret: Optional[str] = Field(
+        default=None,
+        description="Client secret sent to the `auth_url` of the datasets, "
+        "reference it from the secrets backend instead of setting it in the config "
+        "(Example: `client_secret: {secret: dev/api/client_secret}`).",
+    )
+    scope: Optional[str] = Field(
+        default=None, description="Scope of the access token, if the API needs one."
+    )
+    token: Optional[str] = Field(
+        default=None,
+        description="Static bearer token, used by datasets without an `auth_url`.",
+    )
+    token_field: str = Field(
+        default="access_token",
+        description="Field of the response of the `auth_url` with the access token.",
+    )
+    expires_in_field: str = Field(
+        default="expires_in",
+        description="Field of the response of the `auth_url` with the lifetime of the token in seconds.",
+    )
+    headers: Dict[str, str] = Field(
+        default_factory=dict, description="Headers sent with every request."
+    )
+    timeout: float = Field(
+        default=30, gt=0, description="Timeout of each request in seconds."
+    )
+    max_retries: int = Field(
+        default=5,
+        ge=0,
+        description="Number of times a request is retried after a 429, a 5xx or a connection error.",
+    )
+    backoff: float = Field(
+        default=1,
+        gt=0,
+        description="Seconds to wait before the first retry when the API doesn't send `Retry-After`, "
+        "doubled for every retry (with jitter).",
+    )
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, either seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(retry_at.tzinfo or datetime.timezone.utc)
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+def _header(headers, names) -> Optional[float]:
+    """Numeric value of the first of the headers that is set."""
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class Throttle:
+    """Pauses all the requests of a client when the API asks to slow down."""
+
+    def __init__(self):
+        self._resume_at = 0.0
+
+    def pause(self, seconds: float):
+        """No request is sent for the next `seconds`."""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    async def wait(self):
+        """Wait until requests can be sent again."""
+        while (delay := self._resume_at - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+    def observe(self, response) -> Optional[float]:
+        """Pause on `Retry-After`, or until the rate limit resets once no request is remaining.
+        Returns the seconds paused, None if the response doesn't ask to slow down.
+        """
+        delay = None
+        if response.status_code in (429, 503):
+            delay = _retry_after(response.headers.get("Retry-After"))
+        remaining = _header(response.headers, _REMAINING_HEADERS)
+        reset = _header(response.headers, _RESET_HEADERS)
+        if remaining is not None and remaining <= 0 and reset is not None:
+            if reset > _EPOCH_THRESHOLD:
+                reset -= time.time()
+            delay = max(delay or 0.0, reset, 0.0)
+        if delay is not None:
+            self.pause(delay)
+        return delay
+
+
+class ApiClient:
+    """Sends the requests of a dataset, at most `max_concurrent_requests` at the same time.
+    A client belongs to the event loop it's first used in.
+    """
+
+    def __init__(self, session, args: ApiArgs, max_concurrent_requests: int = 4):
+        self.session = session
+        self.args = args
+        self.throttle = Throttle()
+        self._semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self._token_lock = asyncio.Lock()
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, self.args.backoff * 2**attempt)
+
+    async def _token(self, auth_url: str, rejected: Optional[str] = None) -> str:
+        """Access token from the auth_url, fetched once and cached until it expires.
+        `rejected` is a token the API answered 401 to, it's replaced unless another request already did.
+        """
+        key = (auth_url, self.args.client_id)
+        async with self._token_lock:
+            with _tokens_lock:
+                cached = _tokens.get(key)
+            if (
+                cached is not None
+                and cached[0] != rejected
+                and cached[1] > time.monotonic()
+            ):
+                return cached[0]
+            response = await asyncio.to_thread(
+                self.session.post,
+                auth_url,
+                data={
+                    name: value
+                    for name, value in {
+                        "grant_type": "client_credentials",
+                        "client_id": self.args.client_id,
+                        "client_secret": self.args.client_secret,
+                        "scope": self.args.scope,
+                    }.items()
+                    if value is not None
+                },
+                timeout=self.args.timeout,
+            )
+            if not response.ok:
+                raise exc.PorterException(
+                    f"Failed to get an access token from {auth_url}: {response.status_code} {response.text[:200]}"
+                )
+            body = response.json()
+            if self.args.token_field not in body:
+                raise exc.PorterException(
+                    f"No {self.args.token_field} in the response of {auth_url}"
+                )
+            token = body[self.args.token_field]
+            expires_in = float(body.get(self.args.expires_in_field) or 3600)
+            with _tokens_lock:
+                _tokens[key] = (
+                    token,
+                    time.monotonic() + max(expires_in - _TOKEN_EXPIRY_MARGIN, 0),
+                )
+            log.debug(f"Fetched an access token from {auth_url}")
+            return token
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        auth_url: Optional[str] = None,
+    ):
+        """GET the url, retrying throttled and failed requests. Raises PorterException once retries run out."""
+        import requests
+
+        headers = {**self.args.headers, **(headers or {})}
+        token, rejected = self.args.token, None
+        attempt = 0
+        while True:
+            await self.throttle.wait()
+            async with self._semaphore:
+                if auth_url:
+                    token = await self._token(auth_url, rejected)
+                request_headers = dict(headers)
+                if token:
+                    request_headers["Authorization"] = f"Bearer {token}"
+                try:
+                    response = await asyncio.to_thread(
+                        self.session.get,
+                        url,
+                        params=params,
+                        headers=request_headers,
+                        timeout=self.args.timeout,
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt >= self.args.max_retries:
+                        raise exc.PorterException(
+                            f"Request to {url} failed: {e}"
+                        ) from e
+                    response = None
+            if response is not None:
+                paused = self.throttle.observe(response)
+                if response.status_code == 401 and auth_url and rejected is None:
+                    # the token was revoked or expired early, it's fetched again once
+                    rejected = token
+                    continue
+                if response.status_code not in RETRY_STATUSES:
+                    if not response.ok:
+                        raise exc.PorterException(
+                            f"Request to {response.url} failed: {response.status_code} {response.text[:200]}"
+                        )
+                    return response
+                if attempt >= self.args.max_retries:
+                    raise exc.PorterException(
+                        f"Request to {response.url} failed after {attempt} retries: {response.status_code}"
+                    )
+                if paused is not None:
+                    log.info(
+                        f"Throttled by {url}, waiting {paused:.1f}s (status {response.status_code})"
+                    )
+                    attempt += 1
+                    continue
+            delay = self._backoff(attempt)
+            log.info(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,320 @@
+"""REST API source, reads paginated JSON responses as a stream of Arrow record batches.
+
+Pages are fetched by an asyncio event loop (see `client.ApiClient`), each page is converted into an Arrow batch as
+soon as it arrives, so at most `max_concurrent_requests` pages are held as python objects at any time.
+With offset pagination the next `max_concurrent_requests` pages are requested at the same time, cursor and link
+header pagination need each page to know the next one, the next page is then fetched while the previous one is
+being loaded.
+"""
+
+__all__ = ["RestApiSource", "RestApiSourceConfig"]
+
+
+import asyncio
+from collections import deque
+from contextlib import closing
+from typing import (
+    Any,
+    AsyncIterator,
+    ClassVar,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Type,
+)
+
+import pyarrow as pa
+from pydantic import BaseModel
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.enums.datasets import PaginationType
+from src.models.dataset.api import ApiDataset
+from src.models.source import SourceConfig
+from src.sources.api.rest.client import ApiArgs, ApiClient
+from src.sources.base import Source
+from src.sources.batches import as_record_batch_reader, prefetch, rebatch
+from src.sources.schema import conform, declared_schema
+
+
+class RestApiSourceConfig(SourceConfig):
+    """Source config for REST APIs."""
+
+    args_model: ClassVar[Type[BaseModel]] = ApiArgs
+
+
+def _dig(body: Any, path: Optional[str]) -> Any:
+    """Value at the dotted path of a JSON response, None if it's not there."""
+    if not path:
+        return body
+    for key in path.split("."):
+        if not isinstance(body, dict):
+            return None
+        body = body.get(key)
+    return body
+
+
+def _records(body: Any, dataset: ApiDataset) -> List[Dict]:
+    """Records of a page, a single object is a page of one record."""
+    records = _dig(body, dataset.records_path)
+    if records is None:
+        return []
+    if isinstance(records, dict):
+        return [records]
+    if not isinstance(records, list):
+        raise exc.PorterException(
+            f"Dataset {dataset.name}: expected a list of records at {dataset.records_path or 'the root'} "
+            f"of the response, got {type(records).__name__}"
+        )
+    return records
+
+
+def _iterate(pages: AsyncIterator) -> Iterator:
+    """Iterate an async generator from synchronous code, on an event loop of its own."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(pages.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(pages.aclose())
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+
+def _page_batch(
+    dataset: ApiDataset, records: List[Dict], schema: Optional[pa.Schema]
+) -> pa.RecordBatch:
+    """The records of a page as an Arrow batch in the schema, inferred from the records without one."""
+    try:
+        return pa.RecordBatch.from_pylist(records, schema=schema)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise exc.PorterException(
+            f"Dataset {dataset.name}: a page doesn't match the schema of the dataset ({e}), "
+            f"declare the datatypes of its `columns`"
+        ) from e
+
+
+def _promote(
+    dataset: ApiDataset, schema: Optional[pa.Schema], records: List[Dict]
+) -> pa.Schema:
+    """Schema of the previous pages with the types of the page: keys which were only null get a type, new keys
+    are added."""
+    page_schema = _page_batch(dataset, records, None).schema
+    if schema is None:
+        return page_schema
+    try:
+        return pa.unify_schemas([schema, page_schema])
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise exc.PorterException(
+            f"Dataset {dataset.name}: a page doesn't match the schema of the dataset ({e}), "
+            f"declare the datatypes of its `columns`"
+        ) from e
+
+
+def _check_keys(dataset: ApiDataset, schema: pa.Schema, records: List[Dict]):
+    """Fail on keys which are not in the schema of the stream, instead of dropping their values."""
+    names = set(schema.names)
+    new_keys = {key for record in records for key in record if key not in names}
+    if new_keys:
+        raise exc.PorterException(
+            f"Dataset {dataset.name}: the records of a page have the keys {sorted(new_keys)} which are not in "
+            f"the previous pages, declare the `columns` of the dataset with their datatypes"
+        )
+
+
+class RestApiSource(Source):
+    """REST API source"""
+
+    def __init__(self, config: SourceConfig):
+        """Expect to pass source config to all sources"""
+        super().__init__(config)
+        self._session = None
+
+    def is_source(self):
+        """Is source"""
+        return True
+
+    def is_target(self):
+        """Is not a target"""
+        return False
+
+    @property
+    def args(self) -> ApiArgs:
+        """Connection args of the source, defaults for a source config without args."""
+        if self.config.secret_names():
+            raise exc.PorterException(
+                f"Source {self.config.name}: the secrets {self.config.secret_names()} are not resolved, "
+                f"resolve the secrets of the pipeline before connecting (`resolve_secrets`)"
+            )
+        args = self.config.args
+        return args if isinstance(args, ApiArgs) else ApiArgs.model_validate(args)
+
+    def connect(self, **kwargs):
+        """Open the HTTP session, its connections are reused by all the requests of the job."""
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        return self._session
+
+    def disconnect(self, **kwargs):
+        """Close the HTTP session."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _params(self, dataset: ApiDataset, **page) -> Dict[str, Any]:
+        """Query parameters of a page, on top of the params of the dataset."""
+        params = dict(dataset.params)
+        pagination = dataset.pagination
+        if pagination is not None and pagination.limit_param:
+            params[pagination.limit_param] = pagination.page_size
+        params.update(page)
+        return params
+
+    async def _pages(self, dataset: ApiDataset) -> AsyncIterator[List[Dict]]:
+        """Records of each page of the dataset, in order."""
+        client = ApiClient(self.connect(), self.args, dataset.max_concurrent_requests)
+        pagination = dataset.pagination
+
+        async def fetch(url, params):
+            response = await client.get(url, params, dataset.headers, dataset.auth_url)
+            return response, response.json()
+
+        if pagination is None:
+            _, body = await fetch(dataset.url, dataset.params)
+            yield _records(body, dataset)
+            return
+
+        max_pages = pagination.max_pages or float("inf")
+        fetched = 0
+        if pagination.type == PaginationType.offset:
+            pending: Deque[asyncio.Future] = deque()
+            requested = 0
+
+            def request_ahead():
+                # keep `max_concurrent_requests` pages in flight
+                nonlocal requested
+                while (
+                    len(pending) < dataset.max_concurrent_requests
+                    and requested < max_pages
+                ):
+                    offset = requested * pagination.page_size
+                    params = self._params(dataset, **{pagination.offset_param: offset})
+                    pending.append(asyncio.ensure_future(fetch(dataset.url, params)))
+                    requested += 1
+
+            try:
+                request_ahead()
+                while pending:
+                    _, body = await pending.popleft()
+                    records = _records(body, dataset)
+                    if len(records) > pagination.page_size:
+                        raise exc.PorterException(
+                            f"Dataset {dataset.name}: {dataset.url} returned {len(records)} records for a page of "
+                            f"{pagination.page_size}, it doesn't page with `{pagination.limit_param}`"
+                        )
+                    if records:
+                        yield records
+                    if len(records) < pagination.page_size:
+                        # a short page is the last one, unless the API caps the page size below `page_size`,
+                        # the records between the pages would then be skipped: the next page has to be empty
+                        if not pending:
+                            request_ahead()
+                        if pending and _records((await pending[0])[1], dataset):
+                            raise exc.PorterException(
+                                f"Dataset {dataset.name}: {dataset.url} returned {len(records)} records for a "
+                                f"page of {pagination.page_size} before the last page, set the page_size to at "
+                                f"most the max page size of the API"
+                            )
+                        return
+                    request_ahead()
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            return
+
+        url, params = dataset.url, self._params(dataset)
+        while fetched < max_pages:
+            response, body = await fetch(url, params)
+            records = _records(body, dataset)
+            fetched += 1
+            if records:
+                yield records
+            if pagination.type == PaginationType.cursor:
+                cursor = _dig(body, pagination.cursor_path)
+                if cursor in (None, "") or not records:
+                    return
+                params = self._params(dataset, **{pagination.cursor_param: cursor})
+            else:
+                next_page = response.links.get("next", {}).get("url")
+                if not next_page:
+                    return
+                # the next URL has all the query parameters of the page
+                url, params = next_page, None
+
+    def _batches(
+        self, dataset: ApiDataset, schema: Optional[pa.Schema]
+    ) -> Iterator[pa.RecordBatch]:
+        """Each page as an Arrow batch, in the declared datatypes of the dataset or in a schema inferred from the pages.
+
+        The schema of a stream can't change once its first batch is out, so while a key of the records has only been
+        null (or a new key shows up), the pages are held back, up to `batch_size` records, and the schema is promoted
+        with the types of the next pages. After that, a page with a key that's not in the schema fails instead of
+        losing its values.
+        """
+        # closed right away when a page fails, so that its event loop is not left to the garbage collector
+        with closing(_iterate(self._pages(dataset))) as pages:
+            if schema is not None:
+                for records in pages:
+                    yield _page_batch(dataset, records, schema)
+                return
+
+            held: List[List[Dict]] = []
+            held_records = 0
+            for records in pages:
+                if held or schema is None:
+                    schema = _promote(dataset, schema, records)
+                else:
+                    _check_keys(dataset, schema, records)
+                held.append(records)
+                held_records += len(records)
+                if held_records < dataset.batch_size and any(
+                    pa.types.is_null(field.type) for field in schema
+                ):
+                    continue
+                for page in held:
+                    yield _page_batch(dataset, page, schema)
+                held, held_records = [], 0
+            for page in held:
+                yield _page_batch(dataset, page, schema)
+
+    def read(self, dataset: ApiDataset, **kwargs) -> pa.RecordBatchReader:
+        """Read all the pages of the dataset as a stream of Arrow record batches of `batch_size` records.
+        The columns have the datatypes of the dataset and are named after their target_name.
+        """
+        if not dataset.url:
+            raise exc.PorterException(f"Dataset {dataset.name}: url is required")
+        batches = prefetch(
+            rebatch(
+                self._batches(dataset, declared_schema(dataset)), dataset.batch_size
+            )
+        )
+        first = next(batches, None)
+        if first is None:
+            log.info(f"Dataset {dataset.name}: no records returned by {dataset.url}")
+            schema = declared_schema(dataset) or pa.schema([])
+            return conform(pa.RecordBatchReader.from_batches(schema, []), dataset)
+        return conform(
+            as_record_batch_reader(
+                (batch for part in ([first], batches) for batch in part),
+                schema=first.schema,
+            ),
+            dataset,
+        )
@@ -5,6 +5,11 @@ Also lets each source define if it can be used as a source or target or both.
 __all__ = ["Source"]
 
 from abc import ABC, abstractmethod
+from typing import Optional
+
+import pyarrow as pa
+
+from src.enums.targets import LoadMode
 from src.models.source import SourceConfig
 
 
@@ -29,28 +34,67 @@ class Source(ABC):
         """Indicate True if the source can be used as a Target, by default is False"""
         ...
 
-    def read(self, **kwargs):
-        """Method to read data from the source"""
+    def read(self, **kwargs) -> pa.RecordBatchReader:
+        """Method to read data from the source.
+        Every source returns the dataset as a stream of Arrow record batches, so that it can be registered
+        with the engine (`duck_internal`) without converting it to pandas.
+        Use `src.sources.batches.as_record_batch_reader` to wrap tables, batches or records into a reader.
+        """
         if self.is_source():
             raise NotImplementedError("Read method not implemented for this source")
 
-    def write(self, **kwargs):
-        """Method to write data to the target"""
+    def write(
+        self,
+        target_name: str,
+        batches: pa.RecordBatchReader,
+        mode: LoadMode = LoadMode.append,
+        **kwargs,
+    ) -> int:
+        """Method to write data to the target.
+        The dataset arrives as a stream of Arrow record batches (already chunked to the batch size of the target),
+        targets should write one batch at a time and never collect the whole stream, so that the memory
+        stays constant no matter how large the dataset is. Returns the number of rows written.
+        """
         if self.is_target():
             raise NotImplementedError("Write method not implemented for this source")
 
+    def estimate_size(self, dataset, **kwargs) -> Optional[int]:
+        """This method doesn't have be implemented by all sources.
+        Implement this method to return a cheap estimate of the size of the dataset (Example: bytes on disk,
+        rows from the catalog statistics), it's only used to start extracting the largest datasets first.
+        Return None when the size can't be estimated without scanning the dataset
+        """
+        return None
+
+    def read_schema(self, dataset, **kwargs) -> Optional[pa.Schema]:
+        """This method doesn't have be implemented by all sources.
+        Implement this method to return the schema of the dataset without reading any of its data (Example: file
+        footers, the catalog of a database), it's used to detect schema drift.
+        Return None when the schema can't be known without reading the data
+        """
+        return None
+
     def execute(self, **kwargs):
         """This method doesn't have be implemented by all sources.
         Implement this method if you want to execute something on a source like SQL query
         """
         pass
 
-    def pool(self, pool_interval: int, pool_limit: int, **kwargs):
+    def dataset_exists(self, dataset, **kwargs) -> Optional[bool]:
         """This method doesn't have be implemented by all sources.
-        Implement this method if you want to poll something on a source like checking for new files in S3,
-        or query to return a value
+        Implement this method to cheaply check if the dataset is available on the source (Example: files landed,
+        table created), it's used to apply `on_dataset_missing`. Return None when it can't be checked
         """
-        pass
+        return None
+
+    def watcher(self):
+        """Watcher used to wait for the datasets missing from the source.
+        By default the datasets are checked with `dataset_exists` with an exponential backoff,
+        override this if the source can notify changes (Example: inotify for local files)
+        """
+        from src.sources.watchers import BackoffWatcher
+
+        return BackoffWatcher(self)
 
     def connect(self, **kwargs):
         """This method doesn't have be implemented by all sources.
@@ -64,3 +108,10 @@ class Source(ABC):
         Implement this method if you want to close the connection to the source after the job is done
         """
         pass
+
+    def is_healthy(self) -> bool:
+        """This method doesn't have be implemented by all sources.
+        Implement this method to check that the open connection is still usable,
+        the connection pool calls it before handing out an idle connection
+        """
+        return True
@@ -0,0 +1,159 @@
+"""Arrow helpers shared by all sources.
+Every `Source.read` returns a `pyarrow.RecordBatchReader`, these helpers convert what a source naturally
+produces (Arrow tables, batches, python records or pandas DataFrames) into one.
+Every `Source.write` consumes the same stream, re-chunked to the batch size of the target.
+"""
+
+__all__ = [
+    "as_record_batch_reader",
+    "records_to_batches",
+    "rebatch",
+    "prefetch",
+    "DEFAULT_BATCH_SIZE",
+]
+
+
+import itertools
+import queue
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pyarrow as pa
+
+from src.common import exceptions as exc
+
+DEFAULT_BATCH_SIZE = 100_000
+
+
+def as_record_batch_reader(
+    data: Any, schema: Optional[pa.Schema] = None
+) -> pa.RecordBatchReader:
+    """Wrap the data returned by a source into a RecordBatchReader without copying the Arrow buffers.
+
+    Args:
+        data: RecordBatchReader, Table, RecordBatch, an iterable of RecordBatches or a pandas DataFrame.
+        schema: Schema of the batches, only needed for an iterable of batches which can be empty.
+    """
+    if isinstance(data, pa.RecordBatchReader):
+        return data
+    if isinstance(data, pa.Table):
+        return data.to_reader()
+    if isinstance(data, pa.RecordBatch):
+        return pa.RecordBatchReader.from_batches(data.schema, [data])
+    if type(data).__name__ == "DataFrame" and hasattr(data, "to_records"):
+        # pandas is not a dependency, so only convert it if a source returned one
+        return pa.Table.from_pandas(data, preserve_index=False).to_reader()
+    if isinstance(data, Iterable):
+        batches = iter(data)
+        if schema is None:
+            first = next(batches, None)
+            if first is None:
+                raise exc.PorterException(
+                    "Can't infer the schema of an empty stream of batches, pass the schema"
+                )
+            schema = first.schema
+            batches = itertools.chain([first], batches)
+        return pa.RecordBatchReader.from_batches(schema, batches)
+    raise exc.PorterException(
+        f"Can't convert {type(data).__name__} into a stream of Arrow record batches"
+    )
+
+
+def records_to_batches(
+    records: Iterable[Dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    schema: Optional[pa.Schema] = None,
+) -> Iterator[pa.RecordBatch]:
+    """Convert a stream of python records (Example: rows of an API response) into Arrow record batches,
+    at most `batch_size` records are held in memory at any time.
+    """
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, batch_size))
+        if not chunk:
+            return
+        batch = pa.RecordBatch.from_pylist(chunk, schema=schema)
+        if schema is None:
+            # every batch of the stream should have the same schema as the first one
+            schema = batch.schema
+        yield batch
+
+
+def rebatch(
+    batches: Iterable[pa.RecordBatch], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    """Re-chunk a stream of batches into batches of exactly `batch_size` rows (except the last one).
+    Large batches are sliced without copying, small batches are combined.
+    """
+    if batch_size < 1:
+        raise exc.PorterException(f"batch_size should be >= 1, got {batch_size}")
+    pending: List[pa.RecordBatch] = []
+    pending_rows = 0
+    for batch in batches:
+        offset = 0
+        while offset < batch.num_rows:
+            chunk = batch.slice(offset, batch_size - pending_rows)
+            offset += chunk.num_rows
+            pending.append(chunk)
+            pending_rows += chunk.num_rows
+            if pending_rows == batch_size:
+                yield _combine(pending)
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield _combine(pending)
+
+
+def _combine(batches: List[pa.RecordBatch]) -> pa.RecordBatch:
+    """Combine batches of the same schema into one batch."""
+    if len(batches) == 1:
+        return batches[0]
+    return pa.Table.from_batches(batches).combine_chunks().to_batches()[0]
+
+
+_END_OF_STREAM = object()
+
+
+def prefetch(
+    batches: Iterable[pa.RecordBatch], max_buffered_batches: int = 2
+) -> Iterator[pa.RecordBatch]:
+    """Read the batches in a background thread while the caller consumes them.
+
+    At most `max_buffered_batches` batches are read ahead, when the consumer (Example: a target load) is slower
+    than the producer (Example: the extraction) the producer waits. This overlaps reading and writing while
+    keeping the memory bounded to a few batches, no matter how large the dataset is.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max_buffered_batches)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+            put(_END_OF_STREAM)
+        except BaseException as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, name="porter-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # the consumer stopped early (or failed), let the producer exit
+        stop.set()
+        producer.join()
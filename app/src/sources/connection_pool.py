@@ -0,0 +1,270 @@
+"""Pool of connected sources keyed by the name of the source, shared across all the steps of a job.
+
+Every pooled entry is a copy of the registered source holding its own connection (`Source.connect`),
+so the same connection is reused across datasets, dynamic input queries, transformations and validations,
+instead of paying the TLS handshake and authentication for every one of them.
+"""
+
+__all__ = ["ConnectionPool", "DEFAULT_POOL_SIZE", "DEFAULT_IDLE_TIMEOUT"]
+
+
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.sources.base import Source
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_ACQUIRE_TIMEOUT = 600.0
+
+
+class _PooledSource(BaseModel):
+    """A connected copy of a source, along with the time it was last returned to the pool."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    source: Source
+    last_used_at: float
+
+
+class _SourcePool(BaseModel):
+    """State of the pool of one source."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    template: Source
+    max_size: int
+    idle_timeout: float
+    idle: List[_PooledSource] = []
+    num_open: int = 0
+
+
+class ConnectionPool:
+    """Thread safe pool of connected sources, with a size limit per source, health checks and idle eviction.
+
+    Example:
+        ```python
+        pool = ConnectionPool()
+        pool.register("postgres_dev", postgres_source, max_size=4)
+        with pool.acquire("postgres_dev") as source:
+            source.fetch_one("SELECT MAX(extraction_date) FROM campaigns")
+        pool.close()
+        ```
+    """
+
+    def __init__(
+        self,
+        health_check: bool = True,
+        acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT,
+    ):
+        """Initializes an empty pool.
+
+        Args:
+            health_check: Check that an idle connection is still alive (`Source.is_healthy`) before handing it out.
+            acquire_timeout: Max seconds to wait for a free connection when the pool of a source is full.
+        """
+        self.health_check = health_check
+        self.acquire_timeout = acquire_timeout
+        self._pools: Dict[str, _SourcePool] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __enter__(self):
+        """Use the pool as a context manager to close all connections at the end."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close all the connections."""
+        self.close()
+
+    def register(
+        self,
+        name: str,
+        source: Source,
+        max_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+    ):
+        """Register a source in the pool, by default the pool settings are taken from the source config.
+
+        Args:
+            name: Name used to acquire connections of the source.
+            source: The source, it's copied for every connection so it should not be connected.
+            max_size: Max number of connections open at the same time for this source.
+            idle_timeout: Connections idle for longer than this many seconds are closed.
+        """
+        config = getattr(source, "config", None)
+        max_size = max_size or getattr(config, "pool_size", None) or DEFAULT_POOL_SIZE
+        if idle_timeout is None:
+            idle_timeout = getattr(config, "pool_idle_timeout", DEFAULT_IDLE_TIMEOUT)
+        with self._condition:
+            if name in self._pools:
+                raise exc.PorterException(
+                    f"Source {name} is already registered in the pool"
+                )
+            self._pools[name] = _SourcePool(
+                template=source, max_size=max_size, idle_timeout=idle_timeout
+            )
+
+    def __contains__(self, name: str) -> bool:
+        """True if a source with the name is registered."""
+        return name in self._pools
+
+    def template(self, name: str) -> Source:
+        """The registered (unconnected) source, for work that opens its own connections like worker processes."""
+        with self._condition:
+            return self._pool(name).template
+
+    def _pool(self, name: str) -> _SourcePool:
+        if name not in self._pools:
+            raise exc.PorterException(
+                f"Source {name} is not registered in the connection pool"
+            )
+        return self._pools[name]
+
+    def _evict_idle(self, pool: _SourcePool, now: float) -> List[Source]:
+        """Remove the expired idle connections of a pool, must be called with the lock held.
+        Returns the sources to disconnect, which is done outside the lock.
+        """
+        expired = [
+            entry
+            for entry in pool.idle
+            if pool.idle_timeout and now - entry.last_used_at > pool.idle_timeout
+        ]
+        if expired:
+            pool.idle = [entry for entry in pool.idle if entry not in expired]
+            pool.num_open -= len(expired)
+        return [entry.source for entry in expired]
+
+    @staticmethod
+    def _disconnect(sources: List[Source]):
+        for source in sources:
+            try:
+                source.disconnect()
+            except Exception as e:
+                log.warning(f"Failed to close a pooled connection: {e!r}")
+
+    def _checkout(self, name: str) -> Source:
+        """Get a connected source from the pool, opening a new connection if the pool is not full."""
+        pool = self._pool(name)
+        deadline = time.time() + self.acquire_timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise exc.PorterException(
+                        f"Connection pool is closed, can't acquire a connection of {name}"
+                    )
+                to_close = self._evict_idle(pool, time.time())
+                entry, open_new = None, False
+                if pool.idle:
+                    # most recently used first, so the least used ones expire
+                    entry = pool.idle.pop()
+                elif pool.num_open < pool.max_size:
+                    pool.num_open += 1
+                    open_new = True
+                elif not to_close:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise exc.PorterException(
+                            f"Timed out waiting for a free connection of {name}, "
+                            f"all {pool.max_size} connections are in use"
+                        )
+                    self._condition.wait(remaining)
+                    continue
+            self._disconnect(to_close)
+
+            if entry is not None:
+                if not self.health_check or entry.source.is_healthy():
+                    return entry.source
+                log.warning(f"Dropping an unhealthy connection of {name}")
+                self._discard(name, entry.source)
+                continue
+
+            if open_new:
+                source = copy.copy(pool.template)
+                try:
+                    source.connect()
+                except BaseException:
+                    self._discard(name, source)
+                    raise
+                return source
+
+    def _discard(self, name: str, source: Source):
+        """Close a connection and free its slot in the pool."""
+        self._disconnect([source])
+        with self._condition:
+            self._pools[name].num_open -= 1
+            self._condition.notify()
+
+    def _checkin(self, name: str, source: Source):
+        """Return a connection to the pool, it's closed instead if the pool was closed while it was in use."""
+        with self._condition:
+            if not self._closed:
+                self._pools[name].idle.append(
+                    _PooledSource(source=source, last_used_at=time.time())
+                )
+                self._condition.notify()
+                return
+        self._discard(name, source)
+
+    @contextmanager
+    def acquire(self, name: str) -> Iterator[Source]:
+        """Borrow a connected source from the pool for the duration of the `with` block.
+        If the block raises, the connection is closed instead of being returned, as it might be broken.
+        """
+        source = self._checkout(name)
+        try:
+            yield source
+        except BaseException:
+            self._discard(name, source)
+            raise
+        else:
+            self._checkin(name, source)
+
+    def evict_idle(self) -> int:
+        """Close all the connections that are idle for longer than their idle timeout, returns how many were closed."""
+        with self._condition:
+            now = time.time()
+            to_close = [
+                source
+                for pool in self._pools.values()
+                for source in self._evict_idle(pool, now)
+            ]
+        self._disconnect(to_close)
+        return len(to_close)
+
+    def stats(self, name: str) -> Dict[str, int]:
+        """Number of open, idle and in use connections of a source."""
+        with self._condition:
+            pool = self._pool(name)
+            return {
+                "open": pool.num_open,
+                "idle": len(pool.idle),
+                "in_use": pool.num_open - len(pool.idle),
+                "max_size": pool.max_size,
+            }
+
+    def max_sizes(self) -> Dict[str, int]:
+        """Max number of connections of each registered source."""
+        with self._condition:
+            return {name: pool.max_size for name, pool in self._pools.items()}
+
+    def close(self):
+        """Close all the idle connections, connections in use are closed when they are returned.
+        No connection can be acquired from a closed pool.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            to_close = []
+            for pool in self._pools.values():
+                to_close.extend(entry.source for entry in pool.idle)
+                pool.num_open -= len(pool.idle)
+                pool.idle = []
+        self._disconnect(to_close)
@@ -1,11 +1,25 @@
-"""Model definition for Database Args, which defines the connection parameters for various sources and targets."""
+"""Model definition for Database Args, which defines the connection parameters for various sources and targets.
+Also defines the DatabaseSource base class which all database sources should extend.
+"""
 
-__all__ = ["DBArgs"]
+__all__ = ["DBArgs", "DatabaseSource"]
 
 
-from typing import Optional, Dict
+import re
+import uuid
+from abc import abstractmethod
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple, List
+
+import pyarrow as pa
 from pydantic import BaseModel
 
+from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.enums.targets import LoadMode, MergeStrategy
+from src.models.dataset.table import TableDataset
+from src.sources.base import Source
+
 
 class DBArgs(BaseModel):
     """Model representing connection arguments for data sources and targets."""
@@ -18,3 +32,426 @@ class DBArgs(BaseModel):
     DRIVER: Optional[str] = None
     DSN: Optional[str] = None
     CONNECTION_ARGS: Optional[Dict] = None
+
+
+# Column of the staging table of upserts with the position of each row in the loaded stream
+STAGING_SEQUENCE = "porter_seq"
+
+
+def _with_sequence(batches: pa.RecordBatchReader) -> pa.RecordBatchReader:
+    """Add the `porter_seq` column to the stream, numbering the rows in the order they arrive."""
+    schema = batches.schema.append(pa.field(STAGING_SEQUENCE, pa.int64()))
+
+    def numbered():
+        offset = 0
+        for batch in batches:
+            yield pa.RecordBatch.from_arrays(
+                batch.columns
+                + [pa.array(range(offset, offset + batch.num_rows), pa.int64())],
+                schema=schema,
+            )
+            offset += batch.num_rows
+
+    return pa.RecordBatchReader.from_batches(schema, numbered())
+
+
+class DatabaseSource(Source):
+    """Base class for all database sources.
+    Database sources only have to implement `read_query`, which runs a query on the source
+    and returns the result as a stream of Arrow record batches.
+    Queries use `:name` placeholders for the values to bind, each source is responsible for
+    converting them to the parameter style of its driver.
+    """
+
+    # The open connection to the database, set by `connect`. It's never shared with worker processes
+    connection: Any = None
+
+    # Max number of rows in one multi-row INSERT statement, used by the default `bulk_load`
+    rows_per_insert: int = 1000
+
+    # Strategy used for upserts when the target config doesn't set one, MERGE is the most widely supported
+    default_merge_strategy: MergeStrategy = MergeStrategy.merge
+
+    # Statement which starts a transaction (Example: `START TRANSACTION` on MySQL)
+    begin_statement: str = "BEGIN TRANSACTION"
+
+    # Dialect used to parse the SQL that runs on the source (Example: to find the tables read by a transform)
+    sql_dialect: str = "ansi"
+
+    # Split points of quantile partitions are computed from a sample of about this many rows, when the source can sample
+    split_sample_rows: int = 100_000
+
+    # Query used to check that a pooled connection is still alive (Example: `SELECT 1 FROM DUAL` on Oracle)
+    health_check_query: str = "SELECT 1"
+
+    def is_source(self):
+        """Databases can be used as a Source."""
+        return True
+
+    def is_target(self):
+        """Databases can be used as a Target."""
+        return True
+
+    def __getstate__(self):
+        """Connections can't be pickled, worker processes open their own connection."""
+        state = self.__dict__.copy()
+        state["connection"] = None
+        return state
+
+    @abstractmethod
+    def read_query(
+        self, query: str, values_to_bind: Optional[Dict] = None, **kwargs
+    ) -> pa.RecordBatchReader:
+        """Run the query on the source and return the result as a stream of Arrow record batches."""
+        ...
+
+    def fetch_one(
+        self, query: str, values_to_bind: Optional[Dict] = None
+    ) -> Optional[Tuple]:
+        """Run the query on the source and return the first row of the result as a tuple."""
+        reader = self.read_query(query, values_to_bind)
+        for batch in reader:
+            if batch.num_rows:
+                return tuple(column[0].as_py() for column in batch.columns)
+        return None
+
+    def is_healthy(self) -> bool:
+        """Check that the open connection still answers a trivial query."""
+        if self.connection is None:
+            return False
+        try:
+            self.fetch_one(self.health_check_query)
+            return True
+        except Exception as e:
+            log.warning(f"Health check failed on {self.config.name}: {e!r}")
+            return False
+
+    @staticmethod
+    def quote_identifier(name: str) -> str:
+        """Quote a column name with ANSI double quotes, sources which quote identifiers differently
+        (Example: backticks on MySQL) should override this.
+        """
+        return '"' + name.replace('"', '""') + '"'
+
+    def execute(self, query: str, values_to_bind: Optional[Dict] = None, **kwargs):
+        """Execute a statement on the source, sources which can be used as a target must implement this."""
+        raise NotImplementedError(
+            f"Execute is not implemented for {self.__class__.__name__}"
+        )
+
+    def create_table_if_missing(self, table: str, schema: pa.Schema):
+        """Create the target table from the Arrow schema if it doesn't exist.
+        By default the table is expected to exist already, sources that can map Arrow types to their own types
+        should override this.
+        """
+        pass
+
+    def truncate(self, table: str):
+        """Remove all the rows of the table before loading."""
+        self.execute(f"DELETE FROM {table}")
+
+    def bulk_load(self, table: str, batch: pa.RecordBatch):
+        """Load one batch into the table.
+        By default the batch is loaded with multi-row INSERT statements of `rows_per_insert` rows,
+        sources which have a faster bulk load path (Example: COPY) should override this.
+        """
+        columns = ", ".join(self.quote_identifier(name) for name in batch.schema.names)
+        for offset in range(0, batch.num_rows, self.rows_per_insert):
+            rows = batch.slice(offset, self.rows_per_insert).to_pylist()
+            values_to_bind, values = {}, []
+            for row_num, row in enumerate(rows):
+                placeholders = []
+                for col_num, value in enumerate(row.values()):
+                    name = f"porter_r{row_num}_c{col_num}"
+                    values_to_bind[name] = value
+                    placeholders.append(f":{name}")
+                values.append(f"({', '.join(placeholders)})")
+            self.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join(values)}",
+                values_to_bind,
+            )
+
+    def _load_batches(self, table: str, batches: pa.RecordBatchReader) -> int:
+        """Bulk load every batch of the stream into the table, returns the number of rows loaded."""
+        num_rows = 0
+        for batch in batches:
+            if batch.num_rows:
+                self.bulk_load(table, batch)
+                num_rows += batch.num_rows
+                log.debug(f"Loaded {num_rows} rows into {table}")
+        return num_rows
+
+    def create_staging_table(self, staging_table: str, target_table: str):
+        """Create an empty staging table with the same columns as the target table, plus the `porter_seq`
+        column with the position of each row in the loaded stream.
+        """
+        self.execute(
+            f"CREATE TABLE {staging_table} AS SELECT porter_t.*, CAST(NULL AS BIGINT) AS {STAGING_SEQUENCE} "
+            f"FROM {target_table} porter_t WHERE 1 = 0"
+        )
+
+    @contextmanager
+    def transaction(self):
+        """Run the statements executed in the block in one transaction, rolled back if any of them fails."""
+        self.execute(self.begin_statement)
+        try:
+            yield
+        except BaseException:
+            self.execute("ROLLBACK")
+            raise
+        self.execute("COMMIT")
+
+    def drop_table(self, table: str):
+        """Drop the table if it exists."""
+        self.execute(f"DROP TABLE IF EXISTS {table}")
+
+    @staticmethod
+    def merge_statements(
+        target_table: str,
+        staging_table: str,
+        columns: List[str],
+        key_columns: List[str],
+        strategy: MergeStrategy,
+    ) -> List[str]:
+        """Set based statements which upsert all the rows of the staging table into the target table.
+        When a key is loaded more than once (Example: a CDC delta with several changes of a row) only its last
+        row (highest `porter_seq`) is applied.
+        """
+        on = " AND ".join(f"porter_t.{key} = porter_s.{key}" for key in key_columns)
+        non_keys = [column for column in columns if column not in key_columns]
+        column_list = ", ".join(columns)
+        latest = (
+            f"(SELECT {column_list} FROM (SELECT {column_list}, ROW_NUMBER() OVER ("
+            f"PARTITION BY {', '.join(key_columns)} ORDER BY {STAGING_SEQUENCE} DESC) AS porter_row "
+            f"FROM {staging_table}) porter_staged WHERE porter_row = 1)"
+        )
+
+        if strategy == MergeStrategy.merge:
+            update = ", ".join(f"{column} = porter_s.{column}" for column in non_keys)
+            matched = f"WHEN MATCHED THEN UPDATE SET {update} " if non_keys else ""
+            return [
+                f"MERGE INTO {target_table} porter_t USING {latest} porter_s ON {on} "
+                f"{matched}"
+                f"WHEN NOT MATCHED THEN INSERT ({column_list}) "
+                f"VALUES ({', '.join(f'porter_s.{column}' for column in columns)})"
+            ]
+        if strategy == MergeStrategy.insert_on_conflict:
+            update = ", ".join(f"{column} = EXCLUDED.{column}" for column in non_keys)
+            action = f"DO UPDATE SET {update}" if non_keys else "DO NOTHING"
+            return [
+                f"INSERT INTO {target_table} ({column_list}) "
+                f"SELECT {column_list} FROM {latest} porter_s "
+                f"ON CONFLICT ({', '.join(key_columns)}) {action}"
+            ]
+        if strategy == MergeStrategy.delete_insert:
+            return [
+                f"DELETE FROM {target_table} porter_t WHERE EXISTS "
+                f"(SELECT 1 FROM {staging_table} porter_s WHERE {on})",
+                f"INSERT INTO {target_table} ({column_list}) "
+                f"SELECT {column_list} FROM {latest} porter_s",
+            ]
+        raise exc.PorterException(f"Merge strategy: {strategy} is not supported")
+
+    def upsert(
+        self,
+        target_name: str,
+        batches: pa.RecordBatchReader,
+        key_columns: List[str],
+        merge_strategy: Optional[MergeStrategy] = None,
+    ) -> int:
+        """Upsert the stream of batches into the target table.
+        The batches are bulk loaded into a staging table, which is then applied to the target
+        with set based statements (MERGE, INSERT ... ON CONFLICT or DELETE + INSERT), never row by row.
+        The statements run in one transaction, so a failed upsert leaves the target as it was.
+        """
+        if not key_columns:
+            raise exc.PorterException(
+                f"key_columns are required to upsert into {target_name}"
+            )
+        missing = set(key_columns) - set(batches.schema.names)
+        if missing:
+            raise exc.PorterException(
+                f"Key columns {sorted(missing)} are not in the dataset loaded into {target_name}"
+            )
+
+        strategy = merge_strategy or self.default_merge_strategy
+        staging_table = f"{target_name}_porter_stage_{uuid.uuid4().hex[:8]}"
+        self.create_table_if_missing(target_name, batches.schema)
+        self.create_staging_table(staging_table, target_name)
+        try:
+            num_rows = self._load_batches(staging_table, _with_sequence(batches))
+            with self.transaction():
+                for statement in self.merge_statements(
+                    target_name,
+                    staging_table,
+                    batches.schema.names,
+                    key_columns,
+                    strategy,
+                ):
+                    self.execute(statement)
+        finally:
+            self.drop_table(staging_table)
+        log.debug(f"Upserted {num_rows} rows into {target_name} using {strategy.value}")
+        return num_rows
+
+    def write(
+        self,
+        target_name: str,
+        batches: pa.RecordBatchReader,
+        mode: LoadMode = LoadMode.append,
+        truncate: bool = False,
+        key_columns: Optional[List[str]] = None,
+        merge_strategy: Optional[MergeStrategy] = None,
+        **kwargs,
+    ) -> int:
+        """Load the stream of batches into the `target_name` table, one batch at a time.
+
+        Args:
+            target_name: Name of the target table.
+            batches: Stream of batches, already chunked to the batch size of the target.
+            mode: `overwrite` removes the existing rows before loading, `append` keeps them,
+                `upsert` updates the rows with matching `key_columns` and inserts the rest.
+            truncate: Remove the existing rows before loading, irrespective of the mode.
+            key_columns: Columns which uniquely identify a row, required for `upsert`.
+            merge_strategy: Statement used for `upsert`, defaults to `default_merge_strategy` of the source.
+        """
+        if truncate or mode == LoadMode.overwrite:
+            self.create_table_if_missing(target_name, batches.schema)
+            self.truncate(target_name)
+        if mode == LoadMode.upsert:
+            return self.upsert(target_name, batches, key_columns, merge_strategy)
+
+        self.create_table_if_missing(target_name, batches.schema)
+        return self._load_batches(target_name, batches)
+
+    def sample_query(self, query: str, fraction: float) -> Optional[str]:
+        """Returns a query which selects a random sample of about `fraction` of the rows of the query,
+        None if the source can't sample (the split points are then computed from all the rows).
+        Sources should override this with their sampling clause (Example: TABLESAMPLE BERNOULLI, USING SAMPLE).
+        """
+        return None
+
+    def _tiles(
+        self,
+        query: str,
+        split_by: str,
+        num_partitions: int,
+        values_to_bind: Optional[Dict],
+    ) -> List[Tuple[Any, Any]]:
+        """(min, max) of split-by in each of the `num_partitions` NTILEs of the query, in order."""
+        tiles_query = (
+            f"SELECT MIN(porter_split_value), MAX(porter_split_value) FROM ("
+            f"SELECT ({split_by}) AS porter_split_value, "
+            f"NTILE({int(num_partitions)}) OVER (ORDER BY ({split_by})) AS porter_tile "
+            f"FROM ({query}) porter_base WHERE ({split_by}) IS NOT NULL"
+            f") porter_tiles GROUP BY porter_tile ORDER BY porter_tile"
+        )
+        tiles = []
+        for batch in self.read_query(tiles_query, values_to_bind):
+            tiles.extend(zip(*(column.to_pylist() for column in batch.columns)))
+        return tiles
+
+    def fetch_split_points(
+        self,
+        query: str,
+        split_by: str,
+        num_partitions: int,
+        values_to_bind: Optional[Dict] = None,
+    ) -> List[Any]:
+        """Returns the sorted values of split-by which cut the result of the query into `num_partitions`
+        partitions with a similar number of rows. The first value is the min and the last is the max of split-by.
+
+        The min, max and number of rows come from one aggregate query (no sort). When the query has more than
+        `split_sample_rows` rows and the source can sample (`sample_query`), the cut points in between are the
+        NTILEs of a random sample of about `split_sample_rows` rows, so only the sample is sorted. Otherwise an
+        exact NTILE runs over all the rows. Sources which can answer this cheaper
+        (Example: histogram from the catalog statistics) should override this method.
+        """
+        bounds_query = (
+            f"SELECT COUNT(*), MIN({split_by}), MAX({split_by}) "
+            f"FROM ({query}) porter_base WHERE ({split_by}) IS NOT NULL"
+        )
+        num_rows, lower, upper = self.fetch_one(bounds_query, values_to_bind)
+        if not num_rows:
+            return []
+
+        tiles = None
+        if num_rows > self.split_sample_rows:
+            fraction = self.split_sample_rows / num_rows
+            sampled = self.sample_query(query, fraction)
+            if sampled is not None:
+                log.debug(
+                    f"Split points of {split_by} from a {fraction:.4%} sample of {num_rows} rows"
+                )
+                tiles = self._tiles(sampled, split_by, num_partitions, values_to_bind)
+        if tiles is None:
+            tiles = self._tiles(query, split_by, num_partitions, values_to_bind)
+
+        # the sample might miss the min/max, and ties can spread over 2 tiles, so remove duplicate cut points
+        points = {lower, upper}
+        points.update(tile_min for tile_min, _ in tiles[1:])
+        return sorted(points)
+
+    @staticmethod
+    def bind_placeholders(
+        query: str, values_to_bind: Optional[Dict], placeholder: str
+    ) -> str:
+        """Convert `:name` placeholders in the query to the parameter style of the driver.
+        Only names present in `values_to_bind` are replaced, so casts like `col::int` are left untouched.
+
+        Args:
+            query: Query with `:name` placeholders.
+            values_to_bind: Values that will be bound to the query.
+            placeholder: Format of the driver placeholder, Example: `${name}`, `%({name})s`.
+        """
+        if not values_to_bind:
+            return query
+        return re.sub(
+            r"(?<![:\w]):(\w+)\b",
+            lambda match: (
+                placeholder.format(name=match.group(1))
+                if match.group(1) in values_to_bind
+                else match.group(0)
+            ),
+            query,
+        )
+
+    @staticmethod
+    def dataset_query(dataset: TableDataset) -> str:
+        """Returns the query which extracts the whole dataset from the source."""
+        if dataset.query:
+            return dataset.query
+        if dataset.table:
+            return f"SELECT * FROM {dataset.table}"
+        raise exc.PorterException(
+            f"Either `query` or `table` should be set for the dataset: {dataset.name}"
+        )
+
+    def dataset_exists(self, dataset: TableDataset, **kwargs) -> Optional[bool]:
+        """True if the table of the dataset can be queried, None for query datasets."""
+        if not dataset.table:
+            return None
+        try:
+            self.fetch_one(f"SELECT 1 FROM {dataset.table} WHERE 1 = 0")
+            return True
+        except Exception as e:
+            log.debug(
+                f"Table {dataset.table} is not available on {self.config.name}: {e!r}"
+            )
+            return False
+
+    def read_schema(self, dataset: TableDataset, **kwargs) -> Optional[pa.Schema]:
+        """Schema of the result of the query of the dataset, from a query which returns no rows."""
+        reader = self.read_query(
+            f"SELECT * FROM ({self.dataset_query(dataset)}) porter_schema WHERE 1 = 0",
+            dataset.values_to_bind,
+        )
+        for _ in reader:
+            pass
+        return reader.schema
+
+    def read(self, dataset: TableDataset, **kwargs) -> pa.RecordBatchReader:
+        """Read the whole dataset from the source."""
+        return self.read_query(
+            self.dataset_query(dataset), dataset.values_to_bind, **kwargs
+        )
@@ -0,0 +1,329 @@
+"""DuckDB as a database source/target, also used as the `duck_internal` engine of every Porter job."""
+
+__all__ = [
+    "DuckDBSource",
+    "DuckDBSourceConfig",
+    "DuckDBArgs",
+    "create_duck_internal",
+    "DUCK_INTERNAL",
+]
+
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, ClassVar, Dict, Iterator, List, Optional, Type, Union
+
+import duckdb
+import pyarrow as pa
+from pydantic import BaseModel
+
+from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.enums.datasets import FileTypes
+from src.models.dataset.base import Dataset
+from src.models.engine import EngineConfig
+from src.models.source import SourceConfig
+from src.sources.base import Source
+from src.sources.batches import as_record_batch_reader
+from src.sources.database.base import DatabaseSource, DBArgs
+
+DEFAULT_ROWS_PER_BATCH = 1_000_000
+DUCK_INTERNAL = "duck_internal"
+
+# DuckDB table functions which can scan files lazily, used for datasets stored as views
+FILE_READERS = {
+    FileTypes.parquet: "read_parquet",
+    FileTypes.csv: "read_csv",
+    FileTypes.json: "read_json",
+}
+
+
+class DuckDBArgs(DBArgs):
+    """Connection arguments for DuckDB, `DATABASE` is the path of the database file (in-memory by default)."""
+
+    MEMORY_LIMIT: Optional[str] = None
+    TEMP_DIRECTORY: Optional[str] = None
+    THREADS: Optional[int] = None
+    PRESERVE_INSERTION_ORDER: Optional[bool] = None
+
+
+class DuckDBSourceConfig(SourceConfig):
+    """Source config for DuckDB."""
+
+    args_model: ClassVar[Type[BaseModel]] = DuckDBArgs
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table/view name so that any dataset name can be used as a DuckDB identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value: Union[str, Path]) -> str:
+    """Quote a value as a DuckDB string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _close_when_consumed(
+    cursor: duckdb.DuckDBPyConnection, reader: pa.RecordBatchReader
+) -> Iterator[pa.RecordBatch]:
+    """Yield the batches of the reader, and close the cursor once all of them are consumed."""
+    try:
+        yield from reader
+    finally:
+        cursor.close()
+
+
+class DuckDBSource(DatabaseSource):
+    """DuckDB source"""
+
+    sql_dialect = "duckdb"
+
+    def __init__(self, config: SourceConfig):
+        """Expect to pass source config to all sources"""
+        super().__init__(config)
+        self.database = getattr(config.args, "DATABASE", None) or ":memory:"
+        # Arrow tables registered as zero-copy views, they only exist in the connection they were registered in
+        self._arrow_views: Dict[str, pa.Table] = {}
+        # Guards the zero-copy Arrow views, which are registered on the main connection,
+        # so that datasets can be loaded into the engine from multiple threads at the same time
+        self._views_lock = threading.RLock()
+
+    def __copy__(self):
+        """Copy of the source with a connection and views of its own (Example: the copies made by a ConnectionPool)."""
+        source = type(self).__new__(type(self))
+        source.__dict__.update(self.__dict__)
+        source.connection = None
+        source._arrow_views = {}
+        source._views_lock = threading.RLock()
+        return source
+
+    def connect(self, **kwargs):
+        """Open the connection to the DuckDB database, the same connection is reused across the job."""
+        if self.connection is None:
+            if self.database != ":memory:":
+                Path(self.database).parent.mkdir(parents=True, exist_ok=True)
+            self.connection = duckdb.connect(
+                self.database, config=self._settings(), **kwargs
+            )
+        return self.connection
+
+    def _settings(self) -> Dict[str, Any]:
+        """DuckDB settings from the args, only the ones that are set are passed to DuckDB."""
+        args = self.config.args
+        settings = {
+            "memory_limit": getattr(args, "MEMORY_LIMIT", None),
+            "temp_directory": getattr(args, "TEMP_DIRECTORY", None),
+            "threads": getattr(args, "THREADS", None),
+            "preserve_insertion_order": getattr(args, "PRESERVE_INSERTION_ORDER", None),
+        }
+        if settings["temp_directory"]:
+            Path(settings["temp_directory"]).mkdir(parents=True, exist_ok=True)
+        return {key: value for key, value in settings.items() if value is not None}
+
+    def disconnect(self, **kwargs):
+        """Close the connection to the DuckDB database."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """New connection to the same database, use one per thread as a DuckDB connection is not thread safe.
+        The zero-copy Arrow views are registered in the cursor as well, so it sees all the datasets.
+        """
+        cursor = self.connect().cursor()
+        with self._views_lock:
+            arrow_views = list(self._arrow_views.items())
+        for name, table in arrow_views:
+            cursor.register(name, table)
+        return cursor
+
+    def read_query(
+        self,
+        query: str,
+        values_to_bind: Optional[Dict] = None,
+        rows_per_batch: int = DEFAULT_ROWS_PER_BATCH,
+        **kwargs,
+    ) -> pa.RecordBatchReader:
+        """Run the query on DuckDB and stream the result as Arrow record batches.
+        Every query runs on its own cursor, so that multiple threads can read from the engine at the same time.
+        """
+        query = self.bind_placeholders(query, values_to_bind, "${name}")
+        cursor = self.cursor()
+        reader = cursor.execute(query, values_to_bind or None).to_arrow_reader(
+            rows_per_batch
+        )
+        return pa.RecordBatchReader.from_batches(
+            reader.schema, _close_when_consumed(cursor, reader)
+        )
+
+    def estimate_size(self, dataset: Dataset, **kwargs) -> Optional[int]:
+        """Estimated number of rows of a table dataset from the DuckDB catalog, None for query datasets."""
+        table = getattr(dataset, "table", None)
+        if not table:
+            return None
+        row = self.fetch_one(
+            "SELECT estimated_size FROM duckdb_tables() WHERE table_name = :table",
+            {"table": table},
+        )
+        return row[0] if row else None
+
+    def sample_query(self, query: str, fraction: float) -> Optional[str]:
+        """Bernoulli sample of the rows of the query."""
+        return (
+            f"SELECT * FROM ({query}) porter_sample "
+            f"USING SAMPLE {min(fraction, 1.0) * 100:.6f} PERCENT (bernoulli)"
+        )
+
+    def execute(self, query: str, values_to_bind: Optional[Dict] = None, **kwargs):
+        """Execute the query on DuckDB without fetching the result."""
+        query = self.bind_placeholders(query, values_to_bind, "${name}")
+        return self.connect().execute(query, values_to_bind or None)
+
+    def create_table_if_missing(self, table: str, schema: pa.Schema):
+        """Create the target table with the columns of the Arrow schema if it doesn't exist."""
+        view = f"porter_empty_{uuid.uuid4().hex}"
+        with self.connect().cursor() as cursor:
+            cursor.register(view, schema.empty_table())
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM {view}"
+            )
+
+    def bulk_load(self, table: str, batch: pa.RecordBatch):
+        """Insert the whole batch with one statement, DuckDB scans the Arrow batch in place.
+        The batch is registered under a unique name on a cursor of its own, so batches can be loaded from
+        multiple threads at the same time.
+        """
+        view = f"porter_batch_{uuid.uuid4().hex}"
+        with self.connect().cursor() as cursor:
+            cursor.register(view, batch)
+            cursor.execute(f"INSERT INTO {table} BY NAME SELECT * FROM {view}")
+
+    def _drop_dataset(
+        self, name: str, cursor: Optional[duckdb.DuckDBPyConnection] = None
+    ):
+        """Drop the table/view of a dataset, so that it can be re-created as either of them."""
+        with self._views_lock:
+            if self._arrow_views.pop(name, None) is not None:
+                self.connect().unregister(name)
+        cursor = cursor or self.connect()
+        existing = cursor.execute(
+            "SELECT table_type FROM information_schema.tables "
+            "WHERE table_name = $name AND table_schema = current_schema()",
+            {"name": name},
+        ).fetchone()
+        if existing is None:
+            return
+        if existing[0] == "VIEW":
+            cursor.execute(f"DROP VIEW IF EXISTS {quote_identifier(name)}")
+        else:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+
+    def load_files(
+        self,
+        name: str,
+        paths: List[Union[str, Path]],
+        file_type: FileTypes = FileTypes.parquet,
+        materialize: bool = True,
+    ):
+        """Create a table (or a lazy view when `materialize` is False) with the given name from a list of files."""
+        if file_type not in FILE_READERS:
+            raise exc.PorterException(
+                f"File type: {file_type.value} can't be loaded directly into DuckDB"
+            )
+        files = ", ".join(quote_literal(path) for path in paths)
+        select = f"SELECT * FROM {FILE_READERS[file_type]}([{files}])"
+        self.create_from_query(name, select, materialize=materialize)
+
+    def create_from_query(self, name: str, select: str, materialize: bool = True):
+        """Create a table (or a lazy view when `materialize` is False) with the given name from a query."""
+        with self.cursor() as cursor:
+            self._drop_dataset(name, cursor)
+            if materialize:
+                cursor.execute(f"CREATE TABLE {quote_identifier(name)} AS {select}")
+            else:
+                cursor.execute(f"CREATE VIEW {quote_identifier(name)} AS {select}")
+
+    def register_dataset(self, name: str, data: Any, materialize: bool = True):
+        """Make Arrow data available in DuckDB as a table/view with the given name, without a pandas round-trip.
+        Datasets can be registered from multiple threads at the same time, each load runs on its own cursor.
+
+        Args:
+            name: Name of the table/view, usually the name of the dataset.
+            data: RecordBatchReader, Table, RecordBatch or an iterable of batches (Example: the result of `Source.read`).
+            materialize: When True the batches are streamed into a DuckDB table one batch at a time,
+                so the whole dataset never has to be in Arrow memory. When False the Arrow data is registered
+                as a view and DuckDB scans the Arrow buffers in place (zero-copy) on every query,
+                a stream is first collected into an Arrow table because it can only be scanned once.
+        """
+        if materialize:
+            stream_name = f"porter_stream_{uuid.uuid4().hex}"
+            with self.cursor() as cursor:
+                cursor.register(stream_name, as_record_batch_reader(data))
+                self._drop_dataset(name, cursor)
+                cursor.execute(
+                    f"CREATE TABLE {quote_identifier(name)} AS "
+                    f"SELECT * FROM {quote_identifier(stream_name)}"
+                )
+        else:
+            table = (
+                data
+                if isinstance(data, pa.Table)
+                else as_record_batch_reader(data).read_all()
+            )
+            with self._views_lock:
+                self._drop_dataset(name)
+                self.connect().register(name, table)
+                self._arrow_views[name] = table
+
+    def load_dataset(
+        self, source: Source, dataset: Dataset, materialize: bool = True, **kwargs
+    ):
+        """Read the dataset from the source and register it in DuckDB under the name of the dataset.
+        Local file datasets read with the duckdb engine are scanned by this engine directly (all the files at once,
+        with the columns and filters pushed down), as lazy views over the files when `materialize` is False.
+        All the other datasets are streamed into a DuckDB table.
+        """
+        from src.enums.common import Engine
+        from src.sources.file.local.local_source import FileSource
+
+        if (
+            isinstance(source, FileSource)
+            and source.engine_for(dataset) == Engine.duckdb
+        ):
+            from src.sources.file.local.engines.duckdb import scan_query
+
+            paths = source.list_files(dataset)
+            if not paths:
+                raise exc.PorterException(
+                    f"No files found for the dataset: {dataset.name} matching {source.file_glob(dataset)}"
+                )
+            self.create_from_query(
+                dataset.name,
+                scan_query(paths, dataset, source.partitioning(dataset)),
+                materialize=materialize,
+            )
+            return
+        if not materialize:
+            log.warning(
+                f"Dataset {dataset.name} can't be kept as a view over its source files, materializing it"
+            )
+        self.register_dataset(
+            dataset.name, source.read(dataset=dataset, **kwargs), materialize=True
+        )
+
+
+def create_duck_internal(engine: Optional[EngineConfig] = None) -> DuckDBSource:
+    """Create the `duck_internal` engine of a job from the engine settings of the pipeline."""
+    engine = engine or EngineConfig()
+    return DuckDBSource(
+        DuckDBSourceConfig(
+            name=DUCK_INTERNAL,
+            args={
+                "DATABASE": engine.database_path,
+                "MEMORY_LIMIT": engine.memory_limit,
+                "TEMP_DIRECTORY": engine.temp_directory,
+                "THREADS": engine.threads,
+                "PRESERVE_INSERTION_ORDER": engine.preserve_insertion_order,
+            },
+        )
+    )
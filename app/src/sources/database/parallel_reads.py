@@ -1,18 +1,291 @@
-"""Module to run functions in parallel processes with retry logic."""
+"""Module to run functions in a bounded pool of worker processes with per-task retry logic.
 
-__all__ = ["run_in_parallel", "log_process_details"]
+Workers are started once and reused for every task submitted to the pool, a failed task is
+re-submitted on its own (after a backoff) as soon as it fails, without waiting for the rest of the tasks.
+"""
 
+__all__ = [
+    "ParallelExecutor",
+    "TaskResult",
+    "run_in_parallel",
+    "log_process_details",
+    "MAX_RETRIES",
+]
 
+
+import heapq
+import os
+import time
+import random
 import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field
+
 from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.enums.common import Status
 
 MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class TaskResult(BaseModel):
+    """Outcome of one task submitted to the ParallelExecutor, including timings of the final attempt."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    arg: Any = Field(..., description="The argument the task was submitted with")
+    status: Status = Field(..., description="Final status of the task")
+    result: Any = Field(None, description="Value returned by the function")
+    exception: Optional[BaseException] = Field(
+        None, description="Exception raised by the last attempt, if the task failed"
+    )
+    attempts: int = Field(0, description="Number of attempts made for the task")
+    pid: Optional[int] = Field(
+        None, description="PID of the worker of the last attempt"
+    )
+    started_at: Optional[float] = Field(
+        None, description="Epoch time when the last attempt started in the worker"
+    )
+    finished_at: Optional[float] = Field(
+        None, description="Epoch time when the last attempt finished in the worker"
+    )
+    queued_seconds: float = Field(
+        0.0, description="Total seconds the task waited for a free worker or a backoff"
+    )
+
+    @property
+    def elapsed_seconds(self) -> Optional[float]:
+        """Seconds taken by the last attempt inside the worker."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def is_success(self) -> bool:
+        """True if the task finished successfully."""
+        return self.status == Status.success
+
+
+def _run_task(func: Callable, arg: Any, retry_cnt: int) -> Tuple:
+    """Runs inside the worker, times the call and returns the exception instead of raising it,
+    so that the timings of failed attempts are not lost.
+    """
+    started_at = time.time()
+    try:
+        result = func(arg=arg, retry_cnt=retry_cnt)
+        error = None
+    except Exception as e:
+        result, error = None, e
+    return result, error, os.getpid(), started_at, time.time()
+
+
+class ParallelExecutor:
+    """Bounded, reusable pool of worker processes.
+
+    Each task is called as `func(arg=arg, retry_cnt=retry_cnt)`, failed tasks are retried one at a time
+    with an exponential backoff (with jitter) until `max_retries` attempts are exhausted.
+    When a worker dies, the tasks which were running with it are re-run one at a time, so only the task
+    which kills its worker uses up its attempts.
+    Use it as a context manager to reuse the same workers across multiple `run` calls.
+
+    Example:
+        ```python
+        with ParallelExecutor(num_workers=4) as executor:
+            results = executor.run(ranges, extract_range)
+        ```
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        max_retries: int = MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        max_backoff_seconds: float = MAX_BACKOFF_SECONDS,
+        mp_context: Optional[str] = None,
+    ):
+        """Initializes the executor, workers are only started on the first `run` call.
+
+        Args:
+            num_workers: Number of worker processes, defaults to the number of CPUs.
+            max_retries: Max number of attempts for each task.
+            backoff_seconds: Base delay before the first retry, doubled for every retry after that.
+            max_backoff_seconds: Upper limit for the delay between retries.
+            mp_context: multiprocessing start method (fork/spawn/forkserver), defaults to the platform default.
+        """
+        if num_workers is not None and num_workers < 1:
+            raise exc.PorterException(f"num_workers should be >= 1, got {num_workers}")
+        if max_retries < 1:
+            raise exc.PorterException(f"max_retries should be >= 1, got {max_retries}")
+
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.mp_context = mp_context
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        """Start the workers."""
+        self._get_pool()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Stop the workers."""
+        self.shutdown()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            context = (
+                multiprocessing.get_context(self.mp_context)
+                if self.mp_context
+                else None
+            )
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers, mp_context=context
+            )
+        return self._pool
+
+    def shutdown(self, wait_for_tasks: bool = True):
+        """Stop all the workers of the pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait_for_tasks, cancel_futures=not wait_for_tasks)
+            self._pool = None
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (1 based) attempt that failed."""
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def run(self, args_list: List[Hashable], func: Callable) -> List[TaskResult]:
+        """Runs `func` for every argument in `args_list` on the pool and returns one TaskResult per argument,
+        in the same order as `args_list`. Exceptions are never raised, they are returned in the TaskResult.
+
+        Args:
+            args_list: List of arguments, each argument becomes a task. Arguments must be picklable.
+            func: Module level (picklable) function accepting `arg` and `retry_cnt` keyword arguments.
+        """
+        pool = self._get_pool()
+        results: Dict[int, TaskResult] = {
+            idx: TaskResult(arg=arg, status=Status.in_progress)
+            for idx, arg in enumerate(args_list)
+        }
+        submitted_at: Dict[int, float] = {}
+        running: Dict[Future, int] = {}
+        # heap of (ready_at, idx) for tasks waiting for their backoff to expire
+        delayed: List[Tuple[float, int]] = []
+        # tasks which were running along with others when a worker died, they're re-run one at a time
+        # so that only the task which kills its worker is charged an attempt
+        suspects: Deque[int] = deque()
+
+        def submit(idx: int):
+            task = results[idx]
+            submitted_at[idx] = time.time()
+            future = pool.submit(_run_task, func, task.arg, task.attempts)
+            running[future] = idx
+
+        for idx in results:
+            submit(idx)
+
+        while running or delayed or suspects:
+            now = time.time()
+            if suspects:
+                if not running:
+                    submit(suspects.popleft())
+            else:
+                while delayed and delayed[0][0] <= now:
+                    _, idx = heapq.heappop(delayed)
+                    submit(idx)
+
+            timeout = (
+                max(0.0, delayed[0][0] - now) if delayed and not suspects else None
+            )
+            if not running:
+                time.sleep(timeout)
+                continue
+
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            broken = any(
+                isinstance(future.exception(), BrokenProcessPool) for future in done
+            )
+            isolate = False
+            if broken:
+                # a dead worker (killed/OOM) breaks the whole pool, every task still running in it fails along with it
+                done = wait(list(running))[0]
+                casualties = [
+                    running[future]
+                    for future in done
+                    if isinstance(future.exception(), BrokenProcessPool)
+                ]
+                # with a single task in the pool the dead worker was running it, otherwise any of them could be the cause
+                isolate = len(casualties) > 1
+            for future in done:
+                idx = running.pop(future)
+                task = results[idx]
+                try:
+                    result, error, pid, started_at, finished_at = future.result()
+                except BrokenProcessPool as e:
+                    if isolate:
+                        task.status, task.exception = Status.retry, e
+                        suspects.append(idx)
+                        continue
+                    result, error, pid = None, e, None
+                    started_at, finished_at = submitted_at[idx], time.time()
+                except Exception as e:
+                    # the result could not be un-pickled
+                    result, error, pid = None, e, None
+                    started_at, finished_at = submitted_at[idx], time.time()
+
+                task.attempts += 1
+                task.pid = pid
+                task.started_at, task.finished_at = started_at, finished_at
+                task.queued_seconds += max(0.0, started_at - submitted_at[idx])
+
+                if error is None:
+                    task.status, task.result, task.exception = (
+                        Status.success,
+                        result,
+                        None,
+                    )
+                    log.debug(
+                        f"Task for arg {task.arg} succeeded in {task.elapsed_seconds:.3f}s "
+                        f"on attempt {task.attempts} (pid: {pid})"
+                    )
+                elif task.attempts < self.max_retries:
+                    delay = self._backoff(task.attempts)
+                    task.status, task.exception = Status.retry, error
+                    log.warning(
+                        f"Task for arg {task.arg} failed on attempt {task.attempts} with: {error!r}, "
+                        f"retrying in {delay:.2f}s"
+                    )
+                    heapq.heappush(delayed, (time.time() + delay, idx))
+                else:
+                    task.status, task.exception = Status.failure, error
+                    log.error(
+                        f"Task for arg {task.arg} reached max retries ({self.max_retries}), "
+                        f"last error: {error!r}"
+                    )
+
+            if broken:
+                if isolate:
+                    log.warning(
+                        f"A worker died while running {len(casualties)} tasks, "
+                        f"re-running them one at a time to find the one that kills it"
+                    )
+                # start a new pool for the retries, all the futures of the broken one are handled by now
+                self.shutdown(wait_for_tasks=False)
+                pool = self._get_pool()
+
+        return [results[idx] for idx in range(len(args_list))]
 
 
 def log_process_details(arg, retry_cnt):
     """Logs the process details including parent and child process IDs, argument, and retry count."""
-    import os
-
     print(
         f"parent: {os.getppid()}, "
         f"child process: {os.getpid()} "
@@ -24,38 +297,63 @@ def log_process_details(arg, retry_cnt):
         raise Exception("Simulated exception in child process")
 
 
-def run_in_parallel(args_list, func):
-    """Runs the given function in parallel processes for each argument in args_list."""
-    retry_state = {arg: 0 for arg in args_list}
-    args_to_run = set(args_list)
+def run_in_parallel(
+    args_list,
+    func,
+    num_workers: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    backoff_seconds: Optional[float] = None,
+    raise_on_failure: bool = True,
+    executor: Optional[ParallelExecutor] = None,
+) -> List[TaskResult]:
+    """Runs the given function in a pool of worker processes for each argument in args_list.
 
-    while args_to_run:
-        processes = {}
-        for arg in args_to_run:
-            p = multiprocessing.Process(
-                target=func, kwargs={"arg": arg, "retry_cnt": retry_state[arg]}
+    Args:
+        args_list: List of arguments, each one is passed to `func` as `arg`.
+        func: Function to run, called as `func(arg=arg, retry_cnt=retry_cnt)`.
+        num_workers: Number of worker processes, defaults to the number of CPUs.
+        max_retries: Max number of attempts for each argument, defaults to MAX_RETRIES.
+        backoff_seconds: Base delay before retrying a failed argument, defaults to DEFAULT_BACKOFF_SECONDS.
+        raise_on_failure: Raise PorterException if any argument failed after all the retries.
+        executor: Reuse the workers of an already running ParallelExecutor instead of starting new ones.
+            The executor has its own workers and retry settings, so they can't be passed along with it.
+
+    Returns:
+        List of TaskResult in the same order as args_list.
+    """
+    if executor is not None:
+        if (
+            num_workers is not None
+            or max_retries is not None
+            or backoff_seconds is not None
+        ):
+            raise exc.PorterException(
+                "num_workers, max_retries and backoff_seconds can't be passed along with an executor, "
+                "they are settings of the ParallelExecutor"
             )
-            processes[arg] = p
-            p.start()
-        for arg, p in processes.items():
-            p.join()
-
-        failed_args = set()
-        for arg, p in processes.items():
-            if p.exitcode != 0:
-                log.error(
-                    f"Process {p.pid} for arg {arg} failed with exit code {p.exitcode}"
-                )
-                retry_state[arg] += 1
-                print(retry_state)
-                if retry_state[arg] < MAX_RETRIES:
-                    failed_args.add(arg)
-                else:
-                    log.error(f"Arg {arg} reached max retries ({MAX_RETRIES})")
-                    exit(1)
-        args_to_run = failed_args
+        results = executor.run(args_list, func)
+    else:
+        with ParallelExecutor(
+            num_workers=num_workers,
+            max_retries=MAX_RETRIES if max_retries is None else max_retries,
+            backoff_seconds=DEFAULT_BACKOFF_SECONDS
+            if backoff_seconds is None
+            else backoff_seconds,
+        ) as new_executor:
+            results = new_executor.run(args_list, func)
+
+    failed = [r for r in results if not r.is_success]
+    if failed and raise_on_failure:
+        raise exc.PorterException(
+            f"{len(failed)} out of {len(results)} parallel tasks failed, "
+            f"failed args: {[r.arg for r in failed]}"
+        ) from failed[0].exception
+    return results
 
 
 if __name__ == "__main__":
     # Example usage with list of strings
-    run_in_parallel(["a", "b", "fail", "d"], log_process_details)
+    for task_result in run_in_parallel(
+        ["a", "b", "fail", "d"], log_process_details, raise_on_failure=False
+    ):
+        print(task_result.arg, task_result.status, task_result.attempts)
@@ -0,0 +1,386 @@
+"""Range partitioning of Table-based datasets, so that they can be extracted in parallel.
+
+A single boundary query finds the min/max of the `split-by` column (or expression) and the range is cut
+into `num_executors` slices. Each slice is extracted by a worker of the ParallelExecutor into a parquet
+file in the staging directory, which is then loaded into the engine as one table.
+
+For skewed split-by values the `quantile` strategy asks the source for the values which cut the dataset into
+partitions with a similar number of rows, instead of cutting the min/max range into equal widths.
+"""
+
+__all__ = [
+    "Partition",
+    "PartitionTask",
+    "PartitionOutput",
+    "PartitionBalance",
+    "boundary_query",
+    "plan_partitions",
+    "plan_quantile_partitions",
+    "partition_balance",
+    "partition_query",
+    "extract_partition",
+    "extract_table_in_parallel",
+]
+
+
+import math
+import os
+import statistics
+import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow.parquet as pq
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.common.base_logger import log
+from src.common import exceptions as exc
+from src.enums.datasets import FileTypes, PartitionStrategy
+from src.models.dataset.table import TableDataset
+from src.sources.database.base import DatabaseSource
+from src.sources.database.duckdb.duckdb_source import DuckDBSource
+from src.sources.database.parallel_reads import ParallelExecutor, run_in_parallel
+
+LOWER_BOUND_PARAM = "porter_lower_bound"
+UPPER_BOUND_PARAM = "porter_upper_bound"
+
+
+class Partition(BaseModel):
+    """A slice of the `split-by` range, rows with `lower <= split-by < upper` belong to the partition.
+    The last partition also includes the upper bound, and the first one includes NULL values.
+    """
+
+    index: int = Field(..., description="Position of the partition in the range")
+    lower: Any = Field(None, description="Lower bound (inclusive) of the partition")
+    upper: Any = Field(None, description="Upper bound of the partition")
+    include_upper: bool = Field(
+        False, description="Whether the upper bound is inclusive"
+    )
+    include_nulls: bool = Field(
+        False,
+        description="Whether rows where the split-by is NULL belong to the partition",
+    )
+
+
+class PartitionTask(BaseModel):
+    """Everything a worker needs to extract one partition, has to be picklable."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    source: DatabaseSource
+    query: str
+    values_to_bind: Optional[Dict] = None
+    output_path: Path
+    partition: Partition
+
+    def __hash__(self):
+        """Tasks are identified by their output file."""
+        return hash(self.output_path)
+
+
+class PartitionOutput(BaseModel):
+    """Result of extracting one partition."""
+
+    path: Path
+    num_rows: int
+    num_bytes: int
+
+
+class PartitionBalance(BaseModel):
+    """Report of how balanced the extracted partitions of a dataset were."""
+
+    num_partitions: int
+    total_rows: int
+    min_rows: int
+    max_rows: int
+    mean_rows: float
+    skew: float = Field(
+        ...,
+        description="Rows of the largest partition divided by the mean rows per partition, 1.0 is perfectly balanced",
+    )
+    coefficient_of_variation: float = Field(
+        ...,
+        description="Standard deviation of the rows per partition divided by the mean",
+    )
+    rows_per_partition: List[int]
+
+
+def boundary_query(base_query: str, split_by: str) -> str:
+    """Query which returns the min and max of the split-by column/expression in one scan."""
+    return (
+        f"SELECT MIN({split_by}) AS lower_bound, MAX({split_by}) AS upper_bound "
+        f"FROM ({base_query}) porter_boundary"
+    )
+
+
+def _cut_points(lower: Any, upper: Any, num_partitions: int) -> List[Any]:
+    """Returns the `num_partitions + 1` points that split [lower, upper] into equal width ranges."""
+    if isinstance(lower, datetime.datetime):
+        step = (upper - lower) / num_partitions
+        points = [lower + step * i for i in range(num_partitions)]
+    elif isinstance(lower, datetime.date):
+        # cut on whole days, so that no date falls in between 2 partitions
+        start, end = lower.toordinal(), upper.toordinal()
+        step = max(1, math.ceil((end - start + 1) / num_partitions))
+        points = [datetime.date.fromordinal(day) for day in range(start, end + 1, step)]
+    elif isinstance(lower, int) and isinstance(upper, int):
+        step = max(1, math.ceil((upper - lower + 1) / num_partitions))
+        points = list(range(lower, upper + 1, step))
+    elif isinstance(lower, (int, float, Decimal)):
+        step = (upper - lower) / num_partitions
+        points = [lower + step * i for i in range(num_partitions)]
+    else:
+        raise exc.PorterException(
+            f"split-by should be numeric or date/time, got: {type(lower).__name__}"
+        )
+    return points + [upper]
+
+
+def plan_partitions(lower: Any, upper: Any, num_partitions: int) -> List[Partition]:
+    """Cut the [lower, upper] range into (at most) `num_partitions` equal width partitions.
+    Numeric, date and datetime bounds are supported. Integer and date ranges are cut on whole values,
+    so narrow ranges can have less partitions than requested.
+    """
+    if num_partitions < 1:
+        raise exc.PorterException(
+            f"Number of partitions should be >= 1, got {num_partitions}"
+        )
+    if lower is None or upper is None:
+        # empty table, or split-by is always NULL
+        return [Partition(index=0, include_nulls=True)]
+
+    points = _cut_points(lower, upper, num_partitions)
+    return _partitions_from_points(points)
+
+
+def _partitions_from_points(points: List[Any]) -> List[Partition]:
+    """Build the partitions between each consecutive pair of the sorted cut points."""
+    if len(points) == 0:
+        return [Partition(index=0, include_nulls=True)]
+    if len(points) == 1 or points[0] == points[-1]:
+        points = [points[0], points[-1]]
+
+    partitions = []
+    for index, (start, end) in enumerate(zip(points[:-1], points[1:])):
+        partitions.append(
+            Partition(
+                index=index,
+                lower=start,
+                upper=end,
+                include_upper=index == len(points) - 2,
+                include_nulls=index == 0,
+            )
+        )
+    return partitions
+
+
+def plan_quantile_partitions(
+    source: DatabaseSource,
+    query: str,
+    split_by: str,
+    num_partitions: int,
+    values_to_bind: Optional[Dict] = None,
+) -> List[Partition]:
+    """Cut the dataset into (at most) `num_partitions` partitions with a similar number of rows,
+    using the split points returned by the source. Values repeated more than a partition worth of rows
+    can't be split, so heavily repeated values can result in less partitions than requested.
+    """
+    if num_partitions < 1:
+        raise exc.PorterException(
+            f"Number of partitions should be >= 1, got {num_partitions}"
+        )
+    points = source.fetch_split_points(query, split_by, num_partitions, values_to_bind)
+    return _partitions_from_points(points)
+
+
+def partition_balance(outputs: List[PartitionOutput]) -> PartitionBalance:
+    """Summarize how evenly the rows were spread across the extracted partitions."""
+    rows = [output.num_rows for output in outputs]
+    mean_rows = statistics.fmean(rows) if rows else 0.0
+    return PartitionBalance(
+        num_partitions=len(rows),
+        total_rows=sum(rows),
+        min_rows=min(rows, default=0),
+        max_rows=max(rows, default=0),
+        mean_rows=mean_rows,
+        skew=max(rows) / mean_rows if mean_rows else 1.0,
+        coefficient_of_variation=statistics.pstdev(rows) / mean_rows
+        if mean_rows
+        else 0.0,
+        rows_per_partition=rows,
+    )
+
+
+def partition_query(
+    dataset: TableDataset, split_by: str, partition: Partition
+) -> Tuple[str, Dict]:
+    """Returns the query and values to bind which extract only the given partition of the dataset."""
+    values_to_bind = dict(dataset.values_to_bind or {})
+    if dataset.query:
+        query = f"SELECT * FROM ({dataset.query}) porter_partition"
+    else:
+        query = DatabaseSource.dataset_query(dataset)
+
+    if partition.lower is None and partition.upper is None:
+        return query, values_to_bind
+
+    upper_op = "<=" if partition.include_upper else "<"
+    condition = (
+        f"({split_by}) >= :{LOWER_BOUND_PARAM} "
+        f"AND ({split_by}) {upper_op} :{UPPER_BOUND_PARAM}"
+    )
+    if partition.include_nulls:
+        condition = f"({condition}) OR ({split_by}) IS NULL"
+
+    values_to_bind[LOWER_BOUND_PARAM] = partition.lower
+    values_to_bind[UPPER_BOUND_PARAM] = partition.upper
+    return f"{query} WHERE {condition}", values_to_bind
+
+
+# Connected sources of the worker process keyed by the name of the source. Workers of the ParallelExecutor
+# outlive a task, so every partition (and every dataset) extracted by the same worker reuses one connection
+_worker_sources: Dict[str, DatabaseSource] = {}
+
+
+def _worker_source(source: DatabaseSource) -> DatabaseSource:
+    """Connected source of the worker process, the source of the task is a fresh (unconnected) unpickled copy."""
+    name = source.config.name
+    if name not in _worker_sources or not _worker_sources[name].is_healthy():
+        _discard_worker_source(name)
+        source.connect()
+        _worker_sources[name] = source
+    return _worker_sources[name]
+
+
+def _discard_worker_source(name: str):
+    """Close the connection of the worker process, called when a task fails as the connection might be broken."""
+    source = _worker_sources.pop(name, None)
+    if source is not None:
+        try:
+            source.disconnect()
+        except Exception as e:
+            log.warning(f"Failed to close the connection of {name}: {e!r}")
+
+
+def extract_partition(arg: PartitionTask, retry_cnt: int) -> PartitionOutput:
+    """Runs in the worker process, extracts one partition into a parquet file.
+    The file is written under a temporary name and renamed when complete, so retries never leave half written files.
+    The connection to the source is kept open and reused by the next tasks of the same worker.
+    """
+    tmp_path = arg.output_path.with_suffix(f".{os.getpid()}.{retry_cnt}.tmp")
+    num_rows = 0
+    try:
+        source = _worker_source(arg.source)
+        reader = source.read_query(arg.query, arg.values_to_bind)
+        with pq.ParquetWriter(tmp_path, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                num_rows += batch.num_rows
+        os.replace(tmp_path, arg.output_path)
+    except BaseException:
+        _discard_worker_source(arg.source.config.name)
+        raise
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    return PartitionOutput(
+        path=arg.output_path,
+        num_rows=num_rows,
+        num_bytes=arg.output_path.stat().st_size,
+    )
+
+
+def extract_table_in_parallel(
+    source: DatabaseSource,
+    dataset: TableDataset,
+    staging_dir: Path,
+    engine: Optional[DuckDBSource] = None,
+    executor: Optional[ParallelExecutor] = None,
+    materialize: bool = True,
+) -> List[PartitionOutput]:
+    """Extract a Table-based dataset into parquet files under `staging_dir/<dataset name>/`.
+    If the dataset has `num_executors` > 1 and a `split-by`, the dataset is range partitioned and the
+    partitions are extracted in parallel, otherwise the dataset is extracted as a single partition.
+
+    Args:
+        source: Source from which the dataset is extracted.
+        dataset: The dataset to be extracted.
+        staging_dir: Directory in which the partition files are written.
+        engine: If passed, all the partitions are loaded into the engine as a table named after the dataset.
+        executor: Reuse the workers of an already running ParallelExecutor.
+        materialize: Copy the partitions into an engine table, or keep the dataset as a view over the partition files.
+
+    Returns:
+        One PartitionOutput per partition, in the order of the partitions.
+    """
+    args = dataset.args
+    split_by = getattr(args, "split_by", None)
+    num_executors = getattr(args, "num_executors", 1)
+    strategy = getattr(args, "partition_strategy", PartitionStrategy.range)
+    num_partitions = num_executors * getattr(args, "partitions_per_executor", 1)
+
+    if split_by and num_executors > 1:
+        base_query = DatabaseSource.dataset_query(dataset)
+        if strategy == PartitionStrategy.quantile:
+            partitions = plan_quantile_partitions(
+                source, base_query, split_by, num_partitions, dataset.values_to_bind
+            )
+        else:
+            lower, upper = source.fetch_one(
+                boundary_query(base_query, split_by), dataset.values_to_bind
+            ) or (None, None)
+            partitions = plan_partitions(lower, upper, num_partitions)
+        log.info(
+            f"Dataset {dataset.name}: split-by {split_by} ranges from {partitions[0].lower} "
+            f"to {partitions[-1].upper}, extracting {len(partitions)} {strategy.value} partitions "
+            f"with {num_executors} executors"
+        )
+    else:
+        partitions = [Partition(index=0)]
+
+    output_dir = Path(staging_dir, dataset.name)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks = []
+    for partition in partitions:
+        query, values_to_bind = partition_query(dataset, split_by, partition)
+        tasks.append(
+            PartitionTask(
+                source=source,
+                query=query,
+                values_to_bind=values_to_bind,
+                output_path=Path(output_dir, f"part-{partition.index:05d}.parquet"),
+                partition=partition,
+            )
+        )
+
+    if executor is not None:
+        results = run_in_parallel(tasks, extract_partition, executor=executor)
+    else:
+        results = run_in_parallel(tasks, extract_partition, num_workers=num_executors)
+
+    outputs = [task_result.result for task_result in results]
+    balance = partition_balance(outputs)
+    for task_result in results:
+        output: PartitionOutput = task_result.result
+        share = output.num_rows / balance.total_rows if balance.total_rows else 0.0
+        log.info(
+            f"Dataset {dataset.name}: partition {task_result.arg.partition.index} extracted "
+            f"{output.num_rows} rows ({share:.1%}) in {task_result.elapsed_seconds:.2f}s "
+            f"(attempts: {task_result.attempts}, queued: {task_result.queued_seconds:.2f}s)"
+        )
+    log.info(
+        f"Dataset {dataset.name}: {balance.total_rows} rows in {balance.num_partitions} partitions, "
+        f"skew (max/mean): {balance.skew:.2f}, coefficient of variation: {balance.coefficient_of_variation:.2f}"
+    )
+
+    if engine is not None:
+        engine.load_files(
+            dataset.name,
+            [output.path for output in outputs],
+            FileTypes.parquet,
+            materialize=materialize,
+        )
+    return outputs
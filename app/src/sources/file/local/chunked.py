@@ -0,0 +1,332 @@
+"""Chunked readers of large CSV and fixed width files.
+
+Each file is memory mapped and split into chunks of `chunk_size` bytes on record boundaries (a chunk always ends
+right after a newline), the chunks are decoded into Arrow arrays in parallel and their batches are yielded in the
+order of the file. Only the chunks being decoded are in memory, the pages of the file are loaded (and evicted) by
+the OS, so a file of any size can be read.
+
+- Fixed width records are sliced with Arrow compute kernels, a chunk at a time: the columns are laid out in the
+  order of `Dataset.columns`, each `precision` characters wide, and converted to the `datatype` of the column.
+- CSV chunks are parsed by the Arrow CSV parser, with the names of the columns from the header of the file and the
+  `datatype` of the columns. A chunk can't tell the type of a column for the whole file, so the columns without a
+  datatype are read as strings, as they are in fixed width files. As files are split on newlines, CSV files with
+  newlines inside quoted values can't be read this way.
+"""
+
+__all__ = ["read_text_files"]
+
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from src.common import exceptions as exc
+from src.enums.datasets import FileTypes
+from src.models.dataset.base import Column
+from src.models.dataset.file import FileArgs, FileDataset
+from src.sources.batches import as_record_batch_reader
+from src.sources.file.local.engines.pyarrow import filters_to_expression
+from src.sources.file.partitions import (
+    Partitioning,
+    coerce_filters,
+    with_partition_columns,
+)
+from src.sources.schema import arrow_type, declared_types
+
+# bytes read at a time to find the end of the record a chunk boundary falls into
+_SCAN_SIZE = 64 * 1024
+_NEWLINE = 0x0A
+
+
+def _next_record(file: pa.MemoryMappedFile, position: int, size: int) -> int:
+    """Position right after the newline at or after `position`, the size of the file if there's none."""
+    while position < size:
+        file.seek(position)
+        window = file.read_buffer(min(_SCAN_SIZE, size - position))
+        index = window.to_pybytes().find(b"\n")
+        if index >= 0:
+            return position + index + 1
+        position += window.size
+    return size
+
+
+def _chunks(
+    file: pa.MemoryMappedFile, start: int, size: int, chunk_size: int
+) -> Iterator[pa.Buffer]:
+    """Zero-copy buffers of the records of the file from `start`, about `chunk_size` bytes each."""
+    while start < size:
+        end = _next_record(file, min(start + chunk_size, size), size)
+        file.seek(start)
+        yield file.read_buffer(end - start)
+        start = end
+
+
+def _utf8(buffer: pa.Buffer, encoding: str) -> pa.Buffer:
+    """The chunk encoded as UTF-8, which is what the Arrow string kernels expect."""
+    if encoding.replace("-", "").replace("_", "").lower() in ("utf8", "ascii"):
+        return buffer
+    return pa.py_buffer(buffer.to_pybytes().decode(encoding).encode("utf-8"))
+
+
+def _lines(buffer: pa.Buffer) -> pa.StringArray:
+    """The records of the chunk as a string array over the same memory, without the newlines and blank records."""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    ends = np.flatnonzero(data == _NEWLINE) + 1
+    if not len(ends) or ends[-1] != len(data):
+        # the last record of the file has no newline
+        ends = np.append(ends, len(data))
+    offsets = np.concatenate(([0], ends)).astype(np.int32)
+    lines = pa.StringArray.from_buffers(len(ends), pa.py_buffer(offsets), buffer)
+    lines = pc.utf8_rtrim(lines, characters="\r\n")
+    return lines.filter(pc.greater(pc.utf8_length(lines), 0))
+
+
+def _implied_decimal(values: pa.Array, target: pa.DataType) -> pa.Array:
+    """Decimals with an implied decimal point before the last `scale` digits (Example: -0001234 is -12.34).
+    Values written with a decimal point are kept as they are.
+    """
+    # `scale` zeros in front of the digits, so that values shorter than the scale get their point too (1 is 0.01)
+    values = pc.replace_substring_regex(
+        values,
+        pattern=r"^([+-]?)(\d+)$",
+        replacement=r"\1" + "0" * target.scale + r"\2",
+    )
+    values = pc.replace_substring_regex(
+        values,
+        pattern=rf"^([+-]?\d*)(\d{{{target.scale}}})$",
+        replacement=r"\1.\2",
+    )
+    return values.cast(target)
+
+
+def _convert(values: pa.Array, column: Column, target: pa.DataType) -> pa.Array:
+    """Convert the trimmed text of a fixed width column to its type, empty values are NULL."""
+    if pa.types.is_string(target) or pa.types.is_large_string(target):
+        return values.cast(target)
+    values = pc.if_else(pc.equal(values, ""), pa.scalar(None, pa.string()), values)
+    try:
+        if pa.types.is_decimal(target) and target.scale:
+            return _implied_decimal(values, target)
+        if (
+            pa.types.is_date(target)
+            and not pc.any(pc.match_substring(values, "-")).as_py()
+        ):
+            # dates written without separators (Example: 20240131)
+            return pc.strptime(values, format="%Y%m%d", unit="s").cast(target)
+        return values.cast(target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise exc.PorterException(
+            f"Values of the column {column.name} can't be read as {column.datatype}: {e}"
+        ) from e
+
+
+def _fixed_width_layout(
+    dataset: FileDataset,
+) -> List[Tuple[Column, int, int, pa.DataType]]:
+    """(column, start, width, type) of each column of a fixed width record."""
+    if not dataset.columns:
+        raise exc.PorterException(
+            f"Dataset {dataset.name}: fixed width files need `columns`, with the width of each column as its precision"
+        )
+    layout, start = [], 0
+    for column in dataset.columns:
+        if not column.precision or column.precision <= 0:
+            raise exc.PorterException(
+                f"Dataset {dataset.name}: the column {column.name} of a fixed width file needs its width as precision"
+            )
+        layout.append(
+            (column, start, column.precision, arrow_type(column) or pa.string())
+        )
+        start += column.precision
+    return layout
+
+
+def _decode_fixed_width(buffer: pa.Buffer, dataset: FileDataset) -> pa.Table:
+    """Slice the records of the chunk into the columns of the dataset."""
+    lines = _lines(_utf8(buffer, dataset.args.encoding))
+    arrays, fields = [], []
+    for column, start, width, target in _fixed_width_layout(dataset):
+        text = pc.utf8_trim_whitespace(
+            pc.utf8_slice_codeunits(lines, start=start, stop=start + width)
+        )
+        arrays.append(_convert(text, column, target))
+        fields.append(pa.field(column.name, target))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _csv_header(
+    file: pa.MemoryMappedFile, start: int, size: int, args: FileArgs
+) -> Tuple[List[str], int]:
+    """Names of the columns from the header of the CSV file, and the position of the first record after it."""
+    end = _next_record(file, start, size)
+    file.seek(start)
+    header = pacsv.read_csv(
+        pa.BufferReader(file.read_buffer(end - start)),
+        read_options=pacsv.ReadOptions(encoding=args.encoding, use_threads=False),
+        parse_options=pacsv.ParseOptions(delimiter=args.delimiter),
+    )
+    return header.column_names, end
+
+
+def _decode_csv(
+    buffer: pa.Buffer,
+    dataset: FileDataset,
+    names: List[str],
+    column_types: dict,
+    include_columns: Optional[List[str]],
+) -> pa.Table:
+    """Parse the records of the chunk, with the given names and types of the columns."""
+    try:
+        return pacsv.read_csv(
+            pa.BufferReader(buffer),
+            read_options=pacsv.ReadOptions(
+                column_names=names, encoding=dataset.args.encoding, use_threads=False
+            ),
+            parse_options=pacsv.ParseOptions(delimiter=dataset.args.delimiter),
+            convert_options=pacsv.ConvertOptions(
+                column_types=column_types, include_columns=include_columns
+            ),
+        )
+    except pa.ArrowInvalid as e:
+        raise exc.PorterException(
+            f"Dataset {dataset.name}: a chunk of the CSV file can't be parsed with the datatype of the columns: {e}"
+        ) from e
+
+
+def _file_tasks(
+    path: str,
+    dataset: FileDataset,
+    partitioning: Optional[Partitioning],
+    finish: Callable[[pa.Table], pa.Table],
+) -> Iterator[Callable[[], pa.Table]]:
+    """Functions decoding each chunk of the file into a table, in the order of the file."""
+    file = pa.memory_map(path)
+    size = file.size()
+    start = 0
+    for _ in range(dataset.args.skip_rows):
+        start = _next_record(file, start, size)
+
+    def done(table: pa.Table) -> pa.Table:
+        if partitioning is not None:
+            table = with_partition_columns(table, path, partitioning)
+        return finish(table)
+
+    if dataset.file_type == FileTypes.fixed_width:
+        for buffer in _chunks(file, start, size, dataset.args.chunk_size):
+            yield lambda buffer=buffer: done(_decode_fixed_width(buffer, dataset))
+        return
+
+    names: List[str]
+    if dataset.args.header:
+        names, start = _csv_header(file, start, size, dataset.args)
+    else:
+        first = _next_record(file, start, size)
+        file.seek(start)
+        count = pacsv.read_csv(
+            pa.BufferReader(file.read_buffer(first - start)),
+            read_options=pacsv.ReadOptions(autogenerate_column_names=True),
+            parse_options=pacsv.ParseOptions(delimiter=dataset.args.delimiter),
+        ).num_columns
+        names = [f"f{index}" for index in range(count)]
+
+    keys = partitioning.schema.names if partitioning is not None else []
+    include_columns = None
+    # every chunk is parsed with the same types, the columns without a datatype are strings
+    declared = declared_types(dataset)
+    column_types = {name: declared.get(name, pa.string()) for name in names}
+    if dataset.columns:
+        # the filters can be on columns which are not selected, partition keys are not in the files
+        filtered = [column for column, _, _ in dataset.filters or []]
+        include_columns = [
+            name
+            for name in dict.fromkeys([c.name for c in dataset.columns] + filtered)
+            if name not in keys
+        ]
+
+    for buffer in _chunks(file, start, size, dataset.args.chunk_size):
+        yield lambda buffer=buffer: done(
+            _decode_csv(buffer, dataset, names, column_types, include_columns)
+        )
+
+
+def _read_in_parallel(
+    paths: List[str],
+    dataset: FileDataset,
+    partitioning: Optional[Partitioning],
+    finish: Callable[[pa.Table], pa.Table],
+) -> Iterator[pa.RecordBatch]:
+    """Decode the chunks of all the files in parallel, and yield their batches in order.
+    At most twice as many chunks as there are threads are in flight at the same time.
+    """
+    workers = min(dataset.max_parallel_files, os.cpu_count() or 1)
+    tasks = (
+        task
+        for path in paths
+        for task in _file_tasks(path, dataset, partitioning, finish)
+    )
+    schema: Optional[pa.Schema] = None
+    executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="porter-chunks"
+    )
+    try:
+        decoding = deque(
+            executor.submit(task) for _, task in zip(range(workers * 2), tasks)
+        )
+        while decoding:
+            table = decoding.popleft().result()
+            task = next(tasks, None)
+            if task is not None:
+                decoding.append(executor.submit(task))
+            if schema is None:
+                schema = table.schema
+                if not table.num_rows:
+                    yield pa.RecordBatch.from_pylist([], schema=schema)
+            elif table.schema != schema:
+                table = table.cast(schema)
+            yield from table.to_batches()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def read_text_files(
+    paths: List[str],
+    dataset: FileDataset,
+    partitioning: Optional[Partitioning] = None,
+) -> pa.RecordBatchReader:
+    """Read large CSV or fixed width files in chunks decoded in parallel, and stream the record batches.
+    The `filters` of the dataset are applied to each chunk. Only the `columns` of CSV files are read, while the columns
+    of fixed width files are all read as they're the layout of the records.
+    """
+    if dataset.file_type not in (FileTypes.csv, FileTypes.fixed_width):
+        raise exc.PorterException(
+            f"File type: {dataset.file_type.value} can't be read in chunks"
+        )
+    columns = None
+    schema = None
+    if dataset.file_type == FileTypes.fixed_width:
+        schema = pa.schema(
+            pa.field(column.name, target)
+            for column, _, _, target in _fixed_width_layout(dataset)
+        )
+        if partitioning is not None:
+            schema = pa.unify_schemas([schema, partitioning.schema])
+    elif dataset.columns:
+        columns = [column.name for column in dataset.columns]
+
+    def finish(table: pa.Table) -> pa.Table:
+        expression = filters_to_expression(
+            coerce_filters(dataset.filters, table.schema)
+        )
+        if expression is not None:
+            table = table.filter(expression)
+        return table.select(columns) if columns else table
+
+    return as_record_batch_reader(
+        _read_in_parallel(paths, dataset, partitioning, finish), schema=schema
+    )
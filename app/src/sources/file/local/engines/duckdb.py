@@ -1 +1,161 @@
 """DuckDB Engine to read files"""
+
+__all__ = ["read_files", "scan_query", "filters_to_sql"]
+
+import datetime
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import duckdb
+import pyarrow as pa
+
+from src.common import exceptions as exc
+from src.enums.datasets import FileTypes
+from src.models.dataset.file import FileDataset
+from src.sources.batches import DEFAULT_BATCH_SIZE
+from src.sources.database.duckdb.duckdb_source import (
+    FILE_READERS,
+    quote_identifier,
+    quote_literal,
+)
+from src.sources.file.partitions import Partitioning
+from src.sources.schema import declared_schema, declared_types, duckdb_type
+
+
+def _sql_literal(value: Any) -> str:
+    """SQL literal of a value of a filter."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime.datetime):
+        return f"TIMESTAMP {quote_literal(value.isoformat(sep=' '))}"
+    if isinstance(value, datetime.date):
+        return f"DATE {quote_literal(value.isoformat())}"
+    return quote_literal(str(value))
+
+
+def filters_to_sql(filters: Optional[List[Tuple[str, str, Any]]]) -> Optional[str]:
+    """WHERE condition of the filters of a file dataset (all of them should be true), None without filters."""
+    conditions = []
+    for column, op, value in filters or []:
+        op = op.lower()
+        if op in ("in", "not in"):
+            values = ", ".join(_sql_literal(item) for item in value)
+            conditions.append(f"{quote_identifier(column)} {op.upper()} ({values})")
+        elif value is None and op in ("=", "==", "!="):
+            check = "IS NOT NULL" if op == "!=" else "IS NULL"
+            conditions.append(f"{quote_identifier(column)} {check}")
+        else:
+            op = "=" if op == "==" else op
+            conditions.append(f"{quote_identifier(column)} {op} {_sql_literal(value)}")
+    return " AND ".join(conditions) or None
+
+
+def _hive_types(partitioning: Partitioning) -> str:
+    """`hive_types` argument of the DuckDB file readers, so the partition keys have the types of the partitioning."""
+    types = ", ".join(
+        f"{quote_literal(field.name)}: {quote_literal(duckdb_type(field.type))}"
+        for field in partitioning.schema
+    )
+    return "{" + types + "}"
+
+
+def _duckdb_types(dataset: FileDataset) -> Dict[str, str]:
+    """DuckDB type of each column of the dataset which has a datatype, by name.
+    Datatypes which Porter doesn't know are passed as is, they can be types only DuckDB knows.
+    """
+    arrow_types = declared_types(dataset)
+    return {
+        column.name: duckdb_type(arrow_types[column.name])
+        if column.name in arrow_types
+        else column.datatype
+        for column in dataset.columns or []
+        if column.datatype
+    }
+
+
+def _struct(types: Dict[str, str]) -> str:
+    """DuckDB struct literal of column names and types."""
+    fields = ", ".join(
+        f"{quote_literal(name)}: {quote_literal(sql_type)}"
+        for name, sql_type in types.items()
+    )
+    return "{" + fields + "}"
+
+
+def _select_list(dataset: FileDataset, types: Dict[str, str]) -> str:
+    """Columns of the dataset cast to their datatype and renamed to their target_name, all columns if none."""
+    if not dataset.columns:
+        return "*"
+    expressions = []
+    for column in dataset.columns:
+        expression = quote_identifier(column.name)
+        if column.name in types:
+            expression = f"CAST({expression} AS {types[column.name]})"
+        target = column.target_name or column.name
+        if expression != quote_identifier(target):
+            expression = f"{expression} AS {quote_identifier(target)}"
+        expressions.append(expression)
+    return ", ".join(expressions)
+
+
+def scan_query(
+    paths: List[str], dataset: FileDataset, partitioning: Optional[Partitioning] = None
+) -> str:
+    """Query which scans all the files at once, with the `columns` and `filters` of the dataset pushed down
+    (Example: parquet row groups whose statistics don't match the filters are skipped).
+    The datatypes of the columns are given to the CSV/JSON readers so they're not sniffed, and the columns are
+    renamed to their target_name (the filters are on the names of the columns in the files).
+    The keys of the `key=value` directories of a partitioned dataset are read as columns.
+    """
+    if dataset.file_type not in FILE_READERS:
+        raise exc.PorterException(
+            f"File type: {dataset.file_type.value} is not supported by the duckdb engine"
+        )
+    types = _duckdb_types(dataset)
+    columns = _select_list(dataset, types)
+    files = ", ".join(quote_literal(path) for path in paths)
+    options = ""
+    if types and dataset.file_type == FileTypes.json and declared_schema(dataset):
+        # only the keys of the columns are parsed, with their types
+        options += f", columns = {_struct(types)}"
+    elif types and dataset.file_type == FileTypes.csv:
+        options += f", types = {_struct(types)}"
+    if partitioning is not None:
+        options += (
+            f", hive_partitioning = true, hive_types = {_hive_types(partitioning)}"
+        )
+    query = (
+        f"SELECT {columns} FROM {FILE_READERS[dataset.file_type]}([{files}]{options})"
+    )
+    where = filters_to_sql(dataset.filters)
+    return f"{query} WHERE {where}" if where else query
+
+
+def _keep_connection_open(
+    connection: duckdb.DuckDBPyConnection, reader: pa.RecordBatchReader
+) -> Iterator[pa.RecordBatch]:
+    """Yield the batches of the reader, and close the connection only once all of them are consumed."""
+    try:
+        yield from reader
+    finally:
+        connection.close()
+
+
+def read_files(
+    paths: List[str], dataset: FileDataset, partitioning: Optional[Partitioning] = None
+) -> pa.RecordBatchReader:
+    """Read all the files with a single DuckDB scan and stream the record batches,
+    the files are read by up to `max_parallel_files` threads (no more than the number of CPUs).
+    """
+    threads = min(dataset.max_parallel_files, os.cpu_count() or 1)
+    connection = duckdb.connect(config={"threads": threads})
+    reader = connection.execute(
+        scan_query(paths, dataset, partitioning)
+    ).to_arrow_reader(DEFAULT_BATCH_SIZE)
+    return pa.RecordBatchReader.from_batches(
+        reader.schema, _keep_connection_open(connection, reader)
+    )
@@ -1 +1,124 @@
 """Pandas Engine to read files"""
+
+__all__ = ["read_files"]
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+import pyarrow as pa
+
+from src.common import exceptions as exc
+from src.enums.datasets import FileTypes
+from src.models.dataset.file import FileDataset
+from src.sources.batches import as_record_batch_reader
+from src.sources.file.local.engines.pyarrow import filters_to_expression
+from src.sources.file.partitions import (
+    Partitioning,
+    coerce_filters,
+    with_partition_columns,
+)
+from src.sources.schema import declared_types
+
+FILE_READERS = {
+    FileTypes.csv: "read_csv",
+    FileTypes.json: "read_json",
+    FileTypes.parquet: "read_parquet",
+    FileTypes.excel: "read_excel",
+    FileTypes.xml: "read_xml",
+    FileTypes.fixed_width: "read_fwf",
+    FileTypes.orc: "read_orc",
+}
+
+# readers which take the types of the columns (`dtype`), so that they don't infer them
+TYPED_READERS = (FileTypes.csv, FileTypes.excel, FileTypes.fixed_width)
+
+# keyword of each reader which reads only the given columns
+PROJECTION_ARGS = {
+    FileTypes.csv: "usecols",
+    FileTypes.parquet: "columns",
+    FileTypes.excel: "usecols",
+    FileTypes.fixed_width: "usecols",
+    FileTypes.orc: "columns",
+}
+
+
+def _read_file(
+    path: str, dataset: FileDataset, partitioning: Optional[Partitioning] = None
+) -> pa.Table:
+    """Read one file into Arrow, with only the columns and rows of the dataset."""
+    import pandas as pd
+
+    reader = getattr(pd, FILE_READERS[dataset.file_type])
+    columns = [column.name for column in dataset.columns] if dataset.columns else None
+    kwargs = {}
+    keys = partitioning.schema.names if partitioning is not None else []
+    if columns and dataset.file_type in PROJECTION_ARGS:
+        # the filters can be on columns which are not selected, partition keys are not in the files
+        filtered = [column for column, _, _ in dataset.filters or []]
+        kwargs[PROJECTION_ARGS[dataset.file_type]] = [
+            column for column in dict.fromkeys(columns + filtered) if column not in keys
+        ]
+    if dataset.file_type in TYPED_READERS:
+        # pandas can't parse decimals into Arrow, they're cast once the file is read
+        kwargs["dtype"] = {
+            name: pd.ArrowDtype(target)
+            for name, target in declared_types(dataset).items()
+            if not pa.types.is_decimal(target)
+        }
+    table = pa.Table.from_pandas(reader(path, **kwargs), preserve_index=False)
+    if partitioning is not None:
+        table = with_partition_columns(table, path, partitioning)
+    expression = filters_to_expression(coerce_filters(dataset.filters, table.schema))
+    if expression is not None:
+        table = table.filter(expression)
+    if columns:
+        table = table.select(columns)
+    return table
+
+
+def _read_files_in_parallel(
+    paths: List[str], dataset: FileDataset, partitioning: Optional[Partitioning]
+) -> Iterator[pa.RecordBatch]:
+    """Read up to `max_parallel_files` files at the same time and yield their batches in the order of the files.
+    At most that many files are held in memory, each file is converted to Arrow as soon as it's read.
+    """
+    schema: Optional[pa.Schema] = None
+    remaining = iter(paths)
+    executor = ThreadPoolExecutor(
+        max_workers=dataset.max_parallel_files, thread_name_prefix="porter-files"
+    )
+    try:
+        reading = deque(
+            executor.submit(_read_file, path, dataset, partitioning)
+            for _, path in zip(range(dataset.max_parallel_files), remaining)
+        )
+        while reading:
+            table = reading.popleft().result()
+            path = next(remaining, None)
+            if path is not None:
+                reading.append(executor.submit(_read_file, path, dataset, partitioning))
+            # every file should have the types of the first one (Example: a column which is all NULL in a file)
+            if schema is None:
+                schema = table.schema
+                if not table.num_rows:
+                    # so that the schema is known even if the filters leave no rows
+                    yield pa.RecordBatch.from_pylist([], schema=schema)
+            elif table.schema != schema:
+                table = table.cast(schema)
+            yield from table.to_batches()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def read_files(
+    paths: List[str], dataset: FileDataset, partitioning: Optional[Partitioning] = None
+) -> pa.RecordBatchReader:
+    """Read the files with pandas and stream them as Arrow record batches.
+    The keys of the `key=value` directories of a partitioned dataset are added as columns.
+    """
+    if dataset.file_type not in FILE_READERS:
+        raise exc.PorterException(
+            f"File type: {dataset.file_type.value} is not supported by the pandas engine"
+        )
+    return as_record_batch_reader(_read_files_in_parallel(paths, dataset, partitioning))
@@ -1 +1,124 @@
 """Pyarrow Engine to read files"""
+
+__all__ = ["read_files", "filters_to_expression"]
+
+import operator
+from typing import Any, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.json as pajson
+
+from src.common import exceptions as exc
+from src.enums.datasets import FileTypes
+from src.models.dataset.file import FileDataset
+from src.sources.batches import DEFAULT_BATCH_SIZE
+from src.sources.file.partitions import Partitioning, coerce_filters
+from src.sources.schema import declared_schema, declared_types
+
+FILE_FORMATS = {
+    FileTypes.parquet: "parquet",
+    FileTypes.json: "json",
+    FileTypes.orc: "orc",
+}
+
+# text files which can be large, memory mapped and decoded in chunks in parallel
+CHUNKED_FILE_TYPES = (FileTypes.csv, FileTypes.fixed_width)
+
+_COMPARISONS = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def filters_to_expression(
+    filters: Optional[List[Tuple[str, str, Any]]],
+) -> Optional[pc.Expression]:
+    """Arrow expression of the filters of a file dataset (all of them should be true), None without filters."""
+    expression = None
+    for column, op, value in filters or []:
+        field = pc.field(column)
+        op = op.lower()
+        if op in ("in", "not in"):
+            condition = field.isin(list(value))
+            if op == "not in":
+                condition = ~condition
+        elif value is None and op in ("=", "==", "!="):
+            condition = field.is_null() if op != "!=" else ~field.is_null()
+        else:
+            condition = _COMPARISONS[op](field, value)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _json_schema(dataset: FileDataset) -> pa.Schema:
+    """Types of the JSON keys of the columns, dates and decimals are parsed as strings as JSON has no such types."""
+    fields = []
+    for name, target in declared_types(dataset).items():
+        if (
+            pa.types.is_date(target)
+            or pa.types.is_decimal(target)
+            or pa.types.is_time(target)
+        ):
+            target = pa.string()
+        fields.append(pa.field(name, target))
+    return pa.schema(fields)
+
+
+def read_files(
+    paths: List[str], dataset: FileDataset, partitioning: Optional[Partitioning] = None
+) -> pa.RecordBatchReader:
+    """Scan all the files as one Arrow dataset and stream the record batches.
+    Up to `max_parallel_files` files are read ahead at the same time, only the `columns` of the dataset are read
+    and the `filters` are pushed down (Example: parquet row groups whose statistics don't match are skipped).
+    The keys of the `key=value` directories of a partitioned dataset are read as columns.
+    When all the `columns` of the dataset have a datatype, the files are read with that schema instead of inferring it.
+    """
+    if dataset.file_type in CHUNKED_FILE_TYPES:
+        from src.sources.file.local.chunked import read_text_files
+
+        return read_text_files(paths, dataset, partitioning)
+    if dataset.file_type not in FILE_FORMATS:
+        raise exc.PorterException(
+            f"File type: {dataset.file_type.value} is not supported by the pyarrow engine"
+        )
+    partition_args = {}
+    if partitioning is not None:
+        partition_args = {
+            "partitioning": ds.partitioning(partitioning.schema, flavor="hive"),
+            "partition_base_dir": partitioning.base_dir,
+        }
+    # with the schema of the dataset, the types are not inferred from the files
+    schema = declared_schema(dataset)
+    file_format = FILE_FORMATS[dataset.file_type]
+    if dataset.file_type == FileTypes.json and declared_types(dataset):
+        file_format = ds.JsonFileFormat(
+            parse_options=pajson.ParseOptions(
+                explicit_schema=_json_schema(dataset),
+                unexpected_field_behavior="ignore" if schema is not None else "infer",
+            )
+        )
+        # the columns parsed as strings are cast to their types once read
+        schema = None
+    if schema is not None and partitioning is not None:
+        schema = pa.unify_schemas([schema, partitioning.schema])
+    arrow_dataset = ds.dataset(
+        paths, format=file_format, schema=schema, **partition_args
+    )
+    return arrow_dataset.scanner(
+        columns=[column.name for column in dataset.columns]
+        if dataset.columns
+        else None,
+        filter=filters_to_expression(
+            coerce_filters(dataset.filters, arrow_dataset.schema)
+        ),
+        batch_size=DEFAULT_BATCH_SIZE,
+        use_threads=True,
+        fragment_readahead=dataset.max_parallel_files,
+    ).to_reader()
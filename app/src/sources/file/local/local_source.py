@@ -1,11 +1,79 @@
 """local"""
 
+__all__ = ["FileSource"]
+
+import csv
+import fnmatch
+import glob
+import importlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pyarrow as pa
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.enums.common import Engine
+from src.enums.datasets import FileTypes
+from src.models.dataset.file import FileDataset
+from src.models.source import SourceConfig
 from src.sources.base import Source
+from src.sources.batches import as_record_batch_reader, rebatch
+from src.sources.file.partitions import (
+    Partitioning,
+    infer_partition_schema,
+    parse_partition,
+    partition_matches,
+)
+from src.sources.schema import conform
+
+# Engines are imported only when a dataset uses them, so that unused engines are never loaded
+ENGINE_MODULES = {
+    Engine.pandas: "src.sources.file.local.engines.pandas",
+    Engine.pyarrow: "src.sources.file.local.engines.pyarrow",
+    Engine.duckdb: "src.sources.file.local.engines.duckdb",
+}
+
+
+def _parquet_footer(path: str) -> pa.Schema:
+    """Schema of a parquet file, only its footer is read."""
+    import pyarrow.parquet as pq
+
+    return pq.read_schema(path)
+
+
+def _orc_footer(path: str) -> pa.Schema:
+    """Schema of an ORC file, only its footer is read."""
+    import pyarrow.orc as orc
+
+    return orc.ORCFile(path).schema
+
+
+# Readers of the schema of a file from its footer, without reading any data
+FOOTER_READERS = {
+    FileTypes.parquet: _parquet_footer,
+    FileTypes.orc: _orc_footer,
+}
+
+
+class _Listing(NamedTuple):
+    """Files of a dataset, along with the partition keys found while listing them."""
+
+    paths: List[str]
+    partitioning: Optional[Partitioning] = None
 
 
 class FileSource(Source):
     """LocalFile source"""
 
+    def __init__(self, config: SourceConfig):
+        """Expect to pass source config to all sources"""
+        super().__init__(config)
+        # files of each dataset, so that a directory with thousands of files is listed once per job.
+        # Shared with the copies of the source made by the connection pool
+        self._listings: Dict[Tuple[str, str], _Listing] = {}
+
     def is_source(self):
         """Is source"""
         return True
@@ -13,3 +81,175 @@ class FileSource(Source):
     def is_target(self):
         """Is source"""
         return True
+
+    @staticmethod
+    def file_name_pattern(dataset: FileDataset) -> str:
+        """Glob pattern of the names of the files, `file_prefix`/`file_suffix` take precedence over `file_pattern`."""
+        if dataset.file_prefix or dataset.file_suffix:
+            return f"{dataset.file_prefix or ''}*{dataset.file_suffix or ''}"
+        return dataset.file_pattern or "*"
+
+    @classmethod
+    def file_glob(cls, dataset: FileDataset) -> str:
+        """Glob pattern of the files that belong to the dataset."""
+        pattern = cls.file_name_pattern(dataset)
+        if dataset.is_partitioned:
+            pattern = os.path.join("**", pattern)
+        return os.path.join(dataset.file_path, pattern)
+
+    def _list_partitioned(self, dataset: FileDataset) -> _Listing:
+        """Walk the partition directories of the dataset, `key=value` directories which can't match the filters
+        of the dataset are pruned without being listed. Files and directories starting with `.` or `_`
+        (Example: `_SUCCESS`) are not part of the dataset.
+        """
+        name_pattern = os.path.basename(self.file_name_pattern(dataset))
+        paths, partitions, pruned = [], [], 0
+        pending = [(dataset.file_path, {})]
+        while pending:
+            directory, partition = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    entries = list(entries)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in entries:
+                if entry.name.startswith((".", "_")):
+                    continue
+                if entry.is_dir():
+                    parsed = parse_partition(entry.name)
+                    if parsed is None:
+                        pending.append((entry.path, partition))
+                        continue
+                    sub_partition = {**partition, parsed[0]: parsed[1]}
+                    if partition_matches(sub_partition, dataset.filters):
+                        pending.append((entry.path, sub_partition))
+                    else:
+                        pruned += 1
+                elif entry.is_file() and fnmatch.fnmatch(entry.name, name_pattern):
+                    paths.append(entry.path)
+                    partitions.append(partition)
+
+        schema = infer_partition_schema(partitions)
+        log.info(
+            f"Dataset {dataset.name}: {len(paths)} files in "
+            f"{len({tuple(p.items()) for p in partitions})} partitions, {pruned} partition directories pruned"
+        )
+        order = sorted(range(len(paths)), key=paths.__getitem__)
+        return _Listing(
+            paths=[paths[idx] for idx in order],
+            partitioning=Partitioning(dataset.file_path, schema) if schema else None,
+        )
+
+    def _listing_key(self, dataset: FileDataset) -> Tuple[str, str]:
+        """Key of the files of the dataset in the listings."""
+        # the files of a partitioned dataset depend on its filters, as partitions are pruned
+        return (
+            self.file_glob(dataset),
+            repr(dataset.filters) if dataset.is_partitioned else "",
+        )
+
+    def _listing(self, dataset: FileDataset, refresh: bool = False) -> _Listing:
+        """Files of the dataset, listed once unless `refresh` is set."""
+        key = self._listing_key(dataset)
+        if refresh or key not in self._listings:
+            if dataset.is_partitioned:
+                self._listings[key] = self._list_partitioned(dataset)
+            else:
+                self._listings[key] = _Listing(
+                    paths=sorted(
+                        path
+                        for path in glob.glob(key[0], recursive=True)
+                        if os.path.isfile(path)
+                    )
+                )
+        return self._listings[key]
+
+    def list_files(self, dataset: FileDataset, refresh: bool = False) -> List[str]:
+        """List all the files that belong to the dataset, sorted by path.
+        The directory is listed once, later calls return the same files unless `refresh` is set.
+        """
+        return self._listing(dataset, refresh).paths
+
+    def select_files(self, dataset: FileDataset, paths: List[str]):
+        """Read only these files of the dataset (Example: the files not ingested yet), until it's listed with `refresh`."""
+        listing = self._listing(dataset)
+        self._listings[self._listing_key(dataset)] = listing._replace(
+            paths=sorted(paths)
+        )
+
+    def partitioning(self, dataset: FileDataset) -> Optional[Partitioning]:
+        """Partition keys of a partitioned dataset, None if its files are not in `key=value` directories."""
+        return self._listing(dataset).partitioning
+
+    @staticmethod
+    def engine_for(dataset: FileDataset) -> Engine:
+        """Engine the files of the dataset are read with."""
+        return dataset.engine
+
+    def estimate_size(self, dataset: FileDataset, **kwargs) -> Optional[int]:
+        """Total size in bytes of the files of the dataset."""
+        return sum(os.path.getsize(path) for path in self.list_files(dataset))
+
+    def dataset_exists(self, dataset: FileDataset, **kwargs) -> Optional[bool]:
+        """True if any file of the dataset exists."""
+        return bool(self.list_files(dataset, refresh=True))
+
+    def read_schema(self, dataset: FileDataset, **kwargs) -> Optional[pa.Schema]:
+        """Schema of the files of the dataset from their footers (parquet, orc) or the header of the first file (csv).
+        The schemas of all the files are merged, raises ArrowTypeError if files have conflicting types.
+        The columns of CSV files are all strings, as their types can't be known without reading the data.
+        """
+        paths = self.list_files(dataset)
+        if not paths:
+            return None
+        if dataset.file_type in FOOTER_READERS:
+            read_footer = FOOTER_READERS[dataset.file_type]
+            with ThreadPoolExecutor(
+                max_workers=dataset.max_parallel_files,
+                thread_name_prefix="porter-footers",
+            ) as executor:
+                schemas = list(executor.map(read_footer, paths))
+            # files written by the same job have the same schema, they're merged once
+            unique = {schema.to_string(): schema for schema in schemas}
+            schema = pa.unify_schemas(list(unique.values()))
+        elif dataset.file_type == FileTypes.csv and dataset.args.header:
+            with open(paths[0], encoding=dataset.args.encoding) as r_fp:
+                for _ in range(dataset.args.skip_rows):
+                    r_fp.readline()
+                header = r_fp.readline()
+            names = next(csv.reader([header], delimiter=dataset.args.delimiter))
+            schema = pa.schema((name, pa.string()) for name in names)
+        else:
+            return None
+        partitioning = self.partitioning(dataset)
+        if partitioning is not None:
+            schema = pa.unify_schemas([schema, partitioning.schema])
+        return schema.remove_metadata()
+
+    def watcher(self):
+        """Local directories are watched with inotify, so files are picked up as soon as they land."""
+        from src.sources.watchers import InotifyWatcher
+
+        return InotifyWatcher(self)
+
+    def read(self, dataset: FileDataset, **kwargs) -> pa.RecordBatchReader:
+        """Read all the files of the dataset with the engine of the dataset as a stream of Arrow record batches.
+        The columns have the datatypes of the dataset and are named after their target_name.
+        """
+        engine_name = self.engine_for(dataset)
+        if engine_name not in ENGINE_MODULES:
+            raise exc.PorterException(
+                f"Engine: {engine_name.value} is not supported for local files"
+            )
+        paths = self.list_files(dataset)
+        if not paths:
+            raise exc.PorterException(
+                f"No files found for the dataset: {dataset.name} matching {self.file_glob(dataset)}"
+            )
+        engine = importlib.import_module(ENGINE_MODULES[engine_name])
+        reader = conform(
+            engine.read_files(paths, dataset, self.partitioning(dataset)), dataset
+        )
+        if not dataset.coalesce_files:
+            return reader
+        return as_record_batch_reader(rebatch(reader), schema=reader.schema)
@@ -0,0 +1,213 @@
+"""Hive style partitions (`key=value` directories) of partitioned file datasets.
+
+The partition directories are discovered while listing the files of the dataset, and directories whose values
+can't match the `filters` of the dataset are pruned before they're listed, so a dataset with years of daily
+partitions only lists (and reads) the partitions it needs. The partition keys are exposed as typed columns,
+the type of a key is inferred from all its values (integer, floating point, date or string).
+"""
+
+__all__ = [
+    "HIVE_DEFAULT_PARTITION",
+    "Partitioning",
+    "parse_partition",
+    "partition_values",
+    "partition_matches",
+    "infer_partition_schema",
+    "coerce_filters",
+    "with_partition_columns",
+]
+
+
+import datetime
+import operator
+import os
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+
+import pyarrow as pa
+
+# value of the partition of the rows where the key is NULL
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+_INTEGER = re.compile(r"^[+-]?\d+$")
+_FLOAT = re.compile(r"^[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$")
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+_COMPARISONS = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class Partitioning(NamedTuple):
+    """Partition keys of a dataset, the partition directories are under `base_dir`."""
+
+    base_dir: str
+    schema: pa.Schema
+
+
+def _typed(raw: str) -> Any:
+    """Value of a partition directory, typed as integer, floating point or date when it looks like one."""
+    value = unquote(raw)
+    if value == HIVE_DEFAULT_PARTITION:
+        return None
+    if _INTEGER.match(value):
+        return int(value)
+    if _FLOAT.match(value):
+        return float(value)
+    if _DATE.match(value):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def parse_partition(name: str) -> Optional[Tuple[str, Any]]:
+    """(key, typed value) of a `key=value` directory name, None for other directories."""
+    key, sep, raw = name.partition("=")
+    if not sep or not key:
+        return None
+    return unquote(key), _typed(raw)
+
+
+def partition_values(path: str, base_dir: str) -> Dict[str, Any]:
+    """Partition keys and typed values of a file, from the `key=value` directories between base_dir and the file."""
+    relative = os.path.relpath(os.path.dirname(path), base_dir)
+    values = {}
+    for name in relative.split(os.sep):
+        parsed = parse_partition(name)
+        if parsed is not None:
+            values[parsed[0]] = parsed[1]
+    return values
+
+
+def _coerce(value: Any, like: Any) -> Any:
+    """Convert the value of a filter to the type of the partition value (Example: a date watermark saved as a string)."""
+    if isinstance(like, datetime.date) and isinstance(value, datetime.datetime):
+        return value.date()
+    if like is None or value is None or isinstance(value, type(like)):
+        return value
+    try:
+        if isinstance(like, datetime.date) and isinstance(value, str):
+            return datetime.date.fromisoformat(value[:10])
+        if isinstance(like, (int, float)) and isinstance(value, (int, float, str)):
+            return type(like)(value) if not isinstance(value, float) else value
+        if isinstance(like, str):
+            return str(value)
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def _condition_holds(partition_value: Any, op: str, value: Any) -> bool:
+    """True if the filter can match the rows of the partition, a comparison that can't be made keeps it."""
+    op = op.lower()
+    try:
+        if op in ("in", "not in"):
+            found = any(
+                partition_value == _coerce(item, partition_value) for item in value
+            )
+            return found if op == "in" else not found
+        if partition_value is None or value is None:
+            # NULL only equals NULL for the purpose of pruning
+            same = partition_value is None and value is None
+            return same if op in ("=", "==") else not same if op == "!=" else False
+        return bool(_COMPARISONS[op](partition_value, _coerce(value, partition_value)))
+    except TypeError:
+        return True
+
+
+def partition_matches(
+    partition: Dict[str, Any], filters: Optional[List[Tuple[str, str, Any]]]
+) -> bool:
+    """False only if the filters on the keys of the partition can't match any row of it.
+    Filters on other columns (or keys of deeper partitions) are ignored here, they're applied when reading.
+    """
+    return all(
+        _condition_holds(partition[column], op, value)
+        for column, op, value in filters or []
+        if column in partition
+    )
+
+
+def infer_partition_schema(partitions: Iterable[Dict[str, Any]]) -> pa.Schema:
+    """Schema of the partition keys, in the order they're nested, from the values of all the partitions."""
+    values: Dict[str, List[Any]] = {}
+    for partition in partitions:
+        for key, value in partition.items():
+            values.setdefault(key, []).append(value)
+
+    fields = []
+    for key, key_values in values.items():
+        present = [value for value in key_values if value is not None]
+        if present and all(isinstance(value, int) for value in present):
+            arrow_type = pa.int64()
+        elif present and all(isinstance(value, (int, float)) for value in present):
+            arrow_type = pa.float64()
+        elif present and all(isinstance(value, datetime.date) for value in present):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(key, arrow_type))
+    return pa.schema(fields)
+
+
+def _sample(arrow_type: pa.DataType) -> Any:
+    """A value of the type, to convert the values of the filters to."""
+    if pa.types.is_integer(arrow_type):
+        return 0
+    if pa.types.is_floating(arrow_type):
+        return 0.0
+    if pa.types.is_date(arrow_type):
+        return datetime.date.min
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return ""
+    return None
+
+
+def coerce_filters(
+    filters: Optional[List[Tuple[str, str, Any]]], schema: Optional[pa.Schema]
+) -> Optional[List[Tuple[str, str, Any]]]:
+    """Filters with their values converted to the type of the column in the schema (Example: `("dt", ">=",
+    "2024-01-31")` compares dates), readers like pyarrow don't cast them implicitly.
+    Expects the schema of the data being filtered, partition keys included.
+    """
+    if not filters or schema is None:
+        return filters
+    coerced = []
+    for column, op, value in filters:
+        index = schema.get_field_index(column)
+        like = _sample(schema.field(index).type) if index >= 0 else None
+        if like is not None:
+            if op.lower() in ("in", "not in"):
+                value = [_coerce(item, like) for item in value]
+            else:
+                value = _coerce(value, like)
+        coerced.append((column, op, value))
+    return coerced
+
+
+def with_partition_columns(
+    table: pa.Table, path: str, partitioning: Partitioning
+) -> pa.Table:
+    """Add the keys of the partition of the file as constant columns, typed as in the partitioning.
+    For readers which read the files one by one, without knowing about partitions.
+    """
+    values = partition_values(path, partitioning.base_dir)
+    for field in partitioning.schema:
+        if field.name in table.column_names:
+            continue
+        value = values.get(field.name)
+        if value is not None and pa.types.is_string(field.type):
+            value = str(value)
+        table = table.append_column(
+            field, pa.array([value] * table.num_rows, type=field.type)
+        )
+    return table
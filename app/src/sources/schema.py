@@ -0,0 +1,189 @@
+"""Schema of a dataset from its `Dataset.columns`, pushed down to the readers so that they don't infer types.
+
+Datatypes are matched case-insensitively, with the names used by DuckDB/Spark (Example: BIGINT, DECIMAL(10,2)),
+pandas (Example: int64, str) or Arrow (Example: float64, large_string).
+Columns are read under their `name` and renamed to their `target_name` by `conform`, which only swaps the names of
+the columns of each batch, no data is copied.
+"""
+
+__all__ = [
+    "ARROW_TYPES",
+    "arrow_type",
+    "declared_types",
+    "declared_schema",
+    "duckdb_type",
+    "conform",
+]
+
+
+import re
+from typing import Dict, Optional
+
+import pyarrow as pa
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.models.dataset.base import Column, Dataset
+
+ARROW_TYPES = {
+    "bool": pa.bool_(),
+    "boolean": pa.bool_(),
+    "tinyint": pa.int8(),
+    "int8": pa.int8(),
+    "smallint": pa.int16(),
+    "int16": pa.int16(),
+    "int": pa.int32(),
+    "integer": pa.int32(),
+    "int32": pa.int32(),
+    "bigint": pa.int64(),
+    "long": pa.int64(),
+    "int64": pa.int64(),
+    "float": pa.float32(),
+    "real": pa.float32(),
+    "float32": pa.float32(),
+    "double": pa.float64(),
+    "float64": pa.float64(),
+    "str": pa.string(),
+    "string": pa.string(),
+    "varchar": pa.string(),
+    "char": pa.string(),
+    "text": pa.string(),
+    "object": pa.string(),
+    "large_string": pa.large_string(),
+    "binary": pa.binary(),
+    "blob": pa.binary(),
+    "bytes": pa.binary(),
+    "date": pa.date32(),
+    "date32": pa.date32(),
+    "time": pa.time64("us"),
+    "timestamp": pa.timestamp("us"),
+    "datetime": pa.timestamp("us"),
+    "datetime64[ns]": pa.timestamp("ns"),
+    "timestamptz": pa.timestamp("us", tz="UTC"),
+    "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+}
+
+# DECIMAL(10, 2), VARCHAR(20)
+_PARAMETERIZED = re.compile(r"^\s*([a-z_ ]+?)\s*\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)\s*$")
+
+
+def arrow_type(column: Column) -> Optional[pa.DataType]:
+    """Arrow type of the column, None if it has no datatype (the type is inferred by the engine).
+    Decimals take their precision/scale from the datatype (Example: DECIMAL(10,2)) or from the column.
+    Raises PorterException for datatypes which are not known.
+    """
+    if not column.datatype:
+        return None
+    datatype = column.datatype.strip().lower()
+    precision, scale = column.precision, column.scale
+    match = _PARAMETERIZED.match(datatype)
+    if match:
+        datatype = match.group(1)
+        if datatype in ("decimal", "numeric"):
+            precision = int(match.group(2))
+            scale = int(match.group(3) or 0)
+    if datatype in ("decimal", "numeric"):
+        precision = min(precision or 38, 38)
+        return pa.decimal128(precision, min(scale or 0, precision))
+    if datatype not in ARROW_TYPES:
+        raise exc.PorterException(
+            f"Datatype {column.datatype!r} of the column {column.name} is not supported, "
+            f"use one of {sorted(ARROW_TYPES) + ['decimal']}"
+        )
+    return ARROW_TYPES[datatype]
+
+
+def declared_types(dataset: Dataset) -> Dict[str, pa.DataType]:
+    """Arrow type of each column of the dataset which has a datatype, by name.
+    Datatypes which don't map to an Arrow type (Example: a type only the source knows) are left to the readers.
+    """
+    types = {}
+    for column in dataset.columns or []:
+        try:
+            target = arrow_type(column)
+        except exc.PorterException as e:
+            log.debug(f"Dataset {dataset.name}: type of {column.name} is inferred, {e}")
+            continue
+        if target is not None:
+            types[column.name] = target
+    return types
+
+
+def declared_schema(dataset: Dataset) -> Optional[pa.Schema]:
+    """Schema of the columns of the dataset, None unless every column has a known datatype."""
+    if not dataset.columns:
+        return None
+    types = declared_types(dataset)
+    if len(types) != len(dataset.columns):
+        return None
+    return pa.schema(
+        pa.field(column.name, types[column.name]) for column in dataset.columns
+    )
+
+
+def duckdb_type(arrow_type: pa.DataType) -> str:
+    """DuckDB type of an Arrow type."""
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        signed = {8: "TINYINT", 16: "SMALLINT", 32: "INTEGER", 64: "BIGINT"}
+        name = signed[arrow_type.bit_width]
+        return name if pa.types.is_signed_integer(arrow_type) else f"U{name}"
+    if pa.types.is_float32(arrow_type):
+        return "FLOAT"
+    if pa.types.is_floating(arrow_type):
+        return "DOUBLE"
+    if pa.types.is_decimal(arrow_type):
+        return f"DECIMAL({arrow_type.precision}, {arrow_type.scale})"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    if pa.types.is_time(arrow_type):
+        return "TIME"
+    if pa.types.is_timestamp(arrow_type):
+        if arrow_type.tz:
+            return "TIMESTAMPTZ"
+        return "TIMESTAMP_NS" if arrow_type.unit == "ns" else "TIMESTAMP"
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return "BLOB"
+    return "VARCHAR"
+
+
+def conform(reader: pa.RecordBatchReader, dataset: Dataset) -> pa.RecordBatchReader:
+    """Rename the columns of the stream to their `target_name`, and cast the columns read with another type
+    than their datatype. Renames are zero-copy, and a stream already in the schema of the dataset is returned as is.
+    Columns already renamed (Example: by the query of the reader) are recognized by their target_name.
+    """
+    if not dataset.columns:
+        return reader
+    columns = {}
+    for column in dataset.columns:
+        columns[column.name] = column
+        columns.setdefault(column.target_name or column.name, column)
+    types = declared_types(dataset)
+
+    read_fields, target_fields = [], []
+    for field in reader.schema:
+        column = columns.get(field.name)
+        if column is None:
+            read_fields.append(field)
+            target_fields.append(field)
+            continue
+        target = types.get(column.name, field.type)
+        read_fields.append(field.with_type(target))
+        target_fields.append(
+            field.with_type(target).with_name(column.target_name or column.name)
+        )
+    read_schema = pa.schema(read_fields)
+    target_schema = pa.schema(target_fields)
+    if target_schema.equals(reader.schema):
+        return reader
+
+    cast = not read_schema.equals(reader.schema)
+
+    def batches():
+        for batch in reader:
+            if cast:
+                batch = batch.cast(read_schema)
+            yield pa.RecordBatch.from_arrays(batch.columns, schema=target_schema)
+
+    return pa.RecordBatchReader.from_batches(target_schema, batches())
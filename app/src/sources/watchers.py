@@ -0,0 +1,326 @@
+"""Waiting for datasets which are missing from a source, as configured in `on_dataset_missing`.
+
+All the datasets missing from a source are waited on at the same time in a single loop, each up to its own
+timeout (`poll_interval` * `poll_count`):
+- `BackoffWatcher` checks each dataset with an exponential backoff with jitter, starting at `initial_poll_interval`
+  and growing up to `poll_interval`, so a dataset which lands soon is picked up soon, and a long wait doesn't
+  keep hammering the source (Example: listing a bucket).
+- `InotifyWatcher` is used for local files on Linux, the directories of the datasets are watched with inotify and
+  a dataset is checked as soon as a file is written or moved into them. It still checks every `poll_interval`
+  in case an event is missed (Example: network file systems).
+"""
+
+__all__ = [
+    "DatasetWatcher",
+    "BackoffWatcher",
+    "InotifyWatcher",
+    "wait_for_datasets",
+]
+
+
+import ctypes
+import ctypes.util
+import os
+import random
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.enums.datasets import OnDatasetMissingActions
+from src.models.dataset.base import Dataset
+
+
+class _Waiting:
+    """State of a dataset being waited on."""
+
+    def __init__(self, dataset: Dataset, now: float, initial_interval: float):
+        settings = dataset.on_dataset_missing
+        self.dataset = dataset
+        self.deadline = now + settings.poll_interval * settings.poll_count
+        self.max_interval = max(settings.poll_interval, 0)
+        self.interval = min(initial_interval, self.max_interval)
+        self.next_check = min(now + self.interval, self.deadline)
+        self.checks = 0
+
+
+class DatasetWatcher(ABC):
+    """Waits for datasets to become available on a source."""
+
+    def __init__(self, source):
+        """Expect to pass the source the datasets are read from, it should implement `dataset_exists`."""
+        self.source = source
+
+    def exists(self, dataset: Dataset) -> bool:
+        """True if the dataset is available, a failed check (Example: a timed out listing) counts as missing."""
+        try:
+            return self.source.dataset_exists(dataset) is not False
+        except Exception as e:
+            log.debug(f"Could not check if the dataset {dataset.name} exists: {e!r}")
+            return False
+
+    @abstractmethod
+    def wait(self, datasets: List[Dataset]) -> Dict[str, bool]:
+        """Wait for all the datasets at the same time, each up to its own timeout.
+        Returns whether each dataset (by name) became available.
+        """
+        ...
+
+
+class BackoffWatcher(DatasetWatcher):
+    """Checks the datasets with an exponential backoff with jitter, for sources which can only be polled."""
+
+    def _sleep(self, seconds: float, waiting: Dict[str, _Waiting]):
+        """Sleep until the next check is due, watchers which get notified can wake up earlier."""
+        time.sleep(seconds)
+
+    def _next_interval(self, state: _Waiting) -> float:
+        """Double the interval up to the max, half of it is random so that many jobs don't check in lockstep."""
+        state.interval = min(state.interval * 2, state.max_interval)
+        return state.interval / 2 + random.uniform(0, state.interval / 2)
+
+    def _initial_interval(self, dataset: Dataset) -> float:
+        return dataset.on_dataset_missing.initial_poll_interval
+
+    def wait(self, datasets: List[Dataset]) -> Dict[str, bool]:
+        """Wait for all the datasets at the same time, each up to its own timeout.
+        Returns whether each dataset (by name) became available.
+        """
+        now = time.monotonic()
+        waiting = {
+            dataset.name: _Waiting(dataset, now, self._initial_interval(dataset))
+            for dataset in datasets
+        }
+        found: Dict[str, bool] = {}
+        while waiting:
+            now = time.monotonic()
+            for name, state in list(waiting.items()):
+                if state.next_check > now:
+                    continue
+                state.checks += 1
+                if self.exists(state.dataset):
+                    found[name] = True
+                    del waiting[name]
+                    log.info(f"Dataset {name} is available after {state.checks} checks")
+                elif now >= state.deadline:
+                    found[name] = False
+                    del waiting[name]
+                    log.warning(
+                        f"Dataset {name} is still missing after {state.checks} checks"
+                    )
+                else:
+                    state.next_check = min(
+                        now + self._next_interval(state), state.deadline
+                    )
+            if waiting:
+                next_check = min(state.next_check for state in waiting.values())
+                self._sleep(max(next_check - time.monotonic(), 0), waiting)
+        return found
+
+
+class _Inotify:
+    """Minimal inotify binding (Linux only), through ctypes so that no extra dependency is needed."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths: Dict[int, Path] = {}
+
+    @classmethod
+    def create(cls) -> Optional["_Inotify"]:
+        """None where inotify is not available."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            return cls()
+        except (OSError, AttributeError, TypeError) as e:
+            log.debug(f"inotify is not available: {e!r}")
+            return None
+
+    def watch(self, path: Path) -> bool:
+        """Watch the directory, returns False if it can't be watched (Example: the watch limit is reached)."""
+        if path in self.paths.values():
+            return True
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            log.debug(f"Could not watch {path}: {os.strerror(ctypes.get_errno())}")
+            return False
+        self.paths[wd] = path
+        return True
+
+    def read(self, timeout: float) -> Optional[List[tuple]]:
+        """(directory, name, mask) of the events, waiting up to timeout seconds for the first one.
+        None if the event queue overflowed and events were lost.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            if wd in self.paths:
+                events.append((self.paths[wd], name, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class InotifyWatcher(BackoffWatcher):
+    """Watches the directories of file datasets with inotify, falls back to the backoff where it's not available.
+    Expects the datasets to have a `file_path` (FileDataset).
+    """
+
+    def wait(self, datasets: List[Dataset]) -> Dict[str, bool]:
+        """Wait for all the datasets at the same time, each up to its own timeout.
+        Returns whether each dataset (by name) became available.
+        """
+        self._inotify = _Inotify.create()
+        if self._inotify is None:
+            return super().wait(datasets)
+        try:
+            for dataset in datasets:
+                self._watch_dataset(dataset)
+            return super().wait(datasets)
+        finally:
+            self._inotify.close()
+            self._inotify = None
+
+    def _initial_interval(self, dataset: Dataset) -> float:
+        # checked once right away, files which landed before their directory was watched aren't notified,
+        # after that changes are notified and the periodic check is only a safety net
+        return 0
+
+    def _next_interval(self, state: _Waiting) -> float:
+        return state.max_interval
+
+    @staticmethod
+    def _root(dataset: Dataset) -> Path:
+        return Path(dataset.file_path).resolve()
+
+    def _watch_dataset(self, dataset: Dataset) -> bool:
+        """Watch the directory of the dataset (and its sub directories if it's partitioned).
+        If the directory doesn't exist yet, its closest existing parent is watched until it's created.
+        Returns True if new directories were watched.
+        """
+        root = self._root(dataset)
+        directory = root
+        while not directory.is_dir() and directory != directory.parent:
+            directory = directory.parent
+        watched = len(self._inotify.paths)
+        self._inotify.watch(directory)
+        if directory == root and getattr(dataset, "is_partitioned", False):
+            for sub_directory, _, _ in os.walk(root):
+                self._inotify.watch(Path(sub_directory))
+        return len(self._inotify.paths) > watched
+
+    def _sleep(self, seconds: float, waiting: Dict[str, _Waiting]):
+        """Wait for file events up to the next periodic check, datasets with events are checked right away."""
+        events = self._inotify.read(seconds)
+        if events is None:
+            # events were lost, check every dataset
+            touched = set(waiting)
+        else:
+            touched = self._touched(events, waiting)
+        now = time.monotonic()
+        for name in touched:
+            waiting[name].next_check = now
+
+    def _touched(self, events: List[tuple], waiting: Dict[str, _Waiting]) -> Set[str]:
+        """Names of the datasets whose files or directories changed."""
+        touched = set()
+        for directory, name, mask in events:
+            path = directory / name
+            for dataset_name, state in waiting.items():
+                root = self._root(state.dataset)
+                partitioned = getattr(state.dataset, "is_partitioned", False)
+                if mask & _Inotify.IN_ISDIR:
+                    on_the_way = path == root or path in root.parents
+                    partition = partitioned and root in path.parents
+                    # files could have been written to the new directory before it was watched
+                    if (on_the_way or partition) and self._watch_dataset(state.dataset):
+                        touched.add(dataset_name)
+                elif mask & (_Inotify.IN_CLOSE_WRITE | _Inotify.IN_MOVED_TO) and (
+                    directory == root or (partitioned and root in directory.parents)
+                ):
+                    touched.add(dataset_name)
+        return touched
+
+
+def wait_for_datasets(source, datasets: List[Dataset]) -> List[Dataset]:
+    """Apply `on_dataset_missing` to the datasets missing from the source and return the datasets to extract.
+
+    - error: raise PorterException (before waiting for any dataset).
+    - warning: log a warning and skip the dataset.
+    - poll: wait for it, all the datasets of the source at the same time, with the watcher of the source.
+      Once its timeout is reached, `post_poll_dataset_missing_action` applies.
+    """
+    missing = [
+        dataset for dataset in datasets if source.dataset_exists(dataset) is False
+    ]
+    if not missing:
+        return datasets
+
+    actions = {dataset.name: dataset.on_dataset_missing.action for dataset in missing}
+    errors = [
+        name
+        for name, action in actions.items()
+        if action == OnDatasetMissingActions.error
+    ]
+    if errors:
+        raise exc.PorterException(
+            f"Datasets {errors} are missing from {source.config.name}"
+        )
+
+    to_wait = [d for d in missing if actions[d.name] == OnDatasetMissingActions.poll]
+    skipped = {
+        name
+        for name, action in actions.items()
+        if action == OnDatasetMissingActions.warning
+    }
+    if to_wait:
+        log.info(
+            f"Waiting for {len(to_wait)} datasets missing from {source.config.name}: "
+            f"{[d.name for d in to_wait]}"
+        )
+        found = source.watcher().wait(to_wait)
+        still_missing = [d for d in to_wait if not found.get(d.name)]
+        errors = [
+            d.name
+            for d in still_missing
+            if d.on_dataset_missing.post_poll_dataset_missing_action
+            == OnDatasetMissingActions.error
+        ]
+        if errors:
+            raise exc.PorterException(
+                f"Datasets {errors} are still missing from {source.config.name} after waiting for them"
+            )
+        skipped.update(d.name for d in still_missing)
+
+    for name in skipped:
+        log.warning(f"Dataset {name} is missing from {source.config.name}, skipping it")
+    return [dataset for dataset in datasets if dataset.name not in skipped]
@@ -0,0 +1,305 @@
+"""Runs transformations as a DAG, transforms which don't depend on each other run at the same time.
+
+The dependencies are inferred from the SQL of each transform: the tables it reads and writes are found with
+sqllineage (`govern` dependency group), and a transform depends on the earlier transforms (of the same source)
+which write a table it reads, or read/write a table it writes. A transform whose SQL is a query (SELECT/WITH)
+is stored as a table named after the transform, so later transforms can read it by that name.
+
+Without sqllineage, or when the SQL of a transform can't be parsed, that transform waits for all the earlier
+transforms and all the later ones wait for it, which is the same as running them in list order.
+"""
+
+__all__ = [
+    "TransformNode",
+    "TransformResult",
+    "build_dag",
+    "run_transformations",
+    "table_references",
+    "transform_sql",
+]
+
+
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, ConfigDict
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.enums.common import Status
+from src.models.transform import TransformConfig
+from src.sources.connection_pool import ConnectionPool
+from src.sources.database.base import DatabaseSource
+from src.sources.database.duckdb.duckdb_source import (
+    DUCK_INTERNAL,
+    DuckDBSource,
+    quote_identifier,
+)
+
+_QUERY_PATTERN = re.compile(r"^\s*(\(\s*)*(SELECT|WITH)\b", re.IGNORECASE)
+# statements whose tables sqllineage reports completely, the tables of all the other statements are unknown
+_LINEAGE_STATEMENTS = re.compile(
+    r"^\s*(\(\s*)*(SELECT|WITH|CREATE|INSERT)\b", re.IGNORECASE
+)
+
+
+class TransformNode(BaseModel):
+    """A transform of the DAG, along with the tables it reads and writes."""
+
+    transform: TransformConfig
+    sql: str
+    reads: Set[str] = set()
+    writes: Set[str] = set()
+    # the transform is a query, its result is stored as a table named after the transform
+    is_query: bool = False
+    # the tables could not be inferred from the SQL
+    is_barrier: bool = False
+    depends_on: Set[str] = set()
+
+
+class TransformResult(BaseModel):
+    """Outcome of one transform."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    name: str
+    source_name: str
+    status: Status
+    exception: Optional[BaseException] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        """Time taken by the transform."""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+def transform_sql(transform: TransformConfig) -> str:
+    """SQL of the transform, `sql_query` takes precedence over `sql_path`."""
+    if transform.sql_query:
+        return transform.sql_query
+    if transform.sql_path:
+        return Path(transform.sql_path).read_text()
+    raise exc.PorterException(
+        f"Transform {transform.name} should have either sql_query or sql_path"
+    )
+
+
+def table_references(
+    sql: str, dialect: str = "ansi"
+) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Names (lower case, without the schema) of the tables read and written by the SQL.
+    Returns None if sqllineage is not installed, the SQL can't be parsed,
+    or it has statements other than SELECT/WITH/CREATE/INSERT.
+    """
+    try:
+        from sqllineage.runner import LineageRunner
+    except ImportError:
+        log.warning(
+            "sqllineage is not installed (govern dependency group), transforms run in list order"
+        )
+        return None
+
+    import sqlparse
+
+    statements = [statement for statement in sqlparse.split(sql) if statement.strip()]
+    unsupported = [
+        statement
+        for statement in statements
+        if not _LINEAGE_STATEMENTS.match(statement)
+    ]
+    if unsupported:
+        # sqllineage doesn't report all the tables of these statements (Example: the target of a DELETE)
+        log.info(
+            f"Tables of the statement can't be inferred, running it in list order: {unsupported[0][:80]}"
+        )
+        return None
+
+    try:
+        runner = LineageRunner(sql, dialect=dialect, silent_mode=True)
+        reads = {table.raw_name.lower() for table in runner.source_tables}
+        # tables written and then read by the same SQL are intermediate tables
+        writes = {
+            table.raw_name.lower()
+            for table in runner.target_tables + runner.intermediate_tables
+        }
+    except Exception as e:
+        log.warning(f"Could not parse the tables of the SQL: {e!r}")
+        return None
+    return reads, writes
+
+
+def build_dag(
+    transforms: List[TransformConfig], dialects: Optional[Dict[str, str]] = None
+) -> Dict[str, TransformNode]:
+    """Build the DAG of the transforms, keyed by the name of the transform, in the order of `transforms`.
+
+    Args:
+        transforms: Transforms in the order of the config.
+        dialects: SQL dialect of each source, used to parse the SQL. `duck_internal` is parsed as duckdb
+            and the other sources as ansi by default.
+    """
+    dialects = {DUCK_INTERNAL: DuckDBSource.sql_dialect, **(dialects or {})}
+    nodes: Dict[str, TransformNode] = {}
+    for transform in transforms:
+        if transform.name in nodes:
+            raise exc.PorterException(
+                f"Transform names should be unique, {transform.name} is defined more than once"
+            )
+        sql = transform_sql(transform)
+        # placeholders are not valid SQL for the parser, they're replaced by a literal of the same meaning
+        parsable_sql = DatabaseSource.bind_placeholders(
+            sql, transform.values_to_bind, "NULL"
+        )
+        references = table_references(
+            parsable_sql, dialects.get(transform.source_name, "ansi")
+        )
+        node = TransformNode(transform=transform, sql=sql)
+        if references is None:
+            node.is_barrier = True
+        else:
+            node.reads, node.writes = references
+            if not node.writes and _QUERY_PATTERN.match(sql):
+                node.is_query = True
+                node.writes = {transform.name.lower()}
+
+        for earlier in nodes.values():
+            if earlier.transform.source_name != transform.source_name:
+                continue
+            if (
+                node.is_barrier
+                or earlier.is_barrier
+                or earlier.writes & (node.reads | node.writes)
+                or earlier.reads & node.writes
+            ):
+                node.depends_on.add(earlier.transform.name)
+
+        for name in transform.depends_on or []:
+            if name not in nodes:
+                raise exc.PorterException(
+                    f"Transform {transform.name} depends on {name}, "
+                    f"which should be defined before it in the config"
+                )
+            node.depends_on.add(name)
+        nodes[transform.name] = node
+    return nodes
+
+
+def _run_transform(node: TransformNode, engine: DuckDBSource, pool: ConnectionPool):
+    """Run the SQL of one transform on its source, `duck_internal` transforms run on their own cursor."""
+    transform = node.transform
+    values = transform.values_to_bind
+    if transform.source_name == DUCK_INTERNAL:
+        sql = DuckDBSource.bind_placeholders(node.sql, values, "${name}")
+        if node.is_query:
+            sql = f"CREATE OR REPLACE TABLE {quote_identifier(transform.name)} AS {sql}"
+        with engine.cursor() as cursor:
+            cursor.execute(sql, values or None)
+        return
+
+    with pool.acquire(transform.source_name) as source:
+        if node.is_query:
+            source.drop_table(transform.name)
+            source.execute(f"CREATE TABLE {transform.name} AS {node.sql}", values)
+        else:
+            source.execute(node.sql, values)
+
+
+def run_transformations(
+    transforms: List[TransformConfig],
+    engine: DuckDBSource,
+    pool: ConnectionPool,
+    max_concurrent: int = 4,
+    raise_on_failure: bool = True,
+) -> List[TransformResult]:
+    """Run the transforms as a DAG, each transform starts as soon as all its dependencies succeeded.
+    When a transform fails, the transforms depending on it (directly or not) are skipped.
+
+    Args:
+        transforms: Transforms in the order of the config.
+        engine: The `duck_internal` engine of the job.
+        pool: Connection pool of the job, used for the transforms which run on a source/target.
+        max_concurrent: Max number of transforms running at the same time.
+        raise_on_failure: Raise PorterException if any of the transforms failed or was skipped.
+
+    Returns:
+        One TransformResult per transform, in the order of `transforms`.
+    """
+    dialects = {
+        name: getattr(pool.template(name), "sql_dialect", "ansi")
+        for name in {t.source_name for t in transforms}
+        if name in pool
+    }
+    nodes = build_dag(transforms, dialects)
+    for node in nodes.values():
+        log.debug(
+            f"Transform {node.transform.name}: reads {sorted(node.reads)}, writes {sorted(node.writes)}, "
+            f"depends on {sorted(node.depends_on)}"
+        )
+    results = {
+        name: TransformResult(
+            name=name, source_name=node.transform.source_name, status=Status.in_progress
+        )
+        for name, node in nodes.items()
+    }
+    pending = list(nodes)
+    running: Dict[Future, str] = {}
+    started_at = time.time()
+
+    def run(name: str):
+        results[name].started_at = time.time()
+        try:
+            _run_transform(nodes[name], engine, pool)
+        finally:
+            results[name].finished_at = time.time()
+
+    with ThreadPoolExecutor(
+        max_workers=max_concurrent, thread_name_prefix="porter-transform"
+    ) as executor:
+        while pending or running:
+            for name in list(pending):
+                statuses = {results[dep].status for dep in nodes[name].depends_on}
+                if statuses & {Status.failure, Status.skipped}:
+                    pending.remove(name)
+                    results[name].status = Status.skipped
+                    log.warning(
+                        f"Transform {name} is skipped as a transform it depends on failed"
+                    )
+                elif statuses <= {Status.success} and len(running) < max_concurrent:
+                    pending.remove(name)
+                    running[executor.submit(run, name)] = name
+
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result = results[name]
+                try:
+                    future.result()
+                    result.status = Status.success
+                    log.info(
+                        f"Transform {name} ran on {result.source_name} in {result.elapsed_seconds:.2f}s"
+                    )
+                except Exception as e:
+                    result.status = Status.failure
+                    result.exception = e
+                    log.error(f"Transform {name} failed on {result.source_name}: {e!r}")
+
+    log.info(
+        f"Ran {len(results)} transforms in {time.time() - started_at:.2f}s "
+        f"(sum of all: {sum(r.elapsed_seconds for r in results.values()):.2f}s)"
+    )
+    failed = [r for r in results.values() if r.status != Status.success]
+    if failed and raise_on_failure:
+        raise exc.PorterException(
+            f"{len(failed)} out of {len(results)} transforms failed or were skipped: "
+            f"{[r.name for r in failed]}"
+        ) from next((r.exception for r in failed if r.exception), None)
+    return [results[t.name] for t in transforms]
@@ -1 +1,96 @@
-"""AWS Secrets related Utilities."""
+"""AWS Secrets related Utilities.
+
+Fetchers of the `aws_sm` (Secrets Manager) and `aws_ssm` (SSM Parameter Store) secrets sources, they need boto3
+(`aws` dependency group). Both fetch many secrets per call: BatchGetSecretValue (20 per call) and GetParameters
+(10 per call).
+"""
+
+__all__ = ["SecretsManagerFetcher", "ParameterStoreFetcher"]
+
+
+import threading
+from typing import Any, ClassVar, Dict, List
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.models.secrets import SecretsBackend
+from src.utilities.secrets import SecretsFetcher, parse_secret
+
+
+class _AwsFetcher(SecretsFetcher):
+    """Creates the boto3 client of the service once, boto3 clients are safe to share across threads."""
+
+    service_name: ClassVar[str]
+
+    def __init__(self, backend: SecretsBackend):
+        """Expect to pass the secrets backend config to all fetchers."""
+        super().__init__(backend)
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """boto3 client of the service, created on first use."""
+        with self._lock:
+            if self._client is None:
+                try:
+                    import boto3
+                except ImportError as e:
+                    raise exc.PorterException(
+                        f"{self.backend.secrets_source.value} secrets need boto3, install the `aws` dependency group"
+                    ) from e
+                args = self.backend.args
+                session = boto3.session.Session(
+                    profile_name=args.profile_name, region_name=args.region_name
+                )
+                self._client = session.client(
+                    self.service_name, endpoint_url=args.endpoint_url
+                )
+            return self._client
+
+
+class SecretsManagerFetcher(_AwsFetcher):
+    """Fetches secrets from AWS Secrets Manager, 20 secrets per call with BatchGetSecretValue."""
+
+    service_name: ClassVar[str] = "secretsmanager"
+    max_batch_size: ClassVar[int] = 20
+
+    def fetch_batch(self, secret_names: List[str]) -> Dict[str, Any]:
+        """Values of the secrets, by the name (or ARN) they were requested with."""
+        secrets = {}
+        kwargs = {"SecretIdList": secret_names}
+        while True:
+            response = self.client.batch_get_secret_value(**kwargs)
+            for secret in response.get("SecretValues", []):
+                value = secret.get("SecretString", secret.get("SecretBinary"))
+                # the response has both the name and the ARN, the secret could have been requested by either
+                for key in (secret["Name"], secret["ARN"]):
+                    if key in secret_names:
+                        secrets[key] = parse_secret(value)
+            for error in response.get("Errors", []):
+                if error.get("ErrorCode") != "ResourceNotFoundException":
+                    raise exc.PorterException(
+                        f"Could not fetch the secret {error.get('SecretId')}: "
+                        f"{error.get('ErrorCode')} {error.get('Message')}"
+                    )
+                log.debug(f"Secret {error.get('SecretId')} was not found")
+            if not response.get("NextToken"):
+                return secrets
+            kwargs["NextToken"] = response["NextToken"]
+
+
+class ParameterStoreFetcher(_AwsFetcher):
+    """Fetches (decrypted) parameters from AWS SSM Parameter Store, 10 parameters per call with GetParameters."""
+
+    service_name: ClassVar[str] = "ssm"
+    max_batch_size: ClassVar[int] = 10
+
+    def fetch_batch(self, secret_names: List[str]) -> Dict[str, Any]:
+        """Values of the parameters, parameters which don't exist are left out."""
+        response = self.client.get_parameters(Names=secret_names, WithDecryption=True)
+        if response.get("InvalidParameters"):
+            log.debug(f"Parameters {response['InvalidParameters']} were not found")
+        return {
+            parameter["Name"]: parse_secret(parameter["Value"])
+            for parameter in response.get("Parameters", [])
+        }
@@ -0,0 +1,323 @@
+"""Resolution of the secrets of a pipeline.
+
+All the secrets listed in `SecretsBackend.secrets`, along with the ones the source and targets use (their `secrets` and
+the `{secret: <name>}` values of their args), are fetched up front by `resolve_secrets`, in batches
+(as many secrets per call as the secrets source allows) and with the batches fetched concurrently, so that setting
+up the connections of the sources/targets never waits on a call to the secrets source.
+Fetched secrets are kept in memory for the whole job, and optionally (`SecretsBackend.cache_ttl`) in an encrypted
+cache on local disk which is shared by the following jobs until the secrets expire.
+"""
+
+__all__ = [
+    "SecretsFetcher",
+    "LocalSecretsFetcher",
+    "SecretsCache",
+    "SecretsResolver",
+    "parse_secret",
+    "resolve_secrets",
+]
+
+
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from pydantic import BaseModel
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.enums.secrets import SecretSource
+from src.models.secrets import SecretsBackend
+from src.models.pipeline import PorterPipeline
+
+# "module:class" of the fetcher of each secrets source, imported only when the source is used
+FETCHERS = {
+    SecretSource.aws_sm: "src.utilities.aws.secrets:SecretsManagerFetcher",
+    SecretSource.aws_ssm: "src.utilities.aws.secrets:ParameterStoreFetcher",
+    SecretSource.local: "src.utilities.secrets:LocalSecretsFetcher",
+}
+
+
+def parse_secret(value: Any) -> Any:
+    """Secrets holding a JSON document (Example: the credentials of a connection) are returned as a dict."""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode()
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+class SecretsFetcher(ABC):
+    """Fetches secrets from a secrets source, each secrets source implements `fetch_batch`."""
+
+    # max number of secrets fetched by one call to the secrets source
+    max_batch_size: ClassVar[int] = 1
+
+    def __init__(self, backend: SecretsBackend):
+        """Expect to pass the secrets backend config to all fetchers."""
+        self.backend = backend
+
+    @abstractmethod
+    def fetch_batch(self, secret_names: List[str]) -> Dict[str, Any]:
+        """Fetch at most `max_batch_size` secrets in one call.
+        Returns the value of each secret found, secrets which don't exist are left out.
+        """
+        ...
+
+
+class LocalSecretsFetcher(SecretsFetcher):
+    """Reads the secrets from a local JSON/YAML file, a stand-in for a secrets manager in local runs and tests."""
+
+    max_batch_size: ClassVar[int] = 1000
+
+    def fetch_batch(self, secret_names: List[str]) -> Dict[str, Any]:
+        """Values of the secrets found in the file."""
+        with open(self.backend.args.path) as r_fp:
+            secrets = yaml.safe_load(r_fp) or {}
+        return {
+            name: parse_secret(secrets[name])
+            for name in secret_names
+            if name in secrets
+        }
+
+
+class SecretsCache:
+    """Encrypted cache of the secrets of a backend on local disk, each secret expires `ttl` seconds after it was fetched.
+
+    The cache file is encrypted with Fernet (`cryptography` package) using the key in the
+    PORTER_SECRETS_CACHE_KEY environment variable, it's stored under PORTER_SECRETS_CACHE_DIR
+    (by default `~/.cache/porter/secrets`) and readable only by the current user.
+    """
+
+    key_env = "PORTER_SECRETS_CACHE_KEY"
+
+    def __init__(self, backend: SecretsBackend, key: Optional[str] = None):
+        """Cache of the secrets of the backend for `backend.cache_ttl` seconds.
+        Raises PorterException if there's no key or `cryptography` is not installed.
+        """
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError as e:
+            raise exc.PorterException(
+                "The local secrets cache needs the `cryptography` package, install it or set cache_ttl to 0"
+            ) from e
+        key = key or os.environ.get(self.key_env)
+        if not key:
+            raise exc.PorterException(
+                f"The local secrets cache needs an encryption key, generate one with "
+                f"`Fernet.generate_key()` and set it in {self.key_env}, or set cache_ttl to 0"
+            )
+        self.fernet = Fernet(key)
+        self.ttl = backend.cache_ttl
+        cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        cache_dir = os.environ.get("PORTER_SECRETS_CACHE_DIR") or Path(
+            cache_home, "porter", "secrets"
+        )
+        self.path = Path(
+            cache_dir, f"{backend.name}-{self.backend_key(backend)}.secrets"
+        )
+
+    @staticmethod
+    def backend_key(backend: SecretsBackend) -> str:
+        """Identifies where the secrets come from, so that backends with the same name but another secrets source,
+        account or region (Example: dev and prod) never share cached secrets.
+        """
+        args = backend.args
+        if isinstance(args, BaseModel):
+            args = args.model_dump(mode="json")
+        identity = json.dumps(
+            [backend.name, backend.secrets_source.value, args],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+    def load(self) -> Dict[str, Tuple[Any, float]]:
+        """(value, time it was fetched) of each secret of the cache which hasn't expired.
+        An unreadable cache is treated as empty.
+        """
+        from cryptography.fernet import InvalidToken
+
+        try:
+            entries = json.loads(self.fernet.decrypt(self.path.read_bytes()))
+        except FileNotFoundError:
+            return {}
+        except (InvalidToken, ValueError) as e:
+            log.warning(f"Ignoring the secrets cache {self.path}: {e!r}")
+            return {}
+        now = time.time()
+        return {
+            name: (entry["value"], entry["fetched_at"])
+            for name, entry in entries.items()
+            if now - entry["fetched_at"] < self.ttl
+        }
+
+    def save(self, secrets: Dict[str, Tuple[Any, float]]):
+        """Write the secrets which haven't expired, atomically and readable only by the current user."""
+        now = time.time()
+        entries = {
+            name: {"value": value, "fetched_at": fetched_at}
+            for name, (value, fetched_at) in secrets.items()
+            if now - fetched_at < self.ttl
+        }
+        token = self.fernet.encrypt(json.dumps(entries).encode())
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            tmp_file = self.path.with_suffix(f".{os.getpid()}.tmp")
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as w_fp:
+                w_fp.write(token)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            # the cache is only an optimization, the job goes on without it
+            log.warning(f"Could not write the secrets cache {self.path}: {e!r}")
+
+
+class SecretsResolver:
+    """Fetches and holds the secrets of a pipeline, it's safe to use from many threads."""
+
+    def __init__(
+        self,
+        backend: SecretsBackend,
+        fetcher: Optional[SecretsFetcher] = None,
+        cache: Optional[SecretsCache] = None,
+    ):
+        """Resolver of the secrets of the backend.
+
+        Args:
+            backend: The secrets backend of the pipeline.
+            fetcher: Fetcher of the secrets, by default the one of `backend.secrets_source`.
+            cache: Local cache of the secrets, by default one is created if `backend.cache_ttl` is set.
+        """
+        self.backend = backend
+        self.fetcher = fetcher or self._create_fetcher(backend)
+        if cache is None and backend.cache_ttl:
+            cache = SecretsCache(backend)
+        self.cache = cache
+        self._secrets: Dict[str, Any] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        if self.cache is not None:
+            for name, (value, fetched_at) in self.cache.load().items():
+                self._secrets[name] = value
+                self._fetched_at[name] = fetched_at
+
+    @staticmethod
+    def _create_fetcher(backend: SecretsBackend) -> SecretsFetcher:
+        """Fetcher of the secrets source of the backend."""
+        if backend.secrets_source not in FETCHERS:
+            raise exc.PorterException(
+                f"Secrets source {backend.secrets_source.value} is not supported yet, "
+                f"supported sources are {[source.value for source in FETCHERS]}"
+            )
+        module_name, _, class_name = FETCHERS[backend.secrets_source].partition(":")
+        fetcher_class = getattr(importlib.import_module(module_name), class_name)
+        return fetcher_class(backend)
+
+    def _check_allowed(self, names: Iterable[str]):
+        """Only the secrets listed in the backend can be used, when the list is set."""
+        if self.backend.secrets is None:
+            return
+        not_allowed = [name for name in names if name not in self.backend.secrets]
+        if not_allowed:
+            raise exc.PorterException(
+                f"Secrets {not_allowed} are not listed in the secrets of the backend {self.backend.name}"
+            )
+
+    def prefetch(self, names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Fetch the secrets not fetched yet, all the secrets of the backend by default.
+        The secrets are fetched in batches of the max size the secrets source allows, the batches concurrently.
+        Raises PorterException if any of the secrets doesn't exist.
+        """
+        names = list(dict.fromkeys(names or self.backend.secrets or []))
+        self._check_allowed(names)
+        with self._lock:
+            missing = [name for name in names if name not in self._secrets]
+            if missing:
+                self._fetch(missing)
+            return {name: self._secrets[name] for name in names}
+
+    def _fetch(self, names: List[str]):
+        """Fetch the secrets and add them to the in-memory and local caches, expects the lock to be held."""
+        size = self.fetcher.max_batch_size
+        batches = [names[i : i + size] for i in range(0, len(names), size)]
+        started_at = time.time()
+        workers = min(len(batches), self.backend.max_concurrent_fetches)
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="porter-secrets"
+        ) as executor:
+            fetched: Dict[str, Any] = {}
+            for batch in executor.map(self.fetcher.fetch_batch, batches):
+                fetched.update(batch)
+
+        not_found = [name for name in names if name not in fetched]
+        if not_found:
+            raise exc.PorterException(
+                f"Secrets {not_found} were not found in {self.backend.secrets_source.value}"
+            )
+        now = time.time()
+        self._secrets.update(fetched)
+        self._fetched_at.update({name: now for name in fetched})
+        log.info(
+            f"Fetched {len(fetched)} secrets in {len(batches)} calls to "
+            f"{self.backend.secrets_source.value} in {now - started_at:.2f}s"
+        )
+        if self.cache is not None:
+            # secrets loaded from the cache keep the time they were first fetched, so they still expire on time
+            self.cache.save(
+                {
+                    name: (value, self._fetched_at[name])
+                    for name, value in self._secrets.items()
+                }
+            )
+
+    def get(self, name: str) -> Any:
+        """Value of the secret, fetched now if it wasn't prefetched."""
+        self._check_allowed([name])
+        if name in self._secrets:
+            return self._secrets[name]
+        return self.prefetch([name])[name]
+
+
+def resolve_secrets(
+    pipeline: PorterPipeline, resolver: Optional[SecretsResolver] = None
+) -> PorterPipeline:
+    """Copy of the pipeline with the secrets of its source and targets resolved into their args.
+    All the secrets of the pipeline are fetched at once, before any connection is opened.
+    The resolved pipeline holds the secrets in plain text, it should only be kept in memory.
+    """
+    configs = [pipeline.source, *pipeline.targets]
+    names = [
+        name
+        for config in configs
+        if config is not None
+        for name in config.secret_names()
+    ]
+    if not names:
+        return pipeline
+    if resolver is None:
+        if pipeline.secrets_backend is None:
+            raise exc.PorterException(
+                f"Pipeline {pipeline.name} uses the secrets {names}, but it has no secrets_backend"
+            )
+        resolver = SecretsResolver(pipeline.secrets_backend)
+    secrets = resolver.prefetch([*(resolver.backend.secrets or []), *names])
+    return pipeline.model_copy(
+        update={
+            "source": pipeline.source.with_secrets(secrets)
+            if pipeline.source is not None
+            else None,
+            "targets": [target.with_secrets(secrets) for target in pipeline.targets],
+        }
+    )
@@ -0,0 +1,328 @@
+"""Evaluation of the `expectation` of a validation against the result of its query.
+
+Expectations are python expressions like `source_result == 0` or `source_result in (1, 2)`. They are never run
+with `eval`, each expectation is parsed once, checked against a small grammar (comparisons, boolean logic,
+arithmetic, literals and a few functions) and compiled into a callable which is cached:
+- a single value result is evaluated on the python value,
+- a result with rows is evaluated vectorized on the Arrow columns (pyarrow.compute) and has to hold for every row.
+
+`source_result` is the value (or the first column) of the result, the columns of the result are also available by name.
+"""
+
+__all__ = [
+    "CompiledExpectation",
+    "compile_expectation",
+    "evaluate_expectation",
+    "result_value",
+]
+
+
+import ast
+import functools
+import numbers
+import operator
+from typing import Any, Callable, Dict, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.common import exceptions as exc
+
+SOURCE_RESULT = "source_result"
+
+# Evaluates a node of the expression, given the values of the names
+_Evaluator = Callable[[Dict[str, Any]], Any]
+
+_COMPARISONS = {
+    ast.Eq: (operator.eq, pc.equal),
+    ast.NotEq: (operator.ne, pc.not_equal),
+    ast.Lt: (operator.lt, pc.less),
+    ast.LtE: (operator.le, pc.less_equal),
+    ast.Gt: (operator.gt, pc.greater),
+    ast.GtE: (operator.ge, pc.greater_equal),
+}
+_ARITHMETIC = {
+    ast.Add: (operator.add, pc.add),
+    ast.Sub: (operator.sub, pc.subtract),
+    ast.Mult: (operator.mul, pc.multiply),
+    ast.Div: (operator.truediv, pc.divide),
+}
+
+
+def _arrow_aggregate(function: Callable, element_wise: Callable = None) -> Callable:
+    """An aggregate over a column, or an element-wise function when called with more than one argument."""
+
+    def apply(*args):
+        if len(args) > 1 and element_wise is not None:
+            return element_wise(*args)
+        return function(*args)
+
+    return apply
+
+
+def _numeric(function: Callable) -> Callable:
+    """Arithmetic on numbers only, so that an expectation can't build huge strings or lists (Example: `'a' * 10**9`)."""
+
+    def apply(left, right):
+        for value in (left, right):
+            if isinstance(value, bool) or not isinstance(value, numbers.Number):
+                raise exc.PorterException(
+                    f"Arithmetic is only allowed on numbers, got {value!r}"
+                )
+        return function(left, right)
+
+    return apply
+
+
+def _null_is_false(function: Callable) -> Callable:
+    """Ordering comparison of single values where a NULL on either side is False, as in SQL (Example: `None > 0`)."""
+
+    def apply(left, right):
+        if left is None or right is None:
+            return False
+        return function(left, right)
+
+    return apply
+
+
+_FUNCTIONS = {
+    "len": (len, len),
+    "abs": (abs, pc.abs),
+    "round": (round, pc.round),
+    "min": (min, _arrow_aggregate(pc.min, pc.min_element_wise)),
+    "max": (max, _arrow_aggregate(pc.max, pc.max_element_wise)),
+    "sum": (sum, pc.sum),
+    "all": (all, pc.all),
+    "any": (any, pc.any),
+}
+
+
+class CompiledExpectation:
+    """An expectation compiled into a callable for single values and one for Arrow columns."""
+
+    def __init__(self, expression: str):
+        """Parse and compile the expression, raises PorterException if it's outside the allowed grammar."""
+        self.expression = expression
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise exc.PorterException(
+                f"Invalid expectation {expression!r}: {e.msg}"
+            ) from e
+        self._scalar = self._compile(tree.body, vectorized=False)
+        self._vectorized = self._compile(tree.body, vectorized=True)
+
+    def _invalid(self, node: ast.AST, reason: str = "is not allowed"):
+        return exc.PorterException(
+            f"Invalid expectation {self.expression!r}: {ast.unparse(node)} {reason}, "
+            f"only comparisons, and/or/not, arithmetic, literals and the functions "
+            f"{sorted(_FUNCTIONS)} can be used"
+        )
+
+    def _compile(self, node: ast.AST, vectorized: bool) -> _Evaluator:
+        """Compile a node of the expression into a callable, the whole tree is checked while compiling."""
+        pick = 1 if vectorized else 0
+
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float, str, bool, type(None))):
+                raise self._invalid(node)
+            value = node.value
+            return lambda names: value
+
+        if isinstance(node, (ast.Tuple, ast.List)):
+            items = [self._literal(element) for element in node.elts]
+            return lambda names: items
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name.startswith("_"):
+                raise self._invalid(node)
+
+            def lookup(names):
+                if name not in names:
+                    raise exc.PorterException(
+                        f"Expectation {self.expression!r} uses {name}, "
+                        f"which is not a column of the validation result"
+                    )
+                return names[name]
+
+            return lookup
+
+        if isinstance(node, ast.BoolOp):
+            values = [self._compile(value, vectorized) for value in node.values]
+            is_and = isinstance(node.op, ast.And)
+            if vectorized:
+                combine = pc.and_kleene if is_and else pc.or_kleene
+                return lambda names: functools.reduce(
+                    combine, (value(names) for value in values)
+                )
+            if is_and:
+                return lambda names: all(value(names) for value in values)
+            return lambda names: any(value(names) for value in values)
+
+        if isinstance(node, ast.UnaryOp):
+            operand = self._compile(node.operand, vectorized)
+            if isinstance(node.op, ast.Not):
+                function = pc.invert if vectorized else operator.not_
+            elif isinstance(node.op, ast.USub):
+                function = pc.negate if vectorized else operator.neg
+            elif isinstance(node.op, ast.UAdd):
+                return operand
+            else:
+                raise self._invalid(node)
+            return lambda names: function(operand(names))
+
+        if isinstance(node, ast.BinOp):
+            if type(node.op) not in _ARITHMETIC:
+                raise self._invalid(node)
+            function = _ARITHMETIC[type(node.op)][pick]
+            if not vectorized:
+                function = _numeric(function)
+            left = self._compile(node.left, vectorized)
+            right = self._compile(node.right, vectorized)
+            return lambda names: function(left(names), right(names))
+
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node, vectorized)
+
+        if isinstance(node, ast.Call):
+            if (
+                not isinstance(node.func, ast.Name)
+                or node.func.id not in _FUNCTIONS
+                or node.keywords
+            ):
+                raise self._invalid(node)
+            function = _FUNCTIONS[node.func.id][pick]
+            args = [self._compile(arg, vectorized) for arg in node.args]
+            return lambda names: function(*(arg(names) for arg in args))
+
+        raise self._invalid(node)
+
+    def _literal(self, node: ast.AST) -> Any:
+        """Value of a literal inside a list/tuple, only numbers, strings, booleans and None are allowed."""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -self._literal(node.operand)
+        if not isinstance(node, ast.Constant) or not isinstance(
+            node.value, (int, float, str, bool, type(None))
+        ):
+            raise self._invalid(node, "is not a literal")
+        return node.value
+
+    def _compile_compare(self, node: ast.Compare, vectorized: bool) -> _Evaluator:
+        """Compile a (chained) comparison, `a < b < c` is `a < b and b < c`."""
+        operands = [node.left, *node.comparators]
+        checks = []
+        for op, left_node, right_node in zip(node.ops, operands, operands[1:]):
+            left = self._compile(left_node, vectorized)
+            if isinstance(op, (ast.Is, ast.IsNot)):
+                if not (
+                    isinstance(right_node, ast.Constant) and right_node.value is None
+                ):
+                    raise self._invalid(node, "can only use `is` with None")
+                is_none = isinstance(op, ast.Is)
+                if vectorized:
+                    function = pc.is_null if is_none else pc.is_valid
+                    checks.append(lambda names, l=left, f=function: f(l(names)))
+                else:
+                    checks.append(
+                        lambda names, l=left, n=is_none: (l(names) is None) == n
+                    )
+                continue
+
+            right = self._compile(right_node, vectorized)
+            if isinstance(op, (ast.In, ast.NotIn)):
+                negate = isinstance(op, ast.NotIn)
+                if vectorized:
+
+                    def is_in(names, l=left, r=right, n=negate):
+                        matches = pc.is_in(l(names), value_set=pa.array(r(names)))
+                        return pc.invert(matches) if n else matches
+
+                    checks.append(is_in)
+                else:
+                    checks.append(
+                        lambda names, l=left, r=right, n=negate: (
+                            (l(names) in r(names)) != n
+                        )
+                    )
+                continue
+
+            if type(op) not in _COMPARISONS:
+                raise self._invalid(node)
+            function = _COMPARISONS[type(op)][1 if vectorized else 0]
+            if not vectorized and type(op) not in (ast.Eq, ast.NotEq):
+                function = _null_is_false(function)
+            checks.append(
+                lambda names, l=left, r=right, f=function: f(l(names), r(names))
+            )
+
+        if len(checks) == 1:
+            return checks[0]
+        if vectorized:
+            return lambda names: functools.reduce(
+                pc.and_kleene, (check(names) for check in checks)
+            )
+        return lambda names: all(check(names) for check in checks)
+
+    def evaluate_value(
+        self, value: Any, names: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Evaluate the expectation on a single value."""
+        return bool(
+            self._evaluate(self._scalar, {**(names or {}), SOURCE_RESULT: value})
+        )
+
+    def _evaluate(self, evaluator: _Evaluator, names: Dict[str, Any]) -> Any:
+        """Run the compiled expectation, errors of the operators (Example: `-'a'`) are raised as PorterException."""
+        try:
+            return evaluator(names)
+        except exc.PorterException:
+            raise
+        except Exception as e:
+            raise exc.PorterException(
+                f"Expectation {self.expression!r} can't be evaluated on the validation result: {e!r}"
+            ) from e
+
+    def evaluate_table(self, result: pa.Table) -> bool:
+        """Evaluate the expectation vectorized on the columns of the result, it has to hold for every row.
+        Rows where the expectation is NULL (Example: comparing a NULL value) fail.
+        """
+        names = {name: result.column(name) for name in result.column_names}
+        if result.num_columns:
+            names[SOURCE_RESULT] = result.column(0)
+        outcome = self._evaluate(self._vectorized, names)
+        if isinstance(outcome, (pa.Array, pa.ChunkedArray)):
+            return bool(pc.all(pc.fill_null(outcome, False)).as_py())
+        if isinstance(outcome, pa.Scalar):
+            return bool(outcome.as_py())
+        return bool(outcome)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_expectation(expression: str) -> CompiledExpectation:
+    """Compile the expectation, every expression is parsed once and the compiled expectation is reused."""
+    return CompiledExpectation(expression)
+
+
+def result_value(result: pa.Table) -> Any:
+    """The single value of a result with one row and one column, None for any other result."""
+    if result.num_rows == 1 and result.num_columns == 1:
+        return result.column(0)[0].as_py()
+    return None
+
+
+def evaluate_expectation(expectation: Optional[str], result: pa.Table) -> bool:
+    """True if the result of the validation query meets the expectation.
+    Without an expectation, the validation passes when the query returns no rows,
+    or a single value which is 0/NULL/False (Example: a count of invalid rows).
+    """
+    if result.num_rows == 1 and result.num_columns == 1:
+        value = result_value(result)
+        if expectation is None:
+            return not value
+        return compile_expectation(expectation).evaluate_value(
+            value, {result.column_names[0]: value}
+        )
+    if expectation is None:
+        return result.num_rows == 0
+    return compile_expectation(expectation).evaluate_table(result)
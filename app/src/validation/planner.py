@@ -0,0 +1,422 @@
+"""Plans and runs validations, combining the checks on the same table into one query with one scan.
+
+Validations whose query is a single aggregate over one table, like
+`SELECT COUNT(*) FROM users WHERE email IS NULL` or `SELECT COUNT(*) - COUNT(DISTINCT id) FROM users`,
+are combined into one query per (source, table):
+
+    SELECT COUNT(CASE WHEN email IS NULL THEN 1 END) AS porter_v0,
+           COUNT(*) - COUNT(DISTINCT id) AS porter_v1
+    FROM users
+
+The WHERE clause of each validation moves into the arguments of its aggregates (`AGG(CASE WHEN <where> THEN <arg> END)`,
+which all the databases support unlike `FILTER (WHERE ...)`), and every validation is evaluated
+against its own column of the combined result. All the other validations (joins, GROUP BY, queries returning rows
+etc.) run on their own.
+"""
+
+__all__ = [
+    "ValidationQuery",
+    "ValidationBatch",
+    "ValidationResult",
+    "parse_validation_query",
+    "plan_validations",
+    "run_validations",
+]
+
+
+import re
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+from pydantic import BaseModel, ConfigDict
+
+from src.common import exceptions as exc
+from src.common.base_logger import log
+from src.enums.common import ExceptionType, Status
+from src.models.validation import ValidationConfig
+from src.sources.connection_pool import ConnectionPool
+from src.sources.database.base import DatabaseSource
+from src.sources.database.duckdb.duckdb_source import DUCK_INTERNAL, DuckDBSource
+from src.validation.expectation import evaluate_expectation, result_value
+
+AGGREGATE_FUNCTIONS = (
+    "COUNT",
+    "SUM",
+    "MIN",
+    "MAX",
+    "AVG",
+    "BOOL_AND",
+    "BOOL_OR",
+    "STDDEV",
+    "STDDEV_POP",
+    "STDDEV_SAMP",
+    "VARIANCE",
+    "VAR_POP",
+    "VAR_SAMP",
+    "MEDIAN",
+    "APPROX_COUNT_DISTINCT",
+)
+_AGGREGATE_CALL = re.compile(
+    r"\b(" + "|".join(AGGREGATE_FUNCTIONS) + r")\s*\(", re.IGNORECASE
+)
+_SIMPLE_QUERY = re.compile(
+    r"^\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<from>.+?)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+# clauses which change the shape of the result, queries having any of them at the top level are not combined
+_UNSUPPORTED_CLAUSES = re.compile(
+    r"\b(DISTINCT|GROUP|HAVING|ORDER|LIMIT|OFFSET|QUALIFY|WINDOW|UNION|INTERSECT|EXCEPT|JOIN|USING)\b",
+    re.IGNORECASE,
+)
+# unsupported anywhere in the expression, as the WHERE clause would be added in the wrong place
+_UNSUPPORTED_IN_SELECT = re.compile(r"\b(SELECT|FILTER|OVER)\b", re.IGNORECASE)
+_SET_QUANTIFIER = re.compile(r"^\s*(DISTINCT|ALL)\b\s*", re.IGNORECASE)
+_TABLE_REFERENCE = re.compile(r'^[\w."]+(?:\s+(?:AS\s+)?\w+)?$', re.IGNORECASE)
+
+
+class ValidationQuery(BaseModel):
+    """A validation query which is a single aggregate over one table."""
+
+    select: str
+    from_clause: str
+    where: Optional[str] = None
+
+    @property
+    def table_key(self) -> str:
+        """Queries with the same key read the same table (with the same alias) and can be combined."""
+        return " ".join(self.from_clause.lower().split())
+
+    def aggregate_expression(self) -> str:
+        """The select expression, with the WHERE clause moved into the argument of each aggregate:
+        `COUNT(*)` becomes `COUNT(CASE WHEN <where> THEN 1 END)` and `SUM(DISTINCT x)` becomes
+        `SUM(DISTINCT CASE WHEN <where> THEN x END)`, the rows not matching the WHERE clause are NULL and ignored.
+        """
+        if self.where is None:
+            return self.select
+        expression, position = self.select, 0
+        while match := _AGGREGATE_CALL.search(expression, position):
+            start = match.end()
+            end = _closing_parenthesis(expression, start - 1)
+            argument = expression[start:end]
+            quantifier = _SET_QUANTIFIER.match(argument)
+            prefix = quantifier.group(0) if quantifier else ""
+            argument = argument[len(prefix) :].strip()
+            if argument == "*":
+                argument = "1"
+            call = f"{prefix}CASE WHEN {self.where} THEN {argument} END"
+            expression = expression[:start] + call + expression[end:]
+            position = start + len(call) + 1
+        return expression
+
+
+class ValidationBatch(BaseModel):
+    """One query which runs one or more validations."""
+
+    source_name: str
+    validations: List[ValidationConfig]
+    # index of each validation in the list of validations that was planned
+    positions: List[int]
+    sql: str
+    values_to_bind: Optional[Dict] = None
+    # the validations are combined, each one is evaluated against its own column of the result
+    combined: bool = False
+
+
+class ValidationResult(BaseModel):
+    """Outcome of one validation."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    name: str
+    source_name: str
+    status: Status
+    exception_type: ExceptionType
+    message: Optional[str] = None
+    # value of a single value result, None when the query returned rows
+    source_result: Any = None
+    num_rows: int = 0
+    elapsed_seconds: float = 0.0
+
+
+def _mask(sql: str) -> str:
+    """Blank out string literals, quoted identifiers and everything inside parentheses,
+    so that only the top level of the query is left (the length of the query is kept).
+    """
+    masked, depth, quote = [], 0, None
+    for char in sql:
+        if quote:
+            if char == quote:
+                # the quotes are kept at the top level, so that a literal at the end isn't cut off
+                quote = None
+                masked.append(" " if depth else char)
+            else:
+                masked.append(" ")
+        elif char in ("'", '"'):
+            quote = char
+            masked.append(" " if depth else char)
+        elif char == "(":
+            depth += 1
+            masked.append(char if depth == 1 else " ")
+        elif char == ")":
+            depth -= 1
+            masked.append(char if depth == 0 else " ")
+        else:
+            masked.append(" " if depth else char)
+    return "".join(masked)
+
+
+def _closing_parenthesis(sql: str, start: int) -> int:
+    """Index of the parenthesis closing the one at `start`, string literals are skipped."""
+    masked = _mask(sql[start:])
+    depth = 0
+    for index, char in enumerate(masked):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return start + index
+    raise exc.PorterException(f"Unbalanced parentheses in: {sql}")
+
+
+def parse_validation_query(sql: str) -> Optional[ValidationQuery]:
+    """Split a query of the form `SELECT <aggregate expression> FROM <table> [WHERE <condition>]`,
+    returns None for any other query, which then runs on its own.
+    """
+    masked = _mask(sql)
+    match = _SIMPLE_QUERY.match(masked)
+    if (
+        match is None
+        or _UNSUPPORTED_CLAUSES.search(masked)
+        # more than one column in the result
+        or "," in match.group("select")
+        or not _TABLE_REFERENCE.match(match.group("from").strip())
+    ):
+        return None
+
+    select = sql[match.start("select") : match.end("select")].strip()
+    if _UNSUPPORTED_IN_SELECT.search(select) or not _AGGREGATE_CALL.search(select):
+        return None
+    where = None
+    if match.group("where") is not None:
+        where = sql[match.start("where") : match.end("where")].strip()
+    return ValidationQuery(
+        select=select,
+        from_clause=sql[match.start("from") : match.end("from")].strip(),
+        where=where,
+    )
+
+
+def _namespace_placeholders(
+    sql: str, values_to_bind: Optional[Dict], prefix: str
+) -> Tuple[str, Dict]:
+    """Rename the `:name` placeholders of one validation, so that values of different validations don't clash."""
+    if not values_to_bind:
+        return sql, {}
+    sql = DatabaseSource.bind_placeholders(sql, values_to_bind, f":{prefix}{{name}}")
+    return sql, {f"{prefix}{name}": value for name, value in values_to_bind.items()}
+
+
+def plan_validations(validations: List[ValidationConfig]) -> List[ValidationBatch]:
+    """Group the validations into the queries to run, validations on the same table are combined into one query.
+    Validations without a `sql_query` are not planned.
+    """
+    batches: List[ValidationBatch] = []
+    groups: Dict[
+        Tuple[str, str], List[Tuple[int, ValidationConfig, ValidationQuery]]
+    ] = defaultdict(list)
+    for position, validation in enumerate(validations):
+        if not validation.sql_query:
+            continue
+        query = parse_validation_query(validation.sql_query)
+        if query is None:
+            batches.append(
+                ValidationBatch(
+                    source_name=validation.source_name,
+                    validations=[validation],
+                    positions=[position],
+                    sql=validation.sql_query,
+                    values_to_bind=validation.values_to_bind,
+                )
+            )
+        else:
+            groups[(validation.source_name, query.table_key)].append(
+                (position, validation, query)
+            )
+
+    for (source_name, _), members in groups.items():
+        columns, values_to_bind = [], {}
+        for index, (_, validation, query) in enumerate(members):
+            expression, values = _namespace_placeholders(
+                query.aggregate_expression(),
+                validation.values_to_bind,
+                f"porter_v{index}_",
+            )
+            columns.append(f"{expression} AS porter_v{index}")
+            values_to_bind.update(values)
+        batches.append(
+            ValidationBatch(
+                source_name=source_name,
+                validations=[validation for _, validation, _ in members],
+                positions=[position for position, _, _ in members],
+                sql=f"SELECT {', '.join(columns)} FROM {members[0][2].from_clause}",
+                values_to_bind=values_to_bind or None,
+                combined=True,
+            )
+        )
+    return batches
+
+
+def _evaluate(
+    validation: ValidationConfig, result: pa.Table, elapsed_seconds: float
+) -> ValidationResult:
+    """Evaluate the expectation of one validation and log the outcome according to its exception_type."""
+    passed = evaluate_expectation(validation.expectation, result)
+    outcome = ValidationResult(
+        name=validation.name,
+        source_name=validation.source_name,
+        status=Status.success if passed else Status.failure,
+        exception_type=validation.exception_type,
+        message=None if passed else validation.exception,
+        source_result=result_value(result),
+        num_rows=result.num_rows,
+        elapsed_seconds=elapsed_seconds,
+    )
+    if passed:
+        log.info(f"Validation {validation.name} passed")
+    elif validation.exception_type == ExceptionType.error:
+        log.error(f"Validation {validation.name} failed: {validation.exception}")
+    elif validation.exception_type == ExceptionType.warning:
+        log.warning(f"Validation {validation.name} failed: {validation.exception}")
+    else:
+        log.info(
+            f"Validation {validation.name} failed (ignored): {validation.exception}"
+        )
+    return outcome
+
+
+def _run_batch(
+    batch: ValidationBatch, engine: DuckDBSource, pool: ConnectionPool
+) -> List[ValidationResult]:
+    """Run the query of a batch and evaluate all the validations of the batch.
+    Only the query raises, a validation whose expectation can't be evaluated fails on its own.
+    """
+    started_at = time.time()
+    if batch.source_name == DUCK_INTERNAL:
+        result = engine.read_query(batch.sql, batch.values_to_bind).read_all()
+    else:
+        with pool.acquire(batch.source_name) as source:
+            result = source.read_query(batch.sql, batch.values_to_bind).read_all()
+    elapsed_seconds = time.time() - started_at
+    if batch.combined:
+        log.info(
+            f"Ran {len(batch.validations)} validations on {batch.source_name} with one query "
+            f"in {elapsed_seconds:.2f}s"
+        )
+
+    results = []
+    for index, validation in enumerate(batch.validations):
+        try:
+            results.append(
+                _evaluate(
+                    validation,
+                    result.select([index]) if batch.combined else result,
+                    elapsed_seconds / len(batch.validations),
+                )
+            )
+        except Exception as e:
+            results.append(_failed_to_run(validation, e))
+    return results
+
+
+def _failed_to_run(validation: ValidationConfig, error: Exception) -> ValidationResult:
+    """Result of a validation whose query or expectation raised an exception."""
+    log.error(f"Validation {validation.name} failed to run: {error!r}")
+    return ValidationResult(
+        name=validation.name,
+        source_name=validation.source_name,
+        status=Status.failure,
+        exception_type=validation.exception_type,
+        message=f"{validation.exception} (failed to run: {error!r})",
+    )
+
+
+def _run_single(
+    validation: ValidationConfig, engine: DuckDBSource, pool: ConnectionPool
+) -> ValidationResult:
+    """Run a validation with its own query."""
+    batch = ValidationBatch(
+        source_name=validation.source_name,
+        validations=[validation],
+        positions=[0],
+        sql=validation.sql_query,
+        values_to_bind=validation.values_to_bind,
+    )
+    try:
+        return _run_batch(batch, engine, pool)[0]
+    except Exception as e:
+        return _failed_to_run(validation, e)
+
+
+def run_validations(
+    validations: List[ValidationConfig],
+    engine: DuckDBSource,
+    pool: ConnectionPool,
+    raise_on_failure: bool = True,
+) -> List[ValidationResult]:
+    """Run the validations, combining the ones on the same table into one query.
+
+    Args:
+        validations: Validations in the order of the config.
+        engine: The `duck_internal` engine of the job.
+        pool: Connection pool of the job, used for the validations which run on a source/target.
+        raise_on_failure: Raise PorterException if any validation with exception_type `error` failed.
+
+    Returns:
+        One ValidationResult per validation, in the order of `validations`.
+    """
+    results: List[Optional[ValidationResult]] = [None] * len(validations)
+    for position, validation in enumerate(validations):
+        if not validation.sql_query:
+            log.warning(f"Validation {validation.name} has no sql_query, skipping it")
+            results[position] = ValidationResult(
+                name=validation.name,
+                source_name=validation.source_name,
+                status=Status.skipped,
+                exception_type=validation.exception_type,
+            )
+
+    for batch in plan_validations(validations):
+        try:
+            batch_results = _run_batch(batch, engine, pool)
+        except Exception as e:
+            if batch.combined:
+                # one invalid query fails the combined query, run them one by one to find it
+                log.warning(
+                    f"Combined validation query failed on {batch.source_name}, "
+                    f"running the validations one by one: {e!r}"
+                )
+                batch_results = [
+                    _run_single(validation, engine, pool)
+                    for validation in batch.validations
+                ]
+            else:
+                batch_results = [_failed_to_run(batch.validations[0], e)]
+        for position, result in zip(batch.positions, batch_results):
+            results[position] = result
+
+    failed = [
+        result
+        for result in results
+        if result.status == Status.failure
+        and result.exception_type == ExceptionType.error
+    ]
+    if failed and raise_on_failure:
+        raise exc.PorterException(
+            f"{len(failed)} out of {len(results)} validations failed: "
+            + "; ".join(f"{result.name}: {result.message}" for result in failed)
+        )
+    return results
@@ -0,0 +1,104 @@
+from datetime import date
+from decimal import Decimal
+
+import pyarrow as pa
+import pytest
+from pydantic import ValidationError
+
+from src.common import exceptions as exc
+from src.models.dataset.file import FileArgs, FileDataset
+from src.sources.file.local.chunked import read_text_files
+
+
+def _dataset(tmp_path, file_type, columns=None, **args):
+    return FileDataset.model_validate(
+        {
+            "name": "records",
+            "file_path": str(tmp_path),
+            "file_type": file_type,
+            "engine": "pyarrow",
+            "columns": columns,
+            # small chunks, so that every file is split into many of them
+            "args": {"chunk_size": 64, **args},
+        }
+    )
+
+
+def _read(path, dataset):
+    return read_text_files([str(path)], dataset).read_all()
+
+
+def test_fixed_width_records_are_sliced_into_typed_columns(tmp_path):
+    path = tmp_path / "accounts.dat"
+    records = [
+        "HEADER RECORD",
+        "0000000001Alice     000000123420240131",
+        "0000000002Bob       -00000000120240229",
+        "0000000003Carol          12.50        ",
+    ]
+    path.write_text("\n".join(records) + "\n", encoding="latin-1")
+    columns = [
+        {"name": "id", "datatype": "BIGINT", "precision": 10},
+        {"name": "holder", "datatype": "STRING", "precision": 10},
+        {"name": "balance", "datatype": "DECIMAL(38,2)", "precision": 10},
+        {"name": "opened_on", "datatype": "DATE", "precision": 8},
+    ]
+    table = _read(
+        path,
+        _dataset(tmp_path, "fixed_width", columns, skip_rows=1, encoding="latin-1"),
+    )
+    assert table.schema.field("balance").type == pa.decimal128(38, 2)
+    assert table.column("id").to_pylist() == [1, 2, 3]
+    assert table.column("holder").to_pylist() == ["Alice", "Bob", "Carol"]
+    assert table.column("balance").to_pylist() == [
+        Decimal("12.34"),
+        Decimal("-0.01"),
+        Decimal("12.50"),
+    ]
+    assert table.column("opened_on").to_pylist() == [
+        date(2024, 1, 31),
+        date(2024, 2, 29),
+        None,
+    ]
+
+
+def test_implied_decimal_point_does_not_depend_on_the_other_values(tmp_path):
+    columns = [{"name": "amount", "datatype": "DECIMAL", "precision": 6, "scale": 2}]
+    alone = tmp_path / "alone"
+    alone.mkdir()
+    (alone / "a.dat").write_text("     1\n")
+    mixed = tmp_path / "mixed"
+    mixed.mkdir()
+    (mixed / "a.dat").write_text("     1\n  1.50\n")
+
+    assert _read(alone / "a.dat", _dataset(alone, "fixed_width", columns)).column(
+        "amount"
+    ).to_pylist() == [Decimal("0.01")]
+    assert _read(mixed / "a.dat", _dataset(mixed, "fixed_width", columns)).column(
+        "amount"
+    ).to_pylist() == [Decimal("0.01"), Decimal("1.50")]
+
+
+def test_csv_columns_without_a_datatype_are_strings_in_every_chunk(tmp_path):
+    path = tmp_path / "orders.csv"
+    rows = [f"{n},{n * 10}" for n in range(20)] + ["20,unknown"]
+    path.write_text("id,amount\n" + "\n".join(rows) + "\n")
+    columns = [{"name": "id", "datatype": "INT"}, {"name": "amount"}]
+    table = _read(path, _dataset(tmp_path, "csv", columns))
+    assert table.schema.field("id").type == pa.int32()
+    assert table.schema.field("amount").type == pa.string()
+    assert table.column("id").to_pylist() == list(range(21))
+    assert table.column("amount").to_pylist()[-2:] == ["190", "unknown"]
+
+
+def test_csv_chunk_which_does_not_match_the_datatype_fails(tmp_path):
+    path = tmp_path / "orders.csv"
+    path.write_text("id\n" + "\n".join(["1"] * 30 + ["x"]) + "\n")
+    columns = [{"name": "id", "datatype": "INT"}]
+    with pytest.raises(exc.PorterException, match="datatype"):
+        _read(path, _dataset(tmp_path, "csv", columns))
+
+
+def test_chunk_size_is_capped():
+    with pytest.raises(ValidationError):
+        FileArgs(chunk_size=2**31)
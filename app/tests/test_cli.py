@@ -0,0 +1,15 @@
+from typer.testing import CliRunner
+
+from src.cli.cli import app
+
+
+def test_lazy_sub_commands_are_listed_and_run_as_groups():
+    runner = CliRunner()
+    result = runner.invoke(app, ["--help"])
+    assert result.exit_code == 0
+    assert "transform" in result.output and "govern" in result.output
+
+    result = runner.invoke(app, ["transform", "--help"])
+    assert result.exit_code == 0
+    # only the top level command has the completion options
+    assert "--install-completion" not in result.output
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+from pydantic import BaseModel
+
+from src.common import config
+
+
+class _Job(BaseModel):
+    name: str
+    sql_path: str
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PORTER_CONFIG_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("PORTER_CONFIG_CACHE", raising=False)
+    return tmp_path / "cache"
+
+
+def test_cached_config_is_invalidated_when_a_referenced_file_changes(
+    tmp_path, cache_dir
+):
+    sql_file = tmp_path / "job.sql"
+    sql_file.write_text("SELECT 1")
+    config_file = tmp_path / "job.yaml"
+    config_file.write_text(f"name: job\nsql_path: {sql_file}\n")
+
+    first = config.read_config_file(str(config_file), _Job)
+    assert config.referenced_files(first) == [sql_file.resolve()]
+    assert len(list(cache_dir.glob("*.pickle"))) == 1
+    assert config.read_config_file(str(config_file), _Job) == first
+
+    cache_file = next(cache_dir.glob("*.pickle"))
+    sql_file.write_text("SELECT 2")
+    assert config._load_cached(cache_file) is None
+
+
+def test_code_fingerprint_covers_the_enums(tmp_path, monkeypatch):
+    models, enums = tmp_path / "models", tmp_path / "enums"
+    for directory in (models, enums):
+        directory.mkdir()
+        (directory / "module.py").write_text("A = 1\n")
+    monkeypatch.setattr(config, "_MODEL_DIRS", (models, enums))
+    before = config._code_fingerprint()
+
+    (enums / "module.py").write_text("A = 1\nB = 2\n")
+    os.utime(enums / "module.py", ns=(0, 0))
+    assert config._code_fingerprint() != before
+
+
+def test_code_fingerprint_includes_the_enums_of_porter():
+    assert {directory.name for directory in config._MODEL_DIRS} == {"models", "enums"}
+    assert all(directory.is_dir() for directory in config._MODEL_DIRS)
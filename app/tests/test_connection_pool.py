@@ -0,0 +1,45 @@
+import pytest
+
+from src.common import exceptions as exc
+from src.sources.connection_pool import ConnectionPool
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, DuckDBSourceConfig
+
+
+class _CountingSource(DuckDBSource):
+    disconnects = 0
+
+    def disconnect(self, **kwargs):
+        type(self).disconnects += 1
+        super().disconnect(**kwargs)
+
+
+@pytest.fixture
+def pool():
+    _CountingSource.disconnects = 0
+    pool = ConnectionPool()
+    pool.register("duck", _CountingSource(DuckDBSourceConfig(name="duck")))
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused(pool):
+    with pool.acquire("duck") as first:
+        pass
+    with pool.acquire("duck") as second:
+        assert second is first
+    assert pool.stats("duck") == {"open": 1, "idle": 1, "in_use": 0, "max_size": 4}
+
+
+def test_connection_in_use_is_closed_when_returned_to_a_closed_pool(pool):
+    with pool.acquire("duck"):
+        pool.close()
+        assert _CountingSource.disconnects == 0
+    assert _CountingSource.disconnects == 1
+    assert pool.stats("duck")["open"] == 0
+
+
+def test_closed_pool_rejects_acquire(pool):
+    pool.close()
+    with pytest.raises(exc.PorterException):
+        with pool.acquire("duck"):
+            pass
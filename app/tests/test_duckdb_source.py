@@ -0,0 +1,64 @@
+import threading
+
+import pyarrow as pa
+import pytest
+
+from src.sources.database.base import DatabaseSource
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, DuckDBSourceConfig
+
+
+@pytest.fixture
+def source():
+    source = DuckDBSource(DuckDBSourceConfig(name="target"))
+    yield source
+    source.disconnect()
+
+
+def test_concurrent_bulk_loads_through_the_same_source(source):
+    batches = {
+        name: [
+            pa.record_batch({"id": list(range(i * 100, (i + 1) * 100))})
+            for i in range(30)
+        ]
+        for name in ("a", "b")
+    }
+    for name, table_batches in batches.items():
+        source.create_table_if_missing(name, table_batches[0].schema)
+    errors = []
+
+    def load(name):
+        try:
+            for batch in batches[name]:
+                source.bulk_load(name, batch)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load, args=(name,)) for name in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    for name in batches:
+        assert source.fetch_one(f"SELECT COUNT(*), COUNT(DISTINCT id) FROM {name}") == (
+            3000,
+            3000,
+        )
+
+
+class _RecordingSource(DatabaseSource):
+    def __init__(self):
+        self.statements = []
+
+    def read_query(self, query, values_to_bind=None, **kwargs):
+        raise NotImplementedError
+
+    def execute(self, query, values_to_bind=None, **kwargs):
+        self.statements.append(query)
+
+
+def test_default_bulk_load_quotes_the_column_names():
+    source = _RecordingSource()
+    source.bulk_load("t", pa.record_batch({"order": [1], 'we"ird': [2]}))
+    assert source.statements[0].startswith('INSERT INTO t ("order", "we""ird") VALUES')
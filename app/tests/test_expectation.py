@@ -0,0 +1,90 @@
+import pyarrow as pa
+import pytest
+
+from src.common import exceptions as exc
+from src.validation.expectation import CompiledExpectation, evaluate_expectation
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "__import__('os').system('true')",
+        "source_result.__class__",
+        "().__class__.__bases__[0].__subclasses__()",
+        "_private == 1",
+        "[x for x in source_result]",
+        "{x: 1 for x in (1, 2)}",
+        "any(x > 0 for x in source_result)",
+        "(lambda: 1)() == 1",
+        "source_result ** 2 > 0",
+        "10 ** 10 ** 10",
+        "source_result[0] == 1",
+        "open('/etc/passwd')",
+        "len(source_result, key=1)",
+        "source_result is 1",
+        "(x := 1)",
+        "f'{source_result}'",
+    ],
+)
+def test_expressions_outside_the_grammar_are_rejected(expression):
+    with pytest.raises(exc.PorterException):
+        CompiledExpectation(expression)
+
+
+def test_syntax_errors_are_reported():
+    with pytest.raises(exc.PorterException):
+        CompiledExpectation("source_result ==")
+
+
+def test_arithmetic_is_only_allowed_on_numbers():
+    with pytest.raises(exc.PorterException):
+        CompiledExpectation("source_result * 10 > 1").evaluate_value("a")
+
+
+@pytest.mark.parametrize(
+    "expression, value, expected",
+    [
+        ("source_result == 0", 0, True),
+        ("source_result == 0", 3, False),
+        ("source_result in (1, 2)", 2, True),
+        ("source_result not in [1, 2]", 2, False),
+        ("0 < source_result <= 10", 10, True),
+        ("0 < source_result <= 10", 11, False),
+        ("source_result is None or source_result > 0", None, True),
+        ("not source_result", 0, True),
+        ("abs(source_result - 10) / 10 < 0.05", 10.2, True),
+        ("round(source_result) == -3", -3.2, True),
+        ("max(source_result, 5) == 5", 2, True),
+        ("source_result > 0", None, False),
+        ("source_result <= 0", None, False),
+        ("0 <= source_result < 10", None, False),
+        ("source_result != 0", None, True),
+    ],
+)
+def test_single_value_expectations(expression, value, expected):
+    assert CompiledExpectation(expression).evaluate_value(value) is expected
+
+
+@pytest.mark.parametrize(
+    "expression, value",
+    [("-'a'", None), ("sum(source_result) > 0", 5), ("len(source_result) > 0", 5)],
+)
+def test_errors_while_evaluating_are_porter_exceptions(expression, value):
+    with pytest.raises(exc.PorterException, match="can't be evaluated"):
+        CompiledExpectation(expression).evaluate_value(value)
+
+
+def test_result_with_rows_is_evaluated_on_every_row():
+    result = pa.table({"amount": [1, 5, 10], "status": ["new", "paid", "paid"]})
+    assert evaluate_expectation("amount > 0 and status in ('new', 'paid')", result)
+    assert not evaluate_expectation("source_result > 1", result)
+    assert evaluate_expectation("sum(amount) == 16", result)
+    with_null = pa.table({"amount": [1, None]})
+    assert not evaluate_expectation("amount > 0", with_null)
+    assert evaluate_expectation("amount is None or amount > 0", with_null)
+
+
+def test_without_expectation_the_result_has_to_be_empty_or_falsy():
+    assert evaluate_expectation(None, pa.table({"count": [0]}))
+    assert not evaluate_expectation(None, pa.table({"count": [2]}))
+    assert evaluate_expectation(None, pa.table({"id": pa.array([], pa.int64())}))
@@ -0,0 +1,64 @@
+import pytest
+
+from src.common import exceptions as exc
+from src.execution.incremental import (
+    apply_watermark,
+    capture_watermark,
+    commit_watermark,
+)
+from src.metadata.store import MetadataStore
+from src.models.dataset.table import IncrementalConfig, TableDataset
+from src.models.metadata import MetadataStoreConfig
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, DuckDBSourceConfig
+
+
+@pytest.fixture
+def engine():
+    engine = DuckDBSource(DuckDBSourceConfig(name="duck_internal"))
+    yield engine
+    engine.disconnect()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MetadataStore(MetadataStoreConfig(url=f"sqlite:///{tmp_path}/state.db"))
+
+
+def _dataset(**incremental):
+    return TableDataset.model_validate(
+        {
+            "name": "orders",
+            "table": "orders",
+            "columns": [
+                {"name": "id"},
+                {"name": "updated_at", "target_name": "Last Update"},
+            ],
+            "incremental": {"watermark_column": "updated_at", **incremental},
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "column", ["GREATEST(created_at, updated_at)", "updated_at + 1", "t.updated_at"]
+)
+def test_expressions_are_rejected_as_watermark_column(column):
+    with pytest.raises(exc.PorterException):
+        IncrementalConfig(watermark_column=column)
+
+
+def test_watermark_is_captured_from_the_renamed_column(engine, store):
+    dataset = _dataset()
+    engine.execute('CREATE TABLE orders (id INTEGER, "Last Update" INTEGER)')
+    engine.execute("INSERT INTO orders VALUES (1, 10), (2, 30), (3, 20)")
+
+    watermark = capture_watermark(engine, dataset)
+    assert watermark == 30
+
+    commit_watermark(store, "pipeline", dataset, watermark)
+    query = apply_watermark(dataset, store, "pipeline")
+    assert query.values_to_bind["porter_watermark"] == 30
+
+
+def test_metadata_store_url_is_required():
+    with pytest.raises(ValueError):
+        MetadataStoreConfig()
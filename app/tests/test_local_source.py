@@ -0,0 +1,59 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.enums.common import Engine
+from src.models.dataset.file import FileDataset
+from src.models.source import SourceConfig
+from src.sources.file.local.local_source import FileSource
+
+
+@pytest.fixture
+def files(tmp_path):
+    for idx in range(3):
+        table = pa.table({"id": [idx * 10 + n for n in range(10)], "name": ["x"] * 10})
+        pq.write_table(table, tmp_path / f"part_{idx}.parquet")
+    return tmp_path
+
+
+def _dataset(files, **fields):
+    return FileDataset.model_validate(
+        {"name": "parts", "file_path": str(files), "file_type": "parquet", **fields}
+    )
+
+
+def test_files_are_read_with_pandas_unless_the_engine_is_set(files):
+    assert FileSource.engine_for(_dataset(files)) == Engine.pandas
+    assert FileSource.engine_for(_dataset(files, engine="duckdb")) == Engine.duckdb
+
+
+@pytest.mark.parametrize("engine", ["pandas", "pyarrow", "duckdb"])
+def test_all_engines_read_the_same_rows(files, engine):
+    source = FileSource(SourceConfig(name="local"))
+    table = source.read(_dataset(files, engine=engine)).read_all()
+    assert sorted(table.column("id").to_pylist()) == list(range(30))
+
+
+def test_schema_is_read_from_the_footers_of_the_files(files):
+    source = FileSource(SourceConfig(name="local"))
+    schema = source.read_schema(_dataset(files))
+    assert schema == pa.schema([("id", pa.int64()), ("name", pa.string())])
+
+
+def test_schema_of_files_with_conflicting_types_is_not_merged(files):
+    pq.write_table(pa.table({"id": ["a"]}), files / "part_3.parquet")
+    source = FileSource(SourceConfig(name="local"))
+    with pytest.raises((pa.ArrowInvalid, pa.ArrowTypeError)):
+        source.read_schema(_dataset(files))
+
+
+def test_schema_of_csv_files_is_read_from_their_header(tmp_path):
+    (tmp_path / "orders.csv").write_text("id,amount\n1,2.5\n")
+    source = FileSource(SourceConfig(name="local"))
+    schema = source.read_schema(_dataset(tmp_path, file_type="csv"))
+    assert schema == pa.schema([("id", pa.string()), ("amount", pa.string())])
+
+
+def test_schema_of_a_missing_dataset_is_none(tmp_path):
+    source = FileSource(SourceConfig(name="local"))
+    assert source.read_schema(_dataset(tmp_path / "missing")) is None
@@ -0,0 +1,145 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.execution.manifest import apply_manifest, commit_manifest, diff_files
+from src.metadata.store import ManifestEntry, MetadataStore
+from src.models.dataset.file import FileDataset
+from src.models.metadata import MetadataStoreConfig
+from src.models.source import SourceConfig
+from src.sources.file.local.local_source import FileSource
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MetadataStore(MetadataStoreConfig(url=f"sqlite:///{tmp_path}/state.db"))
+
+
+@pytest.fixture
+def files(tmp_path):
+    path = tmp_path / "orders"
+    path.mkdir()
+    for idx in range(3):
+        pq.write_table(pa.table({"id": [idx]}), path / f"part_{idx}.parquet")
+    return path
+
+
+def _dataset(files, **manifest):
+    return FileDataset.model_validate(
+        {
+            "name": "orders",
+            "file_path": str(files),
+            "file_type": "parquet",
+            "manifest": manifest,
+        }
+    )
+
+
+def _touch(path, seconds=10):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+def _source():
+    # a new source for each run, the files selected by a run are kept until the next listing
+    return FileSource(SourceConfig(name="local"))
+
+
+def _ids(source, dataset):
+    return sorted(source.read(dataset).read_all().column("id").to_pylist())
+
+
+def test_files_are_diffed_on_size_and_modification_time():
+    manifest = {
+        "a": ManifestEntry("a", 10, 1),
+        "b": ManifestEntry("b", 10, 1),
+        "c": ManifestEntry("c", 10, 1),
+    }
+    entries = [
+        ManifestEntry("a", 10, 1),
+        ManifestEntry("b", 12, 1),
+        ManifestEntry("c", 10, 2),
+        ManifestEntry("d", 10, 1),
+    ]
+    changes = diff_files(entries, manifest)
+    assert changes.new == [ManifestEntry("d", 10, 1)]
+    assert changes.changed == [ManifestEntry("b", 12, 1), ManifestEntry("c", 10, 2)]
+    assert changes.touched == []
+    assert changes.unchanged == 1
+
+
+def test_files_touched_with_the_same_content_are_not_ingested_again(files):
+    paths = sorted(str(path) for path in files.iterdir())
+    first = diff_files(
+        [ManifestEntry(p, os.path.getsize(p), 1) for p in paths], {}, checksum=True
+    )
+    assert len(first.new) == 3 and all(entry.checksum for entry in first.new)
+    manifest = {entry.path: entry for entry in first.new}
+
+    pq.write_table(pa.table({"id": [10, 11]}), paths[1])
+    entries = [ManifestEntry(p, os.path.getsize(p), 2) for p in paths]
+    changes = diff_files(entries, manifest, checksum=True)
+    assert [entry.path for entry in changes.changed] == [paths[1]]
+    assert [entry.path for entry in changes.touched] == [paths[0], paths[2]]
+    assert changes.touched[0].checksum == manifest[paths[0]].checksum
+    assert changes.to_ingest == changes.changed
+
+
+def test_manifest_is_saved_and_replaced(store):
+    assert store.get_file_manifest("daily", "orders") == {}
+    store.save_file_manifest(
+        "daily", "orders", [ManifestEntry("a", 10, 1), ManifestEntry("b", 10, 1, "x")]
+    )
+    store.save_file_manifest(
+        "daily", "orders", [ManifestEntry("c", 5, 1)], [ManifestEntry("a", 12, 2)]
+    )
+    assert store.get_file_manifest("daily", "orders") == {
+        "a": ManifestEntry("a", 12, 2),
+        "b": ManifestEntry("b", 10, 1, "x"),
+        "c": ManifestEntry("c", 5, 1),
+    }
+    assert store.get_file_manifest("hourly", "orders") == {}
+
+
+def test_only_new_and_changed_files_are_read(files, store):
+    source = _source()
+    changes = apply_manifest(source, _dataset(files), store, "daily")
+    assert len(changes.new) == 3
+    assert _ids(source, _dataset(files)) == [0, 1, 2]
+    commit_manifest(store, "daily", _dataset(files), changes)
+
+    changes = apply_manifest(_source(), _dataset(files), store, "daily")
+    assert changes.to_ingest == [] and changes.unchanged == 3
+
+    pq.write_table(pa.table({"id": [3]}), files / "part_3.parquet")
+    pq.write_table(pa.table({"id": [10, 11]}), files / "part_1.parquet")
+    source = _source()
+    changes = apply_manifest(source, _dataset(files), store, "daily")
+    assert len(changes.new) == 1 and len(changes.changed) == 1
+    assert _ids(source, _dataset(files)) == [3, 10, 11]
+
+
+def test_touched_files_are_recorded_without_being_read(files, store):
+    dataset = _dataset(files, checksum=True)
+    commit_manifest(
+        store, "daily", dataset, apply_manifest(_source(), dataset, store, "daily")
+    )
+
+    _touch(files / "part_0.parquet")
+    changes = apply_manifest(_source(), dataset, store, "daily")
+    assert changes.to_ingest == [] and len(changes.touched) == 1
+    commit_manifest(store, "daily", dataset, changes)
+
+    manifest = store.get_file_manifest("daily", "orders")
+    path = str(files / "part_0.parquet")
+    assert manifest[path].mtime_ns == os.stat(path).st_mtime_ns
+    assert apply_manifest(_source(), dataset, store, "daily").unchanged == 3
+
+
+def test_datasets_without_a_manifest_read_all_their_files(files, store):
+    dataset = _dataset(files).model_copy(update={"manifest": None})
+    assert apply_manifest(_source(), dataset, store, "daily") is None
+    commit_manifest(store, "daily", dataset, None)
+    assert store.get_file_manifest("daily", "orders") == {}
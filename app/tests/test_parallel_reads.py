@@ -0,0 +1,62 @@
+import os
+import time
+
+import pytest
+
+from src.common import exceptions as exc
+from src.enums.common import Status
+from src.sources.database.parallel_reads import ParallelExecutor, run_in_parallel
+
+
+def _double(arg, retry_cnt):
+    return arg * 2
+
+
+def _die_on_first_attempt(arg, retry_cnt):
+    if arg == "die" and retry_cnt == 0:
+        # kills the worker, which breaks the whole pool
+        os._exit(1)
+    return arg
+
+
+def test_run_in_parallel_keeps_the_order_of_the_args():
+    results = run_in_parallel([1, 2, 3], _double, num_workers=2)
+    assert [r.result for r in results] == [2, 4, 6]
+    assert all(r.status == Status.success for r in results)
+
+
+def test_dead_worker_is_retried_on_a_new_pool():
+    with ParallelExecutor(num_workers=2, backoff_seconds=0.01) as executor:
+        results = executor.run(["die", "ok"], _die_on_first_attempt)
+    assert [r.result for r in results] == ["die", "ok"]
+    assert results[0].attempts == 2
+
+
+def test_retry_settings_are_rejected_along_with_an_executor():
+    with ParallelExecutor(num_workers=1) as executor:
+        with pytest.raises(exc.PorterException):
+            run_in_parallel([1], _double, max_retries=5, executor=executor)
+        with pytest.raises(exc.PorterException):
+            run_in_parallel([1], _double, backoff_seconds=2, executor=executor)
+        assert run_in_parallel([1], _double, executor=executor)[0].result == 2
+
+
+def _poison(arg, retry_cnt):
+    if arg == "poison":
+        os._exit(1)
+    # keeps the other tasks running when the poison task kills its worker
+    time.sleep(0.2)
+    return arg
+
+
+def test_poison_task_does_not_use_up_the_attempts_of_the_others():
+    args = ["a", "poison", "b", "c"]
+    with ParallelExecutor(num_workers=3, backoff_seconds=0.01) as executor:
+        results = executor.run(args, _poison)
+    assert [r.status for r in results] == [
+        Status.success,
+        Status.failure,
+        Status.success,
+        Status.success,
+    ]
+    assert [r.attempts for r in results] == [1, 3, 1, 1]
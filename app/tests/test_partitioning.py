@@ -0,0 +1,40 @@
+import pytest
+
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, DuckDBSourceConfig
+
+
+@pytest.fixture
+def source():
+    source = DuckDBSource(DuckDBSourceConfig(name="source"))
+    # 60% of the rows have the same key
+    source.execute(
+        "CREATE TABLE skewed AS SELECT CASE WHEN i % 10 < 6 THEN 1 ELSE i END AS k FROM range(200000) r(i)"
+    )
+    yield source
+    source.disconnect()
+
+
+def test_exact_split_points(source):
+    points = source.fetch_split_points("SELECT * FROM skewed", "k", 4)
+    assert points[0] == 1 and points[-1] == 199999
+    assert points == sorted(set(points))
+
+
+def test_sampled_split_points_keep_the_true_bounds(source, monkeypatch):
+    source.split_sample_rows = 1000
+    sampled = []
+    sample_query = source.sample_query
+
+    def record(query, fraction):
+        sampled.append(fraction)
+        return sample_query(query, fraction)
+
+    monkeypatch.setattr(source, "sample_query", record)
+    points = source.fetch_split_points("SELECT * FROM skewed", "k", 4)
+    assert sampled == [pytest.approx(1000 / 200000)]
+    assert points[0] == 1 and points[-1] == 199999
+    assert len(points) > 2
+
+
+def test_empty_query_has_no_split_points(source):
+    assert source.fetch_split_points("SELECT * FROM skewed WHERE k < 0", "k", 4) == []
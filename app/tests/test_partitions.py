@@ -0,0 +1,173 @@
+import datetime
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.execution.incremental import apply_watermark
+from src.metadata.store import MetadataStore
+from src.models.dataset.file import FileDataset
+from src.models.metadata import MetadataStoreConfig
+from src.models.source import SourceConfig
+from src.sources.file.local.local_source import FileSource
+from src.sources.file.partitions import (
+    HIVE_DEFAULT_PARTITION,
+    coerce_filters,
+    infer_partition_schema,
+    parse_partition,
+    partition_matches,
+)
+
+DAYS = ["2024-01-30", "2024-01-31", "2024-02-01"]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """dt=<day>/region=<1|2>/part.parquet, and a `_temporary` directory which is not part of the dataset."""
+    root = tmp_path / "sales"
+    for day in DAYS:
+        for region in (1, 2):
+            directory = root / f"dt={day}" / f"region={region}"
+            directory.mkdir(parents=True)
+            table = pa.table({"amount": [float(region)], "day": [day]})
+            pq.write_table(table, directory / "part.parquet")
+    (root / "_temporary").mkdir()
+    pq.write_table(pa.table({"amount": [0.0]}), root / "_temporary" / "part.parquet")
+    return root
+
+
+@pytest.fixture
+def scanned(monkeypatch):
+    """Directories listed by the source."""
+    directories = []
+    scandir = os.scandir
+
+    def _scandir(path):
+        directories.append(os.path.basename(path))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", _scandir)
+    return directories
+
+
+def _dataset(path, **fields):
+    return FileDataset.model_validate(
+        {
+            "name": "sales",
+            "file_path": str(path),
+            "file_type": "parquet",
+            "is_partitioned": True,
+            **fields,
+        }
+    )
+
+
+def test_partition_values_are_typed():
+    assert parse_partition("region=12") == ("region", 12)
+    assert parse_partition("rate=0.5") == ("rate", 0.5)
+    assert parse_partition("dt=2024-01-31") == ("dt", datetime.date(2024, 1, 31))
+    assert parse_partition("dt=2024-02-30") == ("dt", "2024-02-30")
+    assert parse_partition("city=New%20York") == ("city", "New York")
+    assert parse_partition(f"region={HIVE_DEFAULT_PARTITION}") == ("region", None)
+    assert parse_partition("2024") is None
+    assert parse_partition("=1") is None
+
+
+def test_partition_schema_is_inferred_from_all_the_values():
+    schema = infer_partition_schema(
+        [
+            {"dt": datetime.date(2024, 1, 31), "region": 1, "rate": 1, "code": 1},
+            {"dt": None, "region": 2, "rate": 0.5, "code": "A1"},
+        ]
+    )
+    assert schema == pa.schema(
+        [
+            ("dt", pa.date32()),
+            ("region", pa.int64()),
+            ("rate", pa.float64()),
+            ("code", pa.string()),
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "filters, matches",
+    [
+        (None, True),
+        ([("dt", ">=", "2024-01-31")], True),
+        ([("dt", ">", "2024-01-31")], False),
+        ([("dt", ">", datetime.datetime(2024, 1, 30, 12))], True),
+        ([("region", "=", "1")], True),
+        ([("region", "in", [2, 3])], False),
+        ([("region", "not in", [2, 3])], True),
+        ([("region", "=", None)], False),
+        ([("amount", ">", 100)], True),
+        ([("region", "<", "abc")], True),
+    ],
+)
+def test_partitions_which_cant_match_the_filters_are_pruned(filters, matches):
+    partition = {"dt": datetime.date(2024, 1, 31), "region": 1}
+    assert partition_matches(partition, filters) is matches
+
+
+def test_filters_are_coerced_to_the_types_of_the_columns():
+    schema = pa.schema(
+        [("dt", pa.date32()), ("region", pa.int64()), ("name", pa.string())]
+    )
+    filters = [
+        ("dt", ">=", "2024-01-31T10:00:00"),
+        ("region", "in", ["1", 2]),
+        ("name", "=", 5),
+        ("other", "=", "1"),
+    ]
+    assert coerce_filters(filters, schema) == [
+        ("dt", ">=", datetime.date(2024, 1, 31)),
+        ("region", "in", [1, 2]),
+        ("name", "=", "5"),
+        ("other", "=", "1"),
+    ]
+    assert coerce_filters(None, schema) is None
+
+
+def test_partitioned_files_are_listed_with_typed_keys(tree):
+    source = FileSource(SourceConfig(name="local"))
+    dataset = _dataset(tree)
+    assert len(source.list_files(dataset)) == 6
+    assert source.partitioning(dataset).schema == pa.schema(
+        [("dt", pa.date32()), ("region", pa.int64())]
+    )
+
+
+def test_pruned_directories_are_never_listed(tree, scanned):
+    source = FileSource(SourceConfig(name="local"))
+    dataset = _dataset(tree, filters=[("dt", ">", "2024-01-31"), ("region", "=", 2)])
+    paths = source.list_files(dataset)
+    assert paths == [str(tree / "dt=2024-02-01" / "region=2" / "part.parquet")]
+    assert "dt=2024-01-30" not in scanned and "dt=2024-01-31" not in scanned
+    assert "region=1" not in scanned and "_temporary" not in scanned
+
+
+def test_date_watermark_saved_as_a_string_still_prunes(tmp_path, tree, scanned):
+    store = MetadataStore(MetadataStoreConfig(url=f"sqlite:///{tmp_path}/state.db"))
+    store.set_watermark("daily", "sales", "dt", "2024-01-30")
+    dataset = apply_watermark(
+        _dataset(tree, incremental={"watermark_column": "dt"}), store, "daily"
+    )
+    assert dataset.filters == [("dt", ">", "2024-01-30")]
+    source = FileSource(SourceConfig(name="local"))
+    assert len(source.list_files(dataset)) == 4
+    assert "dt=2024-01-30" not in scanned
+
+
+@pytest.mark.parametrize("engine", ["pandas", "pyarrow", "duckdb"])
+def test_partition_keys_are_read_as_typed_columns(tree, engine):
+    source = FileSource(SourceConfig(name="local"))
+    dataset = _dataset(tree, engine=engine, filters=[("dt", ">=", "2024-01-31")])
+    table = source.read(dataset).read_all()
+    assert table.schema.field("dt").type == pa.date32()
+    assert table.schema.field("region").type == pa.int64()
+    rows = sorted(
+        zip(table.column("day").to_pylist(), table.column("region").to_pylist())
+    )
+    assert rows == [(day, region) for day in DAYS[1:] for region in (1, 2)]
@@ -0,0 +1,239 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pyarrow as pa
+import pytest
+
+from src.common import exceptions as exc
+from src.models.dataset.api import ApiDataset
+from src.sources.api.rest import client
+from src.sources.api.rest.rest_source import RestApiSource, RestApiSourceConfig
+
+RECORDS = [{"id": idx, "name": f"record {idx}"} for idx in range(250)]
+
+
+class _Api(BaseHTTPRequestHandler):
+    """Paginated API over RECORDS, `server.failures` lists the responses sent before the real ones."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        content = json.dumps(body if body is not None else {}).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.tokens_issued += 1
+            token = f"token-{self.server.tokens_issued}"
+        self._send(200, {"access_token": token, "expires_in": 3600})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        with self.server.lock:
+            self.server.requests.append((url.path, query))
+            failure = self.server.failures.pop(0) if self.server.failures else None
+        if self.headers.get("Authorization") in self.server.revoked:
+            return self._send(401)
+        if failure is not None:
+            return self._send(*failure)
+
+        limit = min(int(query.get("limit", 100)), self.server.max_page_size)
+        if url.path == "/offset":
+            offset = int(query["offset"])
+            return self._send(200, {"data": RECORDS[offset : offset + limit]})
+        if url.path == "/cursor":
+            records = self.server.records
+            start = int(query.get("cursor", 0))
+            end = start + limit
+            return self._send(
+                200,
+                {
+                    "data": records[start:end],
+                    "meta": {"next": str(end) if end < len(records) else None},
+                },
+            )
+        if url.path == "/link":
+            page = int(query.get("page", 0))
+            headers = {}
+            if (page + 1) * 100 < len(RECORDS):
+                headers["Link"] = (
+                    f'<{self.server.url}/link?page={page + 1}>; rel="next"'
+                )
+            return self._send(200, RECORDS[page * 100 : (page + 1) * 100], headers)
+        self._send(404)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Api)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.lock = threading.Lock()
+    server.requests, server.failures, server.revoked = [], [], set()
+    server.tokens_issued = 0
+    server.max_page_size = 1000
+    server.records = RECORDS
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    client._tokens.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+    client._tokens.clear()
+
+
+def _read(server, path, pagination, **fields):
+    source = RestApiSource(
+        RestApiSourceConfig(
+            name="api",
+            args={"client_id": "porter", "client_secret": "secret", "backoff": 0.01},
+        )
+    )
+    dataset = ApiDataset(
+        name="records",
+        url=server.url + path,
+        pagination=pagination,
+        **{"records_path": "data", **fields},
+    )
+    try:
+        return source.read(dataset).read_all()
+    finally:
+        source.disconnect()
+
+
+def _ids(table):
+    return table.column("id").to_pylist()
+
+
+def test_offset_pagination(server):
+    table = _read(
+        server,
+        "/offset",
+        {"type": "offset", "page_size": 30},
+        max_concurrent_requests=3,
+    )
+    assert _ids(table) == list(range(250))
+
+
+def test_offset_pagination_needs_the_limit_param():
+    with pytest.raises(exc.PorterException):
+        ApiDataset(
+            name="records",
+            url="http://localhost/offset",
+            pagination={"type": "offset", "limit_param": None},
+        )
+
+
+def test_offset_pagination_fails_when_the_api_caps_the_page_size(server):
+    server.max_page_size = 20
+    with pytest.raises(exc.PorterException, match="max page size"):
+        _read(server, "/offset", {"type": "offset", "page_size": 30})
+
+
+def test_cursor_pagination(server):
+    table = _read(
+        server,
+        "/cursor",
+        {"type": "cursor", "page_size": 40, "cursor_path": "meta.next"},
+    )
+    assert _ids(table) == list(range(250))
+    assert [query.get("cursor") for _, query in server.requests[:3]] == [
+        None,
+        "40",
+        "80",
+    ]
+
+
+def test_keys_null_on_the_first_page_get_the_type_of_the_next_pages(server):
+    server.records = [{"id": 1, "email": None}, {"id": 2, "email": None}] + [
+        {"id": 3, "email": "c@example.com", "score": 1.5}
+    ]
+    table = _read(
+        server,
+        "/cursor",
+        {"type": "cursor", "page_size": 2, "cursor_path": "meta.next"},
+    )
+    assert table.schema.field("email").type == pa.string()
+    assert table.column("email").to_pylist() == [None, None, "c@example.com"]
+    assert table.column("score").to_pylist() == [None, None, 1.5]
+
+
+def test_new_keys_after_the_first_batch_fail(server):
+    server.records = [{"id": 1, "b": 2}, {"id": 2, "b": 3}, {"id": 3, "c": 5}]
+    with pytest.raises(exc.PorterException, match=r"\['c'\]"):
+        _read(
+            server,
+            "/cursor",
+            {"type": "cursor", "page_size": 2, "cursor_path": "meta.next"},
+        )
+
+
+def test_link_header_pagination(server):
+    table = _read(
+        server,
+        "/link",
+        {"type": "link_header", "limit_param": None},
+        records_path=None,
+    )
+    assert _ids(table) == list(range(250))
+    assert len(server.requests) == 3
+
+
+def test_revoked_token_is_refreshed_once(server):
+    server.revoked.add("Bearer token-1")
+    table = _read(
+        server,
+        "/cursor",
+        {"type": "cursor", "cursor_path": "meta.next"},
+        auth_url=server.url + "/token",
+    )
+    assert _ids(table) == list(range(250))
+    assert server.tokens_issued == 2
+
+
+def test_retry_after_is_honoured_on_429(server):
+    server.failures.append((429, {}, {"Retry-After": "0.5"}))
+    started_at = time.monotonic()
+    table = _read(server, "/cursor", {"type": "cursor", "cursor_path": "meta.next"})
+    assert time.monotonic() - started_at >= 0.5
+    assert _ids(table) == list(range(250))
+    # the throttled request is sent again
+    assert [query.get("cursor") for _, query in server.requests[:2]] == [None, None]
+
+
+def test_server_errors_are_retried(server):
+    server.failures += [(500,), (503,), (502,)]
+    table = _read(server, "/cursor", {"type": "cursor", "cursor_path": "meta.next"})
+    assert _ids(table) == list(range(250))
+    assert len(server.requests) == 3 + 3
+
+
+def test_server_errors_fail_once_retries_run_out(server):
+    server.failures += [(500,)] * 10
+    with pytest.raises(exc.PorterException, match="500"):
+        _read(server, "/cursor", {"type": "cursor", "cursor_path": "meta.next"})
+
+
+def test_unresolved_secrets_are_never_sent():
+    config = RestApiSourceConfig(
+        name="api",
+        args={"client_id": "porter", "client_secret": {"secret": "api/client_secret"}},
+    )
+    with pytest.raises(exc.PorterException, match="not resolved"):
+        RestApiSource(config).args
+
+    resolved = config.with_secrets({"api/client_secret": "s3cr3t"})
+    assert RestApiSource(resolved).args.client_secret == "s3cr3t"
@@ -0,0 +1,46 @@
+import copy
+import threading
+import time
+
+from src.execution.scheduler import DatasetScheduler, ExtractionTask
+from src.models.dataset.base import Dataset
+from src.sources.connection_pool import ConnectionPool
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, DuckDBSourceConfig
+
+
+def _task(name, source_name):
+    return ExtractionTask(dataset=Dataset(name=name), source_name=source_name)
+
+
+def test_source_limits_come_from_the_pool_size_of_the_sources():
+    with ConnectionPool() as pool:
+        pool.register(
+            "small", DuckDBSource(DuckDBSourceConfig(name="small", pool_size=2))
+        )
+        pool.register("large", DuckDBSource(DuckDBSourceConfig(name="large")))
+        scheduler = DatasetScheduler.from_pool(max_concurrent=8, pool=pool)
+    assert scheduler.source_limits == {"small": 2, "large": 4}
+
+    lock = threading.Lock()
+    running, most_running = 0, 0
+
+    def extract(task):
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    scheduler.run([_task(f"t{idx}", "small") for idx in range(6)], extract)
+    assert most_running == 2
+
+
+def test_views_lock_is_not_shared_between_engines():
+    first = DuckDBSource(DuckDBSourceConfig(name="first"))
+    second = DuckDBSource(DuckDBSourceConfig(name="second"))
+    assert first._views_lock is not second._views_lock
+    pooled = copy.copy(first)
+    assert pooled._views_lock is not first._views_lock
+    assert pooled._arrow_views is not first._arrow_views
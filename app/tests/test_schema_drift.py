@@ -0,0 +1,110 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.common import exceptions as exc
+from src.execution.schema_drift import check_schema_drift, fingerprint, schema_fields
+from src.metadata.store import MetadataStore, SchemaFingerprint
+from src.models.dataset.file import FileDataset
+from src.models.metadata import MetadataStoreConfig
+from src.models.source import SourceConfig
+from src.sources.file.local.local_source import FileSource
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MetadataStore(MetadataStoreConfig(url=f"sqlite:///{tmp_path}/state.db"))
+
+
+@pytest.fixture
+def source():
+    return FileSource(SourceConfig(name="local"))
+
+
+def _write(path, table):
+    path.mkdir(exist_ok=True)
+    pq.write_table(table, path / "part.parquet")
+
+
+def _dataset(path, **fields):
+    return FileDataset.model_validate(
+        {"name": "orders", "file_path": str(path), "file_type": "parquet", **fields}
+    )
+
+
+def test_fingerprints_are_saved_and_replaced(store):
+    assert store.get_schema_fingerprint("daily", "orders") is None
+    fields = [("id", "int64", True)]
+    store.set_schema_fingerprint(
+        "daily", "orders", SchemaFingerprint(fingerprint(fields), fields)
+    )
+    fields = [("id", "int64", True), ("amount", "double", True)]
+    store.set_schema_fingerprint(
+        "daily", "orders", SchemaFingerprint(fingerprint(fields), fields)
+    )
+    assert store.get_schema_fingerprint("daily", "orders") == SchemaFingerprint(
+        fingerprint(fields), fields
+    )
+    assert store.get_schema_fingerprint("hourly", "orders") is None
+
+
+def test_fingerprint_depends_on_the_order_of_the_columns():
+    schema = pa.schema([("id", pa.int64()), ("name", pa.string())])
+    reordered = pa.schema([("name", pa.string()), ("id", pa.int64())])
+    assert fingerprint(schema_fields(schema)) != fingerprint(schema_fields(reordered))
+
+
+def test_unchanged_schema_has_no_drift(tmp_path, source, store):
+    _write(tmp_path / "orders", pa.table({"id": [1]}))
+    dataset = _dataset(tmp_path / "orders")
+    assert check_schema_drift(source, dataset, store, "daily") == []
+    saved = store.get_schema_fingerprint("daily", "orders")
+    assert saved.fields == [("id", "int64", True)]
+    assert check_schema_drift(source, dataset, store, "daily") == []
+
+
+def test_changed_schema_is_reported_and_saved(tmp_path, source, store):
+    _write(tmp_path / "orders", pa.table({"id": [1], "amount": [1.5]}))
+    dataset = _dataset(tmp_path / "orders")
+    check_schema_drift(source, dataset, store, "daily")
+    _write(tmp_path / "orders", pa.table({"id": ["1"], "name": ["x"]}))
+    assert check_schema_drift(source, dataset, store, "daily") == [
+        "column amount: removed (was double)",
+        "column id: type changed from int64 to string",
+        "column name: added (string)",
+    ]
+    assert check_schema_drift(source, dataset, store, "daily") == []
+
+
+def test_changed_schema_keeps_failing_on_error(tmp_path, source, store):
+    _write(tmp_path / "orders", pa.table({"id": [1]}))
+    dataset = _dataset(tmp_path / "orders", on_schema_drift="error")
+    check_schema_drift(source, dataset, store, "daily")
+    _write(tmp_path / "orders", pa.table({"id": ["1"]}))
+    for _ in range(2):
+        with pytest.raises(exc.PorterException, match="type changed"):
+            check_schema_drift(source, dataset, store, "daily")
+
+
+def test_missing_declared_column_is_drift_on_the_first_check(tmp_path, source, store):
+    _write(tmp_path / "orders", pa.table({"id": [1]}))
+    dataset = _dataset(
+        tmp_path / "orders", columns=[{"name": "ID"}, {"name": "amount"}]
+    )
+    assert check_schema_drift(source, dataset, store, "daily") == [
+        "column amount: declared in the dataset but missing at the source"
+    ]
+
+
+def test_conflicting_files_are_drift(tmp_path, source, store):
+    _write(tmp_path / "orders", pa.table({"id": [1]}))
+    pq.write_table(pa.table({"id": ["a"]}), tmp_path / "orders" / "late.parquet")
+    changes = check_schema_drift(source, _dataset(tmp_path / "orders"), store, "daily")
+    assert len(changes) == 1 and changes[0].startswith("files have conflicting schemas")
+    assert store.get_schema_fingerprint("daily", "orders") is None
+
+
+def test_schema_drift_is_not_checked_without_a_schema(tmp_path, source, store):
+    (tmp_path / "orders.csv").write_text("1,2.5\n")
+    dataset = _dataset(tmp_path, file_type="csv", args={"header": False})
+    assert check_schema_drift(source, dataset, store, "daily") is None
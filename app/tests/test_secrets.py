@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+from src.common import exceptions as exc
+from typing import ClassVar, Optional, Type
+
+from pydantic import BaseModel
+
+from src.models.pipeline import PorterPipeline
+from src.models.secrets import SecretsBackend
+from src.models.source import SourceConfig
+from src.utilities.secrets import (
+    LocalSecretsFetcher,
+    SecretsCache,
+    SecretsResolver,
+    resolve_secrets,
+)
+
+
+class _ApiArgs(BaseModel):
+    client_id: str
+    client_secret: Optional[str] = None
+    token: Optional[str] = None
+
+
+class _ApiSourceConfig(SourceConfig):
+    args_model: ClassVar[Type[BaseModel]] = _ApiArgs
+
+
+class _CountingFetcher(LocalSecretsFetcher):
+    calls = []
+
+    def fetch_batch(self, secret_names):
+        self.calls.append(sorted(secret_names))
+        return super().fetch_batch(secret_names)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    secrets_file = tmp_path / "secrets.json"
+    secrets_file.write_text(
+        json.dumps(
+            {
+                "api/client_secret": "s3cr3t",
+                "db/creds": {"host": "db.internal", "user": "porter", "port": 5432},
+            }
+        )
+    )
+    return SecretsBackend(
+        name="local", secrets_source="local", args={"path": str(secrets_file)}
+    )
+
+
+def _pipeline(**source):
+    return PorterPipeline.model_validate(
+        {
+            "name": "pipeline",
+            "datasets": [{"name": "orders"}],
+            "source": {"name": "db", **source},
+            "targets": [
+                {"name": "warehouse", "args": {"password": {"secret": "db/creds"}}}
+            ],
+            "metadata": {},
+        }
+    )
+
+
+def test_arg_referencing_a_secret_is_resolved(backend):
+    config = _ApiSourceConfig(
+        name="api",
+        args={"client_id": "porter", "client_secret": {"secret": "api/client_secret"}},
+    )
+    assert config.secret_names() == ["api/client_secret"]
+    # the args are validated once the secrets are resolved
+    assert isinstance(config.args, dict)
+
+    resolved = config.with_secrets(
+        SecretsResolver(backend).prefetch(["api/client_secret"])
+    )
+    assert resolved.secret_names() == []
+    assert isinstance(resolved.args, _ApiArgs)
+    assert resolved.args.client_secret == "s3cr3t"
+    assert resolved.args.client_id == "porter"
+
+
+def test_secrets_of_the_pipeline_are_fetched_at_once(backend):
+    _CountingFetcher.calls = []
+    resolver = SecretsResolver(backend, fetcher=_CountingFetcher(backend))
+    pipeline = _pipeline(
+        secrets="db/creds",
+        args={"user": "admin", "key": {"secret": "api/client_secret"}},
+    )
+
+    resolved = resolve_secrets(pipeline, resolver)
+    assert _CountingFetcher.calls == [["api/client_secret", "db/creds"]]
+    # the original config keeps only the names of the secrets
+    assert pipeline.source.secret_names() == ["db/creds", "api/client_secret"]
+    assert resolved.source.secret_names() == []
+    assert resolved.targets[0].secret_names() == []
+
+
+def test_args_of_the_config_take_precedence_over_the_secret(backend, tmp_path):
+    secrets_file = tmp_path / "api.json"
+    secrets_file.write_text(json.dumps({"api/creds": {"client_id": "a", "token": "t"}}))
+    backend = backend.model_copy(
+        update={"args": backend.args.model_copy(update={"path": secrets_file})}
+    )
+    config = _ApiSourceConfig(name="api", secrets="api/creds", args={"client_id": "b"})
+    resolved = config.with_secrets(SecretsResolver(backend).prefetch(["api/creds"]))
+    assert (resolved.args.client_id, resolved.args.token) == ("b", "t")
+
+
+def test_pipeline_using_secrets_needs_a_backend():
+    with pytest.raises(exc.PorterException):
+        resolve_secrets(_pipeline(secrets="db/creds"))
+
+
+def test_secrets_listed_in_the_backend_are_enforced(backend):
+    backend = backend.model_copy(update={"secrets": ["api/client_secret"]})
+    with pytest.raises(exc.PorterException):
+        resolve_secrets(_pipeline(secrets="db/creds"), SecretsResolver(backend))
+
+
+def test_cache_file_depends_on_where_the_secrets_come_from(
+    backend, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("PORTER_SECRETS_CACHE_DIR", str(tmp_path / "cache"))
+    # the cache is optional, it needs `cryptography`
+    key = pytest.importorskip("cryptography.fernet").Fernet.generate_key()
+    other_file = tmp_path / "other.json"
+    other_file.write_text("{}")
+    same_name = backend.model_copy(
+        update={"args": backend.args.model_copy(update={"path": other_file})}
+    )
+    other_source = SecretsBackend(name="local", secrets_source="aws_sm", args={})
+
+    paths = {
+        SecretsCache(b.model_copy(update={"cache_ttl": 60}), key=key).path
+        for b in (backend, same_name, other_source)
+    }
+    assert len(paths) == 3
+    assert SecretsCache(backend, key=key).path == SecretsCache(backend, key=key).path
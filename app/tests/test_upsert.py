@@ -0,0 +1,60 @@
+import pyarrow as pa
+import pytest
+
+from src.enums.targets import LoadMode, MergeStrategy
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, DuckDBSourceConfig
+
+
+@pytest.fixture
+def target():
+    target = DuckDBSource(DuckDBSourceConfig(name="target"))
+    target.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL)")
+    target.execute("INSERT INTO t VALUES (1, 'a'), (2, 'b')")
+    yield target
+    target.disconnect()
+
+
+def _rows(target):
+    return list(
+        target.read_query("SELECT id, name FROM t ORDER BY id").read_all().to_pylist()
+    )
+
+
+def _delta(*rows):
+    table = pa.table(
+        {"id": [row[0] for row in rows], "name": [row[1] for row in rows]},
+        schema=pa.schema([("id", pa.int32()), ("name", pa.string())]),
+    )
+    return table.to_reader(max_chunksize=1)
+
+
+@pytest.mark.parametrize("strategy", list(MergeStrategy))
+def test_upsert_applies_the_latest_row_of_each_key(target, strategy):
+    target.write(
+        "t",
+        _delta((2, "x"), (3, "c"), (3, "C")),
+        mode=LoadMode.upsert,
+        key_columns=["id"],
+        merge_strategy=strategy,
+    )
+    assert _rows(target) == [
+        {"id": 1, "name": "a"},
+        {"id": 2, "name": "x"},
+        {"id": 3, "name": "C"},
+    ]
+
+
+def test_failed_delete_insert_leaves_the_target_as_it_was(target):
+    with pytest.raises(Exception):
+        # the NULL name fails the INSERT after the DELETE removed the row with id 2
+        target.write(
+            "t",
+            _delta((2, None)),
+            mode=LoadMode.upsert,
+            key_columns=["id"],
+            merge_strategy=MergeStrategy.delete_insert,
+        )
+    assert _rows(target) == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+    assert target.fetch_one(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name LIKE '%porter_stage%'"
+    ) == (0,)
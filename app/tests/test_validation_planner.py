@@ -0,0 +1,109 @@
+import pytest
+
+from src.enums.common import Status
+from src.models.validation import ValidationConfig
+from src.sources.connection_pool import ConnectionPool
+from src.sources.database.duckdb.duckdb_source import DuckDBSource, DuckDBSourceConfig
+from src.validation.planner import parse_validation_query, run_validations
+
+
+@pytest.fixture
+def engine():
+    engine = DuckDBSource(DuckDBSourceConfig(name="duck_internal"))
+    engine.execute(
+        "CREATE TABLE users AS SELECT * FROM (VALUES (1, NULL, 10), (2, 'b', 20), "
+        "(2, NULL, 30), (3, 'd', NULL)) t(id, email, score)"
+    )
+    yield engine
+    engine.disconnect()
+
+
+def test_where_clause_moves_into_the_aggregates():
+    query = parse_validation_query(
+        "SELECT COUNT(*) + COUNT(DISTINCT id) - sum(score) FROM users WHERE email IS NULL"
+    )
+    assert query.aggregate_expression() == (
+        "COUNT(CASE WHEN email IS NULL THEN 1 END) "
+        "+ COUNT(DISTINCT CASE WHEN email IS NULL THEN id END) "
+        "- sum(CASE WHEN email IS NULL THEN score END)"
+    )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT COUNT(*) FROM users WHERE email IS NULL",
+        "SELECT COUNT(DISTINCT id) FROM users WHERE email IS NULL",
+        "SELECT SUM(score) FROM users WHERE id > 1",
+        "SELECT MAX(COALESCE(score, 0)) FROM users WHERE email = 'b'",
+        "SELECT COUNT(*) FROM users WHERE id > 5",
+        "SELECT COUNT(*) - COUNT(DISTINCT id) FROM users",
+    ],
+)
+def test_combined_expression_gives_the_result_of_the_query(engine, sql):
+    query = parse_validation_query(sql)
+    combined = f"SELECT {query.aggregate_expression()} FROM {query.from_clause}"
+    assert engine.fetch_one(combined) == engine.fetch_one(sql)
+
+
+def _validation(sql, expectation=None, name="check"):
+    return ValidationConfig(
+        name=name, sql_query=sql, expectation=expectation, exception="failed"
+    )
+
+
+def test_validations_with_the_same_name_keep_their_own_result(engine):
+    validations = [
+        _validation("SELECT COUNT(*) FROM users", "source_result == 4"),
+        _validation("SELECT COUNT(*) FROM users", "source_result == 5"),
+        _validation(
+            "SELECT MAX(id) FROM (SELECT id FROM users) t", "source_result == 3"
+        ),
+    ]
+    results = run_validations(
+        validations, engine, ConnectionPool(), raise_on_failure=False
+    )
+    assert [result.status for result in results] == [
+        Status.success,
+        Status.failure,
+        Status.success,
+    ]
+
+
+def test_invalid_expectation_fails_alone_without_running_the_query_again(
+    engine, monkeypatch
+):
+    queries = []
+    read_query = engine.read_query
+
+    def counting_read_query(query, values_to_bind=None, **kwargs):
+        queries.append(query)
+        return read_query(query, values_to_bind, **kwargs)
+
+    monkeypatch.setattr(engine, "read_query", counting_read_query)
+    validations = [
+        _validation("SELECT COUNT(*) FROM users", "source_result == 4", "count"),
+        _validation("SELECT SUM(score) FROM users", "-'a'", "invalid"),
+        _validation("SELECT MAX(id) FROM users", "source_result == 3", "max"),
+    ]
+    results = run_validations(
+        validations, engine, ConnectionPool(), raise_on_failure=False
+    )
+    assert [result.status for result in results] == [
+        Status.success,
+        Status.failure,
+        Status.success,
+    ]
+    assert "failed to run" in results[1].message
+    assert len(queries) == 1
+
+
+def test_invalid_query_of_a_combined_batch_runs_the_others_on_their_own(engine):
+    validations = [
+        _validation("SELECT COUNT(*) FROM users", "source_result == 4"),
+        _validation("SELECT SUM(missing_column) FROM users"),
+    ]
+    results = run_validations(
+        validations, engine, ConnectionPool(), raise_on_failure=False
+    )
+    assert [result.status for result in results] == [Status.success, Status.failure]
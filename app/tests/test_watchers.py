@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.models.dataset.file import FileDataset
+from src.models.source import SourceConfig
+from src.sources.file.local.local_source import FileSource
+from src.sources.watchers import BackoffWatcher, InotifyWatcher, _Inotify
+
+
+class _Source:
+    """Source whose dataset shows up after a number of checks."""
+
+    def __init__(self, available_after=None):
+        self.available_after = available_after
+        self.checks = 0
+
+    def dataset_exists(self, dataset, **kwargs):
+        self.checks += 1
+        return self.available_after is not None and self.checks >= self.available_after
+
+
+def _dataset(path, **on_dataset_missing):
+    return FileDataset.model_validate(
+        {
+            "name": "landing",
+            "file_path": str(path),
+            "file_type": "parquet",
+            "on_dataset_missing": {"action": "poll", **on_dataset_missing},
+        }
+    )
+
+
+def _write(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.table({"id": [1]}), path)
+
+
+@pytest.fixture
+def inotify():
+    if _Inotify.create() is None:
+        pytest.skip("inotify is not available")
+
+
+def test_backoff_checks_until_the_dataset_is_available(tmp_path):
+    source = _Source(available_after=4)
+    dataset = _dataset(tmp_path, initial_poll_interval=0.01, poll_interval=1)
+    assert BackoffWatcher(source).wait([dataset]) == {"landing": True}
+    assert source.checks == 4
+
+
+def test_backoff_intervals_double_up_to_the_poll_interval(tmp_path):
+    watcher = BackoffWatcher(_Source())
+    intervals, delays = [], []
+    next_interval = watcher._next_interval
+
+    def _spy(state):
+        delays.append(next_interval(state))
+        intervals.append(state.interval)
+        return delays[-1]
+
+    watcher._next_interval = _spy
+    dataset = _dataset(
+        tmp_path, initial_poll_interval=0.1, poll_interval=1, poll_count=2
+    )
+    assert watcher.wait([dataset]) == {"landing": False}
+    # the jitter decides how many checks fit before the deadline, at least 4
+    assert len(intervals) >= 4
+    assert intervals == [0.2, 0.4, 0.8] + [1] * (len(intervals) - 3)
+    # half of each interval is jitter
+    assert all(i / 2 <= d <= i for i, d in zip(intervals, delays))
+
+
+def test_backoff_gives_up_at_the_deadline(tmp_path):
+    source = _Source()
+    dataset = _dataset(
+        tmp_path, initial_poll_interval=0.01, poll_interval=1, poll_count=0
+    )
+    assert BackoffWatcher(source).wait([dataset]) == {"landing": False}
+    assert source.checks == 1
+
+
+def test_inotify_picks_up_a_file_written_into_a_new_directory(tmp_path, inotify):
+    dataset = _dataset(tmp_path / "in" / "landing", poll_interval=60, poll_count=1)
+    writer = threading.Timer(
+        0.2, _write, [tmp_path / "in" / "landing" / "part.parquet"]
+    )
+    started = time.monotonic()
+    writer.start()
+    try:
+        found = InotifyWatcher(FileSource(SourceConfig(name="local"))).wait([dataset])
+    finally:
+        writer.join()
+    assert found == {"landing": True}
+    assert time.monotonic() - started < 30
+
+
+def test_inotify_checks_right_away_for_files_which_landed_before_the_watch(
+    tmp_path, inotify
+):
+    dataset = _dataset(tmp_path / "landing", poll_interval=60, poll_count=1)
+    watcher = InotifyWatcher(FileSource(SourceConfig(name="local")))
+    watch_dataset = watcher._watch_dataset
+
+    def _land_then_watch(dataset):
+        # the file lands after the dataset was found missing, but before its directory is watched
+        _write(tmp_path / "landing" / "part.parquet")
+        return watch_dataset(dataset)
+
+    watcher._watch_dataset = _land_then_watch
+    started = time.monotonic()
+    assert watcher.wait([dataset]) == {"landing": True}
+    assert time.monotonic() - started < 30